@@ -0,0 +1,357 @@
+"""
+Métricas en formato de texto de Prometheus (GET /metrics), sin dependencias externas.
+- Por vista/acción de DRF (ej. "ProductViewSet.list"): cantidad de requests por clase de
+  status, errores 5xx e histograma de latencia.
+- Conexiones a la base abiertas (señal connection_created) y requests que consultaron la base:
+  su cociente da la proporción de reutilización (CONN_MAX_AGE). Con el pool de psycopg (DB_POOL)
+  la señal cuenta préstamos del pool; la reutilización sale de las estadísticas del pool, que
+  son del proceso que atiende /metrics.
+- Aciertos/fallos de la caché del catálogo.
+Los contadores viven en memoria del proceso. Con varios workers de gunicorn, METRICS_MULTIPROC_DIR
+indica un directorio compartido (del mismo host): cada proceso vuelca sus contadores a un archivo
+propio (como mucho cada METRICS_FLUSH_SECONDS) y /metrics suma los de todos los procesos. Los
+archivos de procesos que ya terminaron se suman a un acumulado y se borran, así un pid reusado
+no pisa contadores de un worker muerto ni los contadores retroceden. Esa fusión (pids y
+flock) es solo POSIX, como gunicorn: en Windows los archivos se suman pero no se fusionan.
+/metrics exige METRICS_TOKEN salvo con DEBUG (sin token configurado responde 403).
+"""
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_ultimo_volcado = 0.0
+_instancia = None  # (pid, sufijo) del archivo propio en modo multiproceso
+
+ARCHIVO_PROCESO = re.compile(r'^metrics-(\d+)-[0-9a-f]+\.json$')
+ARCHIVO_ACUMULADO = 'metrics-finalizados.json'
+
+
+def _nuevo_registro():
+    return {'vistas': {}, 'conexiones': {}, 'requests_db': 0}
+
+
+_registro = _nuevo_registro()
+
+
+def habilitadas():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def etiqueta_vista(request):
+    """ViewSet.acción para DRF (ProductViewSet.list, CartViewSet.checkout), si no el nombre de la función"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'sin_resolver'
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return getattr(match.func, '__name__', match._func_path)
+    acciones = getattr(match.func, 'actions', None) or {}
+    accion = acciones.get(request.method.lower(), request.method.lower())
+    return f'{cls.__name__}.{accion}'
+
+
+def registrar_request(vista, status_code, duracion, queries=0):
+    with _lock:
+        if queries:
+            _registro['requests_db'] += 1
+        datos = _registro['vistas'].setdefault(vista, {
+            'status': {}, 'errores': 0, 'buckets': [0] * len(BUCKETS), 'suma': 0.0, 'cantidad': 0,
+        })
+        clase = f'{status_code // 100}xx'
+        datos['status'][clase] = datos['status'].get(clase, 0) + 1
+        if status_code >= 500:
+            datos['errores'] += 1
+        for i, limite in enumerate(BUCKETS):
+            if duracion <= limite:
+                datos['buckets'][i] += 1
+        datos['suma'] += duracion
+        datos['cantidad'] += 1
+    _volcar_si_corresponde()
+
+
+def _conexion_creada(sender, connection, **kwargs):
+    with _lock:
+        conexiones = _registro['conexiones']
+        conexiones[connection.alias] = conexiones.get(connection.alias, 0) + 1
+
+
+connection_created.connect(_conexion_creada, dispatch_uid='techwave_metrics_conexiones')
+
+
+def reiniciar():
+    """Vacía los contadores del proceso (tests)"""
+    global _registro
+    with _lock:
+        _registro = _nuevo_registro()
+
+
+# --- Modo multiproceso -------------------------------------------------------
+
+def _directorio():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', '') or None
+
+
+def _archivo_propio(directorio):
+    """metrics-<pid>-<sufijo>.json; el sufijo cambia en cada proceso (también tras un fork)"""
+    global _instancia
+    if _instancia is None or _instancia[0] != os.getpid():
+        _instancia = (os.getpid(), uuid.uuid4().hex[:12])
+    return os.path.join(directorio, f'metrics-{_instancia[0]}-{_instancia[1]}.json')
+
+
+def _escribir(destino, contenido):
+    temporal = f'{destino}.{os.getpid()}.tmp'
+    with open(temporal, 'w') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, destino)  # atómico: /metrics nunca lee un archivo a medio escribir
+
+
+def _volcar():
+    directorio = _directorio()
+    if not directorio:
+        return
+    with _lock:
+        contenido = json.dumps(_registro)
+    _escribir(_archivo_propio(directorio), contenido)
+
+
+def _vivo(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) en Windows termina el proceso en vez de sondearlo
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _leer(ruta):
+    try:
+        with open(ruta) as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _fusionar_finalizados(directorio):
+    """Suma al acumulado los archivos de procesos que ya no existen y los borra"""
+    muertos = []
+    for ruta in glob.glob(os.path.join(directorio, 'metrics-*.json')):
+        coincidencia = ARCHIVO_PROCESO.match(os.path.basename(ruta))
+        if coincidencia and not _vivo(int(coincidencia.group(1))):
+            muertos.append(ruta)
+    if not muertos:
+        return
+    import fcntl  # solo POSIX; en Windows _vivo nunca da procesos muertos y no se llega acá
+
+    # Lock entre procesos: dos scrapes simultáneos no suman dos veces el mismo archivo
+    with open(os.path.join(directorio, '.metrics.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        acumulado_ruta = os.path.join(directorio, ARCHIVO_ACUMULADO)
+        acumulado = _leer(acumulado_ruta) or _nuevo_registro()
+        fusionados = []
+        for ruta in muertos:
+            parcial = _leer(ruta)
+            if parcial is not None:  # None: ya lo fusionó otro proceso
+                _sumar(acumulado, parcial)
+                fusionados.append(ruta)
+        if not fusionados:
+            return
+        _escribir(acumulado_ruta, json.dumps(acumulado))
+        for ruta in fusionados:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+def _volcar_si_corresponde():
+    global _ultimo_volcado
+    if not _directorio():
+        return
+    ahora = time.monotonic()
+    if ahora - _ultimo_volcado >= getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+        _ultimo_volcado = ahora
+        _volcar()
+
+
+def _sumar(total, parcial):
+    for vista, datos in parcial['vistas'].items():
+        acumulado = total['vistas'].setdefault(vista, {
+            'status': {}, 'errores': 0, 'buckets': [0] * len(BUCKETS), 'suma': 0.0, 'cantidad': 0,
+        })
+        for clase, cantidad in datos['status'].items():
+            acumulado['status'][clase] = acumulado['status'].get(clase, 0) + cantidad
+        acumulado['errores'] += datos['errores']
+        acumulado['buckets'] = [a + b for a, b in zip(acumulado['buckets'], datos['buckets'])]
+        acumulado['suma'] += datos['suma']
+        acumulado['cantidad'] += datos['cantidad']
+    for alias, cantidad in parcial['conexiones'].items():
+        total['conexiones'][alias] = total['conexiones'].get(alias, 0) + cantidad
+    total['requests_db'] += parcial.get('requests_db', 0)
+
+
+def snapshot():
+    """Contadores de este proceso, o de todos los procesos en modo multiproceso"""
+    directorio = _directorio()
+    if not directorio:
+        with _lock:
+            return json.loads(json.dumps(_registro))
+    _volcar()
+    _fusionar_finalizados(directorio)
+    total = _nuevo_registro()
+    for ruta in glob.glob(os.path.join(directorio, 'metrics-*.json')):
+        parcial = _leer(ruta)
+        if parcial is not None:  # None: archivo ajeno o recién borrado; se toma en el próximo scrape
+            _sumar(total, parcial)
+    return total
+
+
+# --- Exposición ----------------------------------------------------------------
+
+def _estadisticas_cache():
+    try:
+        from market import catalog_cache
+        return catalog_cache.estadisticas()
+    except Exception:
+        return None
+
+
+def _estadisticas_pool():
+    """Estadísticas de psycopg_pool por alias con DB_POOL activo"""
+    from django.db import connections
+    estadisticas = {}
+    for alias in connections:
+        try:
+            pool = getattr(connections[alias], 'pool', None)
+            if pool is not None:
+                estadisticas[alias] = pool.get_stats()
+        except Exception:
+            continue
+    return estadisticas
+
+
+def _reutilizacion(abiertas, usos):
+    return round(max(1 - abiertas / usos, 0.0), 4) if usos else None
+
+
+def exponer():
+    datos = snapshot()
+    lineas = [
+        '# HELP techwave_requests_total Requests por vista y clase de status.',
+        '# TYPE techwave_requests_total counter',
+    ]
+    vistas = sorted(datos['vistas'].items())
+    for vista, d in vistas:
+        for clase, cantidad in sorted(d['status'].items()):
+            lineas.append(f'techwave_requests_total{{view="{vista}",status="{clase}"}} {cantidad}')
+
+    lineas += [
+        '# HELP techwave_request_errors_total Respuestas 5xx por vista.',
+        '# TYPE techwave_request_errors_total counter',
+    ]
+    lineas += [f'techwave_request_errors_total{{view="{vista}"}} {d["errores"]}' for vista, d in vistas]
+
+    lineas += [
+        '# HELP techwave_request_duration_seconds Latencia de los requests por vista.',
+        '# TYPE techwave_request_duration_seconds histogram',
+    ]
+    for vista, d in vistas:
+        for limite, cantidad in zip(BUCKETS, d['buckets']):
+            lineas.append(f'techwave_request_duration_seconds_bucket{{view="{vista}",le="{limite}"}} {cantidad}')
+        lineas.append(f'techwave_request_duration_seconds_bucket{{view="{vista}",le="+Inf"}} {d["cantidad"]}')
+        lineas.append(f'techwave_request_duration_seconds_sum{{view="{vista}"}} {d["suma"]:.6f}')
+        lineas.append(f'techwave_request_duration_seconds_count{{view="{vista}"}} {d["cantidad"]}')
+
+    lineas += [
+        '# HELP techwave_db_connections_opened_total Conexiones nuevas a la base (menos = más reutilización).',
+        '# TYPE techwave_db_connections_opened_total counter',
+    ]
+    lineas += [
+        f'techwave_db_connections_opened_total{{alias="{alias}"}} {cantidad}'
+        for alias, cantidad in sorted(datos['conexiones'].items())
+    ]
+
+    pools = _estadisticas_pool()
+    lineas += [
+        '# HELP techwave_db_requests_total Requests que ejecutaron al menos una query.',
+        '# TYPE techwave_db_requests_total counter',
+        f'techwave_db_requests_total {datos.get("requests_db", 0)}',
+        '# HELP techwave_db_connection_reuse_ratio Proporción de usos de la base servidos por una conexión ya abierta.',
+        '# TYPE techwave_db_connection_reuse_ratio gauge',
+    ]
+    for alias in sorted(set(datos['conexiones']) | set(pools)):
+        if alias in pools:
+            ratio = _reutilizacion(pools[alias].get('connections_num', 0), pools[alias].get('requests_num', 0))
+        else:
+            ratio = _reutilizacion(datos['conexiones'][alias], datos.get('requests_db', 0))
+        if ratio is not None:
+            lineas.append(f'techwave_db_connection_reuse_ratio{{alias="{alias}"}} {ratio}')
+
+    if pools:
+        lineas += [
+            '# HELP techwave_db_pool_connections Conexiones del pool de este proceso (abiertas y libres).',
+            '# TYPE techwave_db_pool_connections gauge',
+        ]
+        for alias, e in sorted(pools.items()):
+            lineas.append(f'techwave_db_pool_connections{{alias="{alias}",state="open"}} {e.get("pool_size", 0)}')
+            lineas.append(f'techwave_db_pool_connections{{alias="{alias}",state="available"}} {e.get("pool_available", 0)}')
+            lineas.append(f'techwave_db_pool_connections{{alias="{alias}",state="max"}} {e.get("pool_max", 0)}')
+        lineas += [
+            '# HELP techwave_db_pool_requests_waiting Requests esperando una conexión libre del pool.',
+            '# TYPE techwave_db_pool_requests_waiting gauge',
+        ]
+        lineas += [
+            f'techwave_db_pool_requests_waiting{{alias="{alias}"}} {e.get("requests_waiting", 0)}'
+            for alias, e in sorted(pools.items())
+        ]
+        lineas += [
+            '# HELP techwave_db_pool_connections_lost_total Conexiones descartadas por el health check del pool.',
+            '# TYPE techwave_db_pool_connections_lost_total counter',
+        ]
+        lineas += [
+            f'techwave_db_pool_connections_lost_total{{alias="{alias}"}} {e.get("connections_lost", 0)}'
+            for alias, e in sorted(pools.items())
+        ]
+
+    cache = _estadisticas_cache()
+    if cache is not None:
+        lineas += [
+            '# HELP techwave_catalog_cache_requests_total Lecturas de la caché del catálogo.',
+            '# TYPE techwave_catalog_cache_requests_total counter',
+            f'techwave_catalog_cache_requests_total{{result="hit"}} {cache["hits"]}',
+            f'techwave_catalog_cache_requests_total{{result="miss"}} {cache["misses"]}',
+            '# HELP techwave_catalog_cache_hit_ratio Proporción de aciertos de la caché del catálogo.',
+            '# TYPE techwave_catalog_cache_hit_ratio gauge',
+            f'techwave_catalog_cache_hit_ratio {cache["hit_ratio"]}',
+        ]
+    return '\n'.join(lineas) + '\n'
+
+
+def metrics_view(request):
+    """
+    GET /metrics con `Authorization: Bearer <METRICS_TOKEN>`. Sin token configurado solo
+    responde con DEBUG (desarrollo); en producción da 403 en vez de quedar público.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(exponer(), content_type=CONTENT_TYPE)
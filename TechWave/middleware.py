@@ -0,0 +1,153 @@
+"""
+Middleware de presupuesto por request: cantidad de queries SQL, tiempo en la base y tiempo total.
+- Cada request se etiqueta con la vista resuelta y la acción del ViewSet (ej. "product-list:list").
+- Si supera REQUEST_QUERY_BUDGET o REQUEST_TIME_BUDGET_MS se registra un warning en
+  el logger "techwave.performance" (así un N+1 nuevo aparece en los logs de producción).
+- Con SERVER_TIMING_HEADER agrega el header Server-Timing (visible en las devtools del navegador).
+- La misma medición alimenta los contadores de /metrics (TechWave.metrics).
+- Apto para WSGI y ASGI (vistas async de market.async_views).
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+logger = logging.getLogger('techwave.performance')
+
+
+class _MedidorSQL:
+    """execute_wrapper que cuenta las queries y acumula su duración"""
+
+    def __init__(self):
+        self.queries = 0
+        self.duracion = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duracion += time.perf_counter() - inicio
+
+
+def nombre_vista(request):
+    """Nombre de la ruta resuelta y, para ViewSets, la acción (list, retrieve, checkout...)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'sin-resolver'
+    nombre = match.view_name or match._func_path
+    acciones = getattr(match.func, 'actions', None)
+    accion = acciones.get(request.method.lower()) if acciones else None
+    return f'{nombre}:{accion}' if accion else nombre
+
+
+class RequestBudgetMiddleware:
+    """Funciona en WSGI y en ASGI (sin pasar las vistas async a un hilo)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._activo():
+            return self.get_response(request)
+        medidor, inicio = _MedidorSQL(), time.perf_counter()
+        with self._medicion(medidor):
+            response = self.get_response(request)
+        return self._registrar(request, response, medidor, inicio)
+
+    async def __acall__(self, request):
+        if not self._activo():
+            return await self.get_response(request)
+        medidor, inicio = _MedidorSQL(), time.perf_counter()
+        # Las conexiones son por hilo: el wrapper va en el hilo donde corre el ORM async
+        # (sync_to_async thread-sensitive, uno por request bajo ASGI)
+        medicion = await sync_to_async(self._medicion)(medidor)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(medicion.close)()
+        return self._registrar(request, response, medidor, inicio)
+
+    @staticmethod
+    def _activo():
+        return getattr(settings, 'REQUEST_BUDGET_ENABLED', True) or metrics.habilitadas()
+
+    @staticmethod
+    def _medicion(medidor):
+        stack = ExitStack()
+        for conexion in connections.all():
+            stack.enter_context(conexion.execute_wrapper(medidor))
+        return stack
+
+    def _registrar(self, request, response, medidor, inicio):
+        total_ms = (time.perf_counter() - inicio) * 1000
+        db_ms = medidor.duracion * 1000
+
+        if metrics.habilitadas():
+            metrics.registrar_request(
+                metrics.etiqueta_vista(request), response.status_code, total_ms / 1000, medidor.queries
+            )
+        if not getattr(settings, 'REQUEST_BUDGET_ENABLED', True):
+            return response
+
+        vista = nombre_vista(request)
+        request.metricas = {
+            'vista': vista, 'queries': medidor.queries, 'db_ms': db_ms, 'total_ms': total_ms,
+        }
+
+        budget_queries = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+        budget_ms = getattr(settings, 'REQUEST_TIME_BUDGET_MS', 1000)
+        if medidor.queries > budget_queries or total_ms > budget_ms:
+            logger.warning(
+                'Presupuesto excedido en %s %s (%s): %d queries (máx %d), db %.1f ms, total %.1f ms (máx %d)',
+                request.method, request.path, vista, medidor.queries, budget_queries,
+                db_ms, total_ms, budget_ms,
+            )
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{medidor.queries} queries", total;dur={total_ms:.1f}'
+            )
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise (6.x solo tiene versión síncrona) apto para ASGI: en una cadena async un
+    middleware síncrono obliga a Django a pasar cada request por un hilo. Los estáticos se
+    sirven igual que en WhiteNoise; el resto sigue async hasta la vista.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
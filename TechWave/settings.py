@@ -12,9 +12,11 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import importlib.util
 import os
 import dj_database_url
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 import os
 import dj_database_url
 
@@ -58,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir el request completo (queries, tiempo en la base y tiempo total)
+    'TechWave.middleware.RequestBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -66,7 +70,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise apto para ASGI (ver TechWave.middleware)
+    "TechWave.middleware.AsyncWhiteNoiseMiddleware",
 ]
 
 ROOT_URLCONF = 'TechWave.urls'
@@ -93,10 +98,31 @@ WSGI_APPLICATION = 'TechWave.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Conexiones a la base
+# - DB_CONN_MAX_AGE: segundos que cada hilo reutiliza su conexión (0 = una conexión por request).
+# - DB_CONN_HEALTH_CHECKS: antes de reutilizar una conexión se verifica que siga viva; tras un
+#   failover o un corte del servidor se abre otra en vez de fallar el primer request.
+# - DB_POOL (solo Postgres con psycopg 3): pool nativo de Django, uno por proceso. DB_POOL_MAX_SIZE
+#   es el tope por worker: el servidor recibe hasta workers x DB_POOL_MAX_SIZE conexiones.
+#   Con pool las conexiones no persisten por hilo (CONN_MAX_AGE = 0): vuelven al pool al terminar
+#   el request, y con health checks el pool las verifica al prestarlas.
+#   psycopg 3 no está en requirements.txt: se instala aparte (pip install 'psycopg[binary,pool]')
+#   solo donde se usa el pool. Instalado, Django lo prefiere a psycopg2 para todas las conexiones
+#   de ese entorno, con o sin DB_POOL.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() in ("1", "true", "yes")
+DB_POOL = os.getenv("DB_POOL", "False").lower() in ("1", "true", "yes")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+
 DATABASES = {
     "default": dj_database_url.config(
         default=os.getenv("DATABASE_URL", "sqlite:///db.sqlite3"),
-        conn_max_age=600,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
     )
 }
 
@@ -106,6 +132,22 @@ if "postgres" in engine or "psycopg2" in engine:
     DATABASES["default"].setdefault("OPTIONS", {})
     # psycopg2 expects sslmode, dj_database_url's ssl_require can add sslmode to options
     DATABASES["default"]["OPTIONS"]["sslmode"] = "require"
+    if DB_POOL:
+        if not all(importlib.util.find_spec(m) for m in ("psycopg", "psycopg_pool")):
+            raise ImproperlyConfigured("DB_POOL requiere psycopg 3 con el pool (pip install 'psycopg[binary,pool]')")
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+            "max_idle": DB_POOL_MAX_IDLE,
+            "max_lifetime": DB_POOL_MAX_LIFETIME,
+        }
+
+
+# MySQL no soporta constraints ni índices parciales (pagos abiertos, cola de pedidos): Django los
+# omite ahí y Pay.save valida en la aplicación
+SILENCED_SYSTEM_CHECKS = ["models.W036", "models.W037"]
 
 
 # Password validation
@@ -176,13 +218,100 @@ else:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Autenticación JWT sin consultar el usuario en la base por request (rol e is_* viajan como claims)
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH", "False").lower() in ("1", "true", "yes")
+# Caché donde se marcan los usuarios modificados: sin DEBUG debe ser compartida (no LocMem) si JWT_STATELESS_AUTH
+JWT_USER_CHANGES_CACHE_ALIAS = os.getenv("JWT_USER_CHANGES_CACHE_ALIAS", "default")
+# Caché de la blacklist de refresh tokens: los "no revocado" se recuerdan unos segundos, solo si la caché es
+# compartida. Requiere CACHE_BACKEND (o este alias) en Redis/Memcached: con la LocMem por defecto no se
+# cachean (aviso al iniciar sin DEBUG) y cada worker consulta BlacklistedToken en cada refresh
+JWT_BLACKLIST_CACHE_ALIAS = os.getenv("JWT_BLACKLIST_CACHE_ALIAS", "default")
+JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS = int(os.getenv("JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS", "30"))
+
 REST_FRAMEWORK = {
      'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
      'DEFAULT_AUTHENTICATION_CLASSES': [
+        'account_admin.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
  }
 
+# Paginación por cursor del catálogo y de pedidos (tamaño por defecto y tope máximo por página)
+PRODUCT_PAGE_SIZE = int(os.getenv("PRODUCT_PAGE_SIZE", "20"))
+PRODUCT_MAX_PAGE_SIZE = int(os.getenv("PRODUCT_MAX_PAGE_SIZE", "100"))
+ORDER_PAGE_SIZE = int(os.getenv("ORDER_PAGE_SIZE", "20"))
+ORDER_MAX_PAGE_SIZE = int(os.getenv("ORDER_MAX_PAGE_SIZE", "100"))
+
+# Paginación del listado de usuarios del panel de administración
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "50"))
+USERS_MAX_PAGE_SIZE = int(os.getenv("USERS_MAX_PAGE_SIZE", "200"))
+
+# Reservas de stock para carritos (opcional): agregar al carrito retiene unidades por un tiempo
+STOCK_RESERVATIONS_ENABLED = os.getenv("STOCK_RESERVATIONS_ENABLED", "False").lower() in ("1", "true", "yes")
+STOCK_RESERVATION_TTL = timedelta(minutes=int(os.getenv("STOCK_RESERVATION_TTL_MINUTES", "15")))
+
+# Vigencia de las respuestas guardadas para el header Idempotency-Key (checkout y pagos)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+# Una clave en curso caduca antes: si el proceso muere a mitad del request, el cliente puede reintentar
+IDEMPOTENCY_IN_PROGRESS_LEASE = timedelta(seconds=int(os.getenv("IDEMPOTENCY_IN_PROGRESS_LEASE_SECONDS", "60")))
+
+# Tareas en segundo plano (market.jobs): con JOBS_ASYNC se encolan en la base y las ejecuta
+# `python manage.py run_jobs`; desactivado (por defecto) se ejecutan dentro del request, salvo
+# el push de comprobantes, que va a un hilo al confirmar (ver PROOF_UPLOAD_*)
+JOBS_ASYNC = os.getenv("JOBS_ASYNC", "False").lower() in ("1", "true", "yes")
+JOBS_WORKER_THREADS = int(os.getenv("JOBS_WORKER_THREADS", "4"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_RETRY_BASE_SECONDS = int(os.getenv("JOBS_RETRY_BASE_SECONDS", "10"))
+JOBS_RETRY_MAX_SECONDS = int(os.getenv("JOBS_RETRY_MAX_SECONDS", "3600"))
+JOBS_LEASE_SECONDS = int(os.getenv("JOBS_LEASE_SECONDS", "300"))
+
+# Comprobantes de pago (market.uploads): se reciben a un directorio temporal y el push al
+# storage va como tarea de market.jobs; sin JOBS_ASYNC lo hace un pool de hilos al confirmar
+# el request. PROOF_UPLOAD_SYNC sube en el mismo hilo (desarrollo)
+PROOF_UPLOAD_TEMP_DIR = os.getenv("PROOF_UPLOAD_TEMP_DIR", "")
+PROOF_UPLOAD_MAX_BYTES = int(os.getenv("PROOF_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+PROOF_UPLOAD_MAX_ATTEMPTS = int(os.getenv("PROOF_UPLOAD_MAX_ATTEMPTS", "5"))
+PROOF_UPLOAD_WORKERS = int(os.getenv("PROOF_UPLOAD_WORKERS", "2"))
+PROOF_UPLOAD_SYNC = os.getenv("PROOF_UPLOAD_SYNC", "False").lower() in ("1", "true", "yes")
+
+# Caché: memoria local por defecto; CACHE_BACKEND/CACHE_LOCATION permiten un backend compartido (ej. Redis)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "techwave-default"),
+    }
+}
+
+# Caché de respuestas del catálogo público (categorías y productos); 0 la deshabilita
+CATALOG_CACHE_ALIAS = os.getenv("CATALOG_CACHE_ALIAS", "default")
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "60"))
+
+# Presupuesto por request (TechWave.middleware): los que lo superan se registran en "techwave.performance"
+REQUEST_BUDGET_ENABLED = os.getenv("REQUEST_BUDGET_ENABLED", "True").lower() in ("1", "true", "yes")
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "50"))
+REQUEST_TIME_BUDGET_MS = int(os.getenv("REQUEST_TIME_BUDGET_MS", "1000"))
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "False").lower() in ("1", "true", "yes")
+
+# Métricas Prometheus en /metrics (TechWave.metrics). Con varios workers de gunicorn,
+# METRICS_MULTIPROC_DIR debe apuntar a un directorio compartido y escribible por todos
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("1", "true", "yes")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_SECONDS = int(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Token del scrape (Authorization: Bearer); sin él /metrics solo responde con DEBUG
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "techwave.performance": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),  # Duración del token de acceso
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),     # Duración del token de refresco
@@ -198,6 +327,9 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    # Login y refresh agregan los claims de rol usados por StatelessJWTAuthentication
+    'TOKEN_OBTAIN_SERIALIZER': 'account_admin.serializer.TokenObtainPairWithClaimsSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'account_admin.serializer.TokenRefreshWithClaimsSerializer',
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
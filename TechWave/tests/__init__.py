@@ -0,0 +1,3 @@
+from .test_metrics import *
+from .test_middleware import *
+from .test_database import *
@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+import tempfile
+from unittest.mock import patch
+from django.core.cache import cache
+from django.urls import reverse
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import Category, Product
+from account_admin.models import User
+from TechWave import metrics
+from faker import Faker
+
+fake = Faker()
+
+
+@override_settings(METRICS_TOKEN='token-metricas')
+class TestMetricsEndpoint(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reiniciar()
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.product = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=10, stock=5, categoria=category
+        )
+        self.client = APIClient()
+
+    def _metrics(self):
+        return self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer token-metricas').content.decode()
+
+    def _otro_worker(self, directorio, pid, cantidad):
+        datos = {
+            'vistas': {'ProductViewSet.list': {
+                'status': {'2xx': cantidad}, 'errores': 0, 'buckets': [cantidad] * len(metrics.BUCKETS),
+                'suma': 0.01, 'cantidad': cantidad,
+            }},
+            'conexiones': {'default': 1},
+        }
+        ruta = f'{directorio}/metrics-{pid}-0a1b2c.json'
+        with open(ruta, 'w') as archivo:
+            json.dump(datos, archivo)
+        return ruta
+
+    def test_requests_are_counted_per_viewset_action(self):
+        self.client.get(reverse('product-list'))
+        self.client.get(reverse('product-list'))
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('cart-checkout'))
+        body = self._metrics()
+        self.assertIn('techwave_requests_total{view="ProductViewSet.list",status="2xx"} 2', body)
+        self.assertIn('techwave_requests_total{view="CartViewSet.checkout",status="4xx"} 1', body)
+        self.assertIn('techwave_request_duration_seconds_count{view="ProductViewSet.list"} 2', body)
+        self.assertIn('techwave_request_duration_seconds_bucket{view="ProductViewSet.list",le="+Inf"} 2', body)
+        self.assertIn('techwave_catalog_cache_requests_total{result="hit"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_metrics_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_without_token_are_only_public_in_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_multiprocess_mode_sums_all_workers(self):
+        with tempfile.TemporaryDirectory() as directorio, override_settings(METRICS_MULTIPROC_DIR=directorio):
+            self._otro_worker(directorio, os.getppid(), 3)
+            self.client.get(reverse('product-list'))
+            body = self._metrics()
+        self.assertIn('techwave_requests_total{view="ProductViewSet.list",status="2xx"} 4', body)
+
+    def test_finished_workers_are_merged_and_their_files_removed(self):
+        proceso = subprocess.Popen(['true'])
+        proceso.wait()  # su pid ya no existe
+        with tempfile.TemporaryDirectory() as directorio, override_settings(METRICS_MULTIPROC_DIR=directorio):
+            ruta = self._otro_worker(directorio, proceso.pid, 3)
+            self.client.get(reverse('product-list'))
+            body = self._metrics()
+            self.assertFalse(os.path.exists(ruta))
+            # El pid se reusa: el archivo nuevo no pisa lo que contó el worker anterior
+            self._otro_worker(directorio, proceso.pid, 1)
+            body = self._metrics()
+        self.assertIn('techwave_requests_total{view="ProductViewSet.list",status="2xx"} 5', body)
+
+    def test_windows_never_signals_worker_pids(self):
+        with patch.object(metrics.os, 'name', 'nt'), patch.object(metrics.os, 'kill') as kill:
+            self.assertTrue(metrics._vivo(12345))
+        kill.assert_not_called()
+        self.assertNotIn('fcntl', metrics.__dict__)
+
+    def test_connection_reuse_ratio(self):
+        self.client.force_authenticate(user=self.user)
+        for _ in range(4):
+            self.client.get(reverse('order-my-orders'))
+        # Una sola conexión nueva para los 4 requests con queries
+        connection_created.send(sender=type(connections['default']), connection=connections['default'])
+        body = self._metrics()
+        self.assertIn('techwave_db_requests_total 4', body)
+        self.assertIn('techwave_db_connection_reuse_ratio{alias="default"} 0.75', body)
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import Category, Product
+from faker import Faker
+
+fake = Faker()
+
+
+class TestRequestBudgetMiddleware(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        Product.objects.create(nombre=fake.word(), descripcion=fake.text(), precio=10, stock=5, categoria=category)
+        self.client = APIClient()
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header_reports_queries(self):
+        response = self.client.get(reverse('product-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+
+    def test_server_timing_header_is_optional(self):
+        response = self.client.get(reverse('product-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_requests_over_budget_are_logged_with_view_and_action(self):
+        with self.assertLogs('techwave.performance', level='WARNING') as logs:
+            self.client.get(reverse('category-list'))
+        self.assertIn('category-list:list', logs.output[0])
+
+    def test_requests_within_budget_are_not_logged(self):
+        with self.assertNoLogs('techwave.performance', level='WARNING'):
+            self.client.get(reverse('category-list'))
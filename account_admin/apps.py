@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class AccountAdminConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account_admin'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+        from .authentication import exigir_cache_compartida
+        from .tokens import avisar_negativos_sin_cache_compartida
+
+        # Con varios workers las marcas de cambio de usuario deben verse desde todos
+        if getattr(settings, 'JWT_STATELESS_AUTH', False) and not settings.DEBUG:
+            exigir_cache_compartida(getattr(settings, 'JWT_USER_CHANGES_CACHE_ALIAS', 'default'), 'JWT_STATELESS_AUTH')
+        # Sin caché compartida los "no revocado" no se cachean; en desarrollo no importa
+        if not settings.DEBUG:
+            avisar_negativos_sin_cache_compartida()
@@ -0,0 +1,89 @@
+"""
+Autenticación JWT sin consulta a la base por request (opcional, JWT_STATELESS_AUTH).
+- Al hacer login/refresh se agregan al access token los claims que usan los permisos
+  (username, role, is_staff, is_superuser, is_active).
+- StatelessJWTAuthentication arma el usuario desde esos claims (ClaimsUser).
+- Cuando un usuario cambia (rol, activación, borrado) se registra la hora en la caché;
+  los tokens cuyos claims se armaron antes de ese cambio vuelven a validarse contra la base
+  hasta vencer. La hora de los claims va en su propio claim: el access token de un refresh
+  hereda el `iat` del refresh token y parecería siempre anterior al cambio.
+- La caché de marcas debe ser compartida entre workers (Redis, Memcached, base): con una por
+  proceso, un usuario degradado conservaría su rol en los otros workers. Sin DEBUG, activar
+  JWT_STATELESS_AUTH con una caché local falla al arrancar (ver apps.py).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import ClaimsUser
+
+CLAIMS = ('username', 'role', 'is_staff', 'is_superuser', 'is_active')
+# Momento en que se copiaron los claims (no el `iat`, que el refresh hereda al access token)
+CLAIM_EMISION = 'claims_iat'
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def aplicar_claims(token, user):
+    """Copia al token los datos del usuario que necesitan los permisos"""
+    for campo in CLAIMS:
+        token[campo] = getattr(user, campo)
+    token[CLAIM_EMISION] = time.time()
+    return token
+
+
+def exigir_cache_compartida(alias, ajuste):
+    """ImproperlyConfigured si la caché `alias` es local al proceso (lo que marca un worker no lo ven los demás)"""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if backend in CACHES_POR_PROCESO:
+        raise ImproperlyConfigured(
+            f'{ajuste} necesita una caché compartida entre procesos (Redis, Memcached, base); '
+            f'"{alias}" usa {backend}'
+        )
+
+
+def _cache():
+    return caches[getattr(settings, 'JWT_USER_CHANGES_CACHE_ALIAS', 'default')]
+
+
+def _clave(user_id):
+    return f'jwt:user-changed:{user_id}'
+
+
+def marcar_cambio(user_id):
+    """
+    Invalida los claims de los tokens ya emitidos para el usuario. La marca solo
+    necesita durar lo que un access token: después todos fueron reemitidos.
+    """
+    duracion = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    _cache().set(_clave(user_id), time.time(), timeout=duracion)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que evita el SELECT del usuario cuando el token trae los claims vigentes"""
+
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in CLAIMS) or self._claims_desactualizados(validated_token):
+            # Token emitido antes de habilitar los claims o de un cambio del usuario
+            return super().get_user(validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE and not validated_token['is_active']:
+            raise AuthenticationFailed('El usuario está inactivo', code='user_inactive')
+
+        valores = {claim: validated_token[claim] for claim in CLAIMS}
+        valores['id'] = validated_token[api_settings.USER_ID_CLAIM]
+        # from_db espera los valores en el orden de los campos del modelo; el resto queda diferido
+        campos = [f.attname for f in ClaimsUser._meta.concrete_fields if f.attname in valores]
+        return ClaimsUser.from_db(DEFAULT_DB_ALIAS, campos, [valores[campo] for campo in campos])
+
+    def _claims_desactualizados(self, validated_token):
+        marca = _cache().get(_clave(validated_token[api_settings.USER_ID_CLAIM]))
+        emision = validated_token.get(CLAIM_EMISION, validated_token.get('iat', 0))
+        return marca is not None and emision <= marca
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account_admin.tokens import purgar_vencidos
+
+
+class Command(BaseCommand):
+    help = "Elimina los refresh tokens vencidos y su blacklist (una vez o periódicamente con --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Repetir indefinidamente cada --interval segundos")
+        parser.add_argument('--interval', type=int, default=3600)
+
+    def handle(self, *args, **options):
+        while True:
+            eliminados = purgar_vencidos(batch_size=options['batch_size'])
+            self.stdout.write(f"Tokens vencidos eliminados: {eliminados}")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
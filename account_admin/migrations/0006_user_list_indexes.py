@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+# Columnas de la búsqueda de list_users (icontains -> UPPER(col::text) LIKE UPPER(...))
+COLUMNAS_BUSQUEDA = ('username', 'email', 'first_name', 'last_name')
+
+
+def crear_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for columna in COLUMNAS_BUSQUEDA:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS account_admin_user_{columna}_trgm "
+            f"ON account_admin_user USING GIN ((UPPER({columna}::text)) gin_trgm_ops)"
+        )
+
+
+def eliminar_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for columna in COLUMNAS_BUSQUEDA:
+        schema_editor.execute(f"DROP INDEX IF EXISTS account_admin_user_{columna}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_admin', '0005_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', '-register_date'], name='user_role_register_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-register_date'], name='user_register_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='user_email_idx'),
+        ),
+        migrations.RunPython(crear_indices_trigram, eliminar_indices_trigram),
+    ]
@@ -19,4 +19,28 @@ class User(AbstractUser):
 
     class Meta:
         verbose_name = "User"
-        verbose_name_plural = "Users" 
+        verbose_name_plural = "Users"
+        # list_users filtra por rol y ordena por fecha de registro; las búsquedas por texto
+        # (icontains) usan índices trigram en Postgres (migración 0006)
+        indexes = [
+            models.Index(fields=['role', '-register_date'], name='user_role_register_idx'),
+            models.Index(fields=['-register_date'], name='user_register_date_idx'),
+            models.Index(fields=['email'], name='user_email_idx'),
+        ]
+
+
+class ClaimsUser(User):
+    """
+    Usuario armado desde los claims del JWT (ver account_admin.authentication), sin consultar la base.
+    Trae id, username, role e is_* del token; al leer cualquier otro campo se cargan
+    todos los restantes juntos en una sola consulta.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferidos = self.get_deferred_fields()
+        if fields is not None and deferidos and set(fields) <= deferidos:
+            fields = deferidos
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
@@ -1,7 +1,59 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from .models import *
+from .authentication import aplicar_claims
+from .tokens import RefreshToken
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class TokenObtainPairWithClaimsSerializer(TokenObtainPairSerializer):
+    """Login: agrega al token los claims de rol (los hereda el access token)"""
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        return aplicar_claims(super().get_token(user), user)
+
+
+class TokenRefreshWithClaimsSerializer(TokenRefreshSerializer):
+    """
+    Refresh: igual que el de simplejwt, pero el nuevo access token lleva los claims
+    actuales del usuario (no los del login), así un cambio de rol se propaga al refrescar.
+    La verificación de blacklist del refresh token pasa por la caché (ver tokens.py).
+    """
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM, None)
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if user_id and (user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user)):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        access = refresh.access_token
+        if user is not None:
+            aplicar_claims(access, user)
+        data = {'access': str(access)}
+
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Sin la app token_blacklist no existe `blacklist`
+                    pass
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import CLAIMS, marcar_cambio
+from .models import User
+from .tokens import marcar_revocado
+
+
+@receiver(post_save, sender=User)
+def invalidar_claims_usuario(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Rol/activación cambiados (ChangeRoleView, manage_user, admin): los tokens previos dejan de confiarse"""
+    if created or raw:
+        return
+    if update_fields is not None and not set(CLAIMS) & set(update_fields):
+        return
+    marcar_cambio(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidar_claims_usuario_borrado(sender, instance, **kwargs):
+    marcar_cambio(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def cachear_revocacion(sender, instance, raw=False, **kwargs):
+    """Toda revocación (rotación, logout, admin) queda en la caché que consulta RefreshToken"""
+    if raw:
+        return
+    marcar_revocado(instance.token.jti, instance.token.expires_at)
@@ -1,9 +1,23 @@
-from django.test import TestCase
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework import status
 from account_admin.models import User
-from account_admin.views import CreateUserView, ChangeRoleView, LoginView, LogoutView
+from account_admin.authentication import StatelessJWTAuthentication
+from account_admin.serializer import TokenObtainPairWithClaimsSerializer, TokenRefreshWithClaimsSerializer
+from account_admin.tokens import RefreshToken, avisar_negativos_sin_cache_compartida
+from account_admin.views import CreateUserView, ChangeRoleView, LogoutView
 from faker import Faker
 
 fake = Faker()
@@ -407,4 +421,196 @@ class ViewsIntegrationTest(APITestCase):
         # 7. Logout
         logout_url = reverse('logout')
         logout_response = self.client.post(logout_url, format='json')
-        self.assertEqual(logout_response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(logout_response.status_code, 200)
+
+class ListUsersViewTest(APITestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(
+            username='admin_list', email='admin_list@test.com', password='adminpass123', role='admin'
+        )
+        for i in range(7):
+            User.objects.create_user(
+                username=f'cliente_{i}', email=f'cliente_{i}@test.com', password='pass12345', role='client'
+            )
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('list_users')
+
+    def test_list_users_is_paginated_with_sql_count(self):
+        response = self.client.get(self.url, {'page_size': 3, 'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 8)
+        self.assertEqual(response.data['page'], 2)
+        self.assertEqual(response.data['total_pages'], 3)
+        self.assertEqual(len(response.data['users']), 3)
+
+    def test_list_users_pages_do_not_overlap(self):
+        ids = []
+        for page in (1, 2, 3):
+            response = self.client.get(self.url, {'page_size': 3, 'page': page})
+            ids += [user['id'] for user in response.data['users']]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+
+    def test_list_users_projection_and_filters(self):
+        response = self.client.get(self.url, {'role': 'client', 'search': 'cliente_3'})
+        self.assertEqual(response.data['total'], 1)
+        user = response.data['users'][0]
+        self.assertEqual(user['username'], 'cliente_3')
+        self.assertNotIn('password', user)
+        self.assertIsNone(user['last_login'])
+
+    def test_list_users_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'page_size': 5})
+
+    def test_list_users_non_admin_forbidden(self):
+        self.client.force_authenticate(user=User.objects.get(username='cliente_0'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class StatelessJWTAuthenticationTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(
+            username='stateless_test', email='stateless@test.com', password='pass12345', role='operator'
+        )
+        self.auth = StatelessJWTAuthentication()
+
+    def _access(self, user):
+        return str(TokenObtainPairWithClaimsSerializer.get_token(user).access_token)
+
+    def _authenticate(self, access):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.auth.authenticate(request)[0]
+
+    def test_user_built_from_claims_without_queries(self):
+        access = self._access(self.user)
+        with self.assertNumQueries(0):
+            user = self._authenticate(access)
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.role, 'operator')
+        self.assertTrue(user.is_authenticated)
+
+    def test_other_fields_load_in_a_single_query(self):
+        user = self._authenticate(self._access(self.user))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'stateless@test.com')
+            self.assertTrue(user.register_date)
+
+    def test_role_change_invalidates_previous_tokens(self):
+        access = self._access(self.user)
+        self.user.role = 'admin'
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = self._authenticate(access)
+        self.assertEqual(user.role, 'admin')
+
+    def test_deactivated_user_is_rejected(self):
+        access = self._access(self.user)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(access)
+
+    def test_refresh_carries_current_claims(self):
+        refresh = TokenObtainPairWithClaimsSerializer.get_token(self.user)
+        User.objects.filter(pk=self.user.pk).update(role='client')
+        serializer = TokenRefreshWithClaimsSerializer(data={'refresh': str(refresh)})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(AccessToken(serializer.validated_data['access'])['role'], 'client')
+
+    def test_token_refreshed_after_a_change_is_trusted(self):
+        refresh = TokenObtainPairWithClaimsSerializer.get_token(self.user)
+        self.user.role = 'client'
+        self.user.save()
+        serializer = TokenRefreshWithClaimsSerializer(data={'refresh': str(refresh)})
+        self.assertTrue(serializer.is_valid())
+        # El access token hereda el `iat` del refresh (anterior al cambio), pero sus claims son nuevos
+        with self.assertNumQueries(0):
+            user = self._authenticate(serializer.validated_data['access'])
+        self.assertEqual(user.role, 'client')
+
+    @override_settings(JWT_STATELESS_AUTH=True, DEBUG=False)
+    def test_stateless_auth_requires_a_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                apps.get_app_config('account_admin').ready()
+        compartida = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1'}
+        with override_settings(CACHES={'default': compartida}):
+            apps.get_app_config('account_admin').ready()
+
+    def test_tokens_without_claims_fall_back_to_database(self):
+        access = str(AccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            user = self._authenticate(access)
+        self.assertEqual(user.role, 'operator')
+
+
+class TokenBlacklistTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='blacklist_test', email='blacklist@test.com', password='pass12345', role='client'
+        )
+
+    def test_blacklist_lookup_is_cached(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh.blacklist()
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RefreshToken(str(refresh))
+
+    def test_negative_lookup_is_overridden_by_revocation(self):
+        refresh = RefreshToken.for_user(self.user)
+        RefreshToken(str(refresh))  # cachea "no revocado"
+        refresh.blacklist()
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_negative_lookup_is_not_cached_in_a_per_process_cache(self):
+        refresh = RefreshToken.for_user(self.user)
+        RefreshToken(str(refresh))
+        # Revocación hecha por otro worker: no pasa por la caché local de este
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        ])
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_per_process_cache_warns_that_negatives_are_not_cached(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://x'}}
+        with override_settings(CACHES=locmem), self.assertLogs('account_admin.tokens', level='WARNING') as logs:
+            avisar_negativos_sin_cache_compartida()
+        self.assertIn('CACHE_BACKEND', logs.output[0])
+        with override_settings(CACHES=redis), self.assertNoLogs('account_admin.tokens', level='WARNING'):
+            avisar_negativos_sin_cache_compartida()
+        with override_settings(CACHES=locmem, JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS=0), \
+                self.assertNoLogs('account_admin.tokens', level='WARNING'):
+            avisar_negativos_sin_cache_compartida()
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        refresh = str(TokenObtainPairWithClaimsSerializer.get_token(self.user))
+        self.assertTrue(TokenRefreshWithClaimsSerializer(data={'refresh': refresh}).is_valid())
+        with self.assertRaises(TokenError):
+            RefreshToken(refresh)
+
+    def test_prune_command_removes_expired_tokens(self):
+        vigente = RefreshToken.for_user(self.user)
+        vencido = RefreshToken.for_user(self.user)
+        vencido.blacklist()
+        OutstandingToken.objects.filter(jti=vencido['jti']).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        out = StringIO()
+        call_command('prune_token_blacklist', '--batch-size', '1', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [vigente['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
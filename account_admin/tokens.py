@@ -0,0 +1,104 @@
+"""
+Refresh tokens con verificación de blacklist cacheada y limpieza de tokens vencidos.
+- La respuesta de "¿está en la blacklist?" se guarda por jti en la caché: los positivos
+  hasta que vence el token, los negativos por JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS.
+- Cada alta en BlacklistedToken (rotación, logout, admin) pisa la entrada con un positivo
+  (ver signals), así un negativo cacheado nunca oculta una revocación hecha en este backend.
+- Los negativos solo se cachean con una caché compartida entre workers: con una local por
+  proceso (LocMem, el default) la revocación hecha en un worker no pisaría el negativo de
+  los otros y el token rotado se podría reusar. Los positivos sí, en cualquier backend. Con la
+  configuración por defecto la caché de negativos queda apagada (aviso al iniciar): hace falta
+  CACHE_BACKEND (o JWT_BLACKLIST_CACHE_ALIAS) apuntando a Redis o Memcached.
+- `purgar_vencidos` borra en lotes los OutstandingToken vencidos (y sus BlacklistedToken por CASCADE).
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from .authentication import CACHES_POR_PROCESO
+
+logger = logging.getLogger(__name__)
+
+
+def _alias():
+    return getattr(settings, 'JWT_BLACKLIST_CACHE_ALIAS', 'default')
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def _backend():
+    return settings.CACHES.get(_alias(), {}).get('BACKEND', '')
+
+
+def _cachear_negativos():
+    return _backend() not in CACHES_POR_PROCESO and getattr(settings, 'JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS', 30) > 0
+
+
+def avisar_negativos_sin_cache_compartida():
+    """Warning al iniciar si se pidió cachear negativos pero la caché es local al proceso"""
+    if getattr(settings, 'JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS', 30) > 0 and _backend() in CACHES_POR_PROCESO:
+        logger.warning(
+            'JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS no tiene efecto: la caché "%s" usa %s, local a cada '
+            'proceso, y cada refresh consulta la blacklist en la base. Configurar CACHE_BACKEND con '
+            'Redis o Memcached, o JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS=0 para silenciar este aviso.',
+            _alias(), _backend(),
+        )
+
+
+def _clave(jti):
+    return f'jwt:blacklisted:{jti}'
+
+
+def marcar_revocado(jti, expira):
+    """Cachea la revocación hasta que el token vence (después ya no pasa la validación de exp)"""
+    segundos = int((expira - timezone.now()).total_seconds())
+    if segundos > 0:
+        _cache().set(_clave(jti), True, timeout=segundos)
+
+
+def esta_revocado(jti):
+    revocado = _cache().get(_clave(jti))
+    if revocado is None:
+        revocado = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if not revocado:
+            if not _cachear_negativos():
+                return False
+            _cache().add(
+                _clave(jti), False,
+                timeout=getattr(settings, 'JWT_BLACKLIST_NEGATIVE_CACHE_SECONDS', 30),
+            )
+        else:
+            _cache().set(_clave(jti), True, timeout=int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()))
+    return revocado
+
+
+class RefreshToken(BaseRefreshToken):
+    """RefreshToken de simplejwt con la consulta a la blacklist detrás de la caché"""
+
+    def check_blacklist(self):
+        if esta_revocado(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+
+def purgar_vencidos(batch_size=1000):
+    """Borra en lotes los tokens vencidos; devuelve cuántos OutstandingToken se eliminaron"""
+    total = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        # Primero la blacklist (CASCADE) y luego los tokens, ambos acotados al lote
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        total += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
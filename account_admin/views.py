@@ -5,11 +5,21 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from TechWave.permissions import *
 from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from django.core.paginator import Paginator
+
+# Columnas que devuelve list_users (se proyectan con .values() en vez de cargar el modelo)
+LIST_USERS_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_active',
+    'is_staff', 'is_superuser', 'date_joined', 'register_date', 'last_login',
+)
+USERS_PAGE_SIZE = getattr(settings, 'USERS_PAGE_SIZE', 50)
+USERS_MAX_PAGE_SIZE = getattr(settings, 'USERS_MAX_PAGE_SIZE', 200)
 
 # Create your views here.
 class CreateUserView(APIView):
@@ -383,7 +393,10 @@ def manage_user(request, user_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_users(request):
-    """Listar todos los usuarios - Solo para admins"""
+    """
+    Listar usuarios paginados - Solo para admins
+    Parámetros: ?role=, ?active=, ?search=, ?page=N, ?page_size=N (máximo USERS_MAX_PAGE_SIZE)
+    """
     try:
         # Verificar que el usuario actual es admin
         if not (request.user.role == 'admin' or request.user.is_superuser):
@@ -416,30 +429,31 @@ def list_users(request):
                 models.Q(last_name__icontains=search)
             )
         
-        # Ordenar por fecha de registro (más recientes primero)
-        users = users.order_by('-register_date')
-        
-        # Preparar datos de respuesta
+        # Ordenar por fecha de registro (más recientes primero; id como desempate estable)
+        users = users.order_by('-register_date', '-id').values(*LIST_USERS_FIELDS)
+
+        # Paginación en la base: COUNT en SQL y solo las filas de la página pedida
+        try:
+            page_size = min(int(request.GET.get('page_size', USERS_PAGE_SIZE)), USERS_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = USERS_PAGE_SIZE
+        paginator = Paginator(users, max(page_size, 1))
+        page = paginator.get_page(request.GET.get('page', 1))
+
+        # Preparar datos de respuesta (solo las columnas proyectadas)
         users_data = []
-        for user in users:
-            users_data.append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'role': user.role,
-                'is_active': user.is_active,
-                'is_staff': user.is_staff,
-                'is_superuser': user.is_superuser,
-                'date_joined': user.date_joined.isoformat(),
-                'register_date': user.register_date.isoformat(),
-                'last_login': user.last_login.isoformat() if user.last_login else None
-            })
+        for user in page.object_list:
+            user['date_joined'] = user['date_joined'].isoformat()
+            user['register_date'] = user['register_date'].isoformat()
+            user['last_login'] = user['last_login'].isoformat() if user['last_login'] else None
+            users_data.append(user)
         
         return Response({
             'users': users_data,
-            'total': len(users_data),
+            'total': paginator.count,
+            'page': page.number,
+            'page_size': paginator.per_page,
+            'total_pages': paginator.num_pages,
             'filters_applied': {
                 'role': role_filter,
                 'active': active_filter,
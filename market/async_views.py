@@ -0,0 +1,153 @@
+"""
+Variantes async (ASGI) de los endpoints de lectura más usados, bajo /api/market/async/:
+listado y detalle de productos, listado de categorías, tracking de envíos y my-orders.
+- Mismas respuestas que los ViewSets (mismos serializers, filtros y paginación por cursor),
+  pero como vistas async de Django: las consultas van por el ORM async y, mientras esperan
+  a la base o a un cliente lento, el worker sigue atendiendo otros requests.
+- Los serializers corren sobre datos ya cargados (select_related / prefetch), sin consultas.
+- Autenticación: las mismas clases de DRF (JWT) que el resto de la API.
+Desplegar con un servidor ASGI (ej. `gunicorn TechWave.asgi -k uvicorn.workers.UvicornWorker`).
+Bajo ASGI las vistas síncronas de DRF comparten un solo hilo por worker: conviene enrutar
+solo /api/market/async/ a los workers ASGI y el resto a gunicorn WSGI.
+Comparación de throughput: `python manage.py benchmark_concurrency`.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import catalog_cache
+from .models import Category, Order, Product, Shipment
+from .pagination import OrderCursorPagination, paginador_productos
+from .search import search_products
+from .serializer import CategorySerializer, OrderSerializer, ProductSerializer
+from .views import OrderViewSet
+
+
+def _json(data, status=200, **kwargs):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder, **kwargs)
+
+
+def _error(excepcion):
+    """Mismo cuerpo que el manejador de excepciones de DRF ({"detail": ...})"""
+    response = _json({'detail': excepcion.detail}, status=excepcion.status_code)
+    if isinstance(excepcion, exceptions.NotAuthenticated):
+        response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def _autenticar(request):
+    """Usuario según DEFAULT_AUTHENTICATION_CLASSES (JWT); None si no hay credenciales válidas"""
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            resultado = clase().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return None
+        if resultado is not None:
+            return resultado[0]
+    return None
+
+
+async def _usuario(request):
+    # La validación del token puede leer el usuario de la base (o de los claims, sin consulta)
+    usuario = await sync_to_async(_autenticar)(request)
+    request.user = usuario
+    return usuario
+
+
+async def _listar(request, queryset, paginador, serializer_class):
+    """
+    Página por cursor si el cliente la pide (?cursor= / ?page_size=; ?page= en la búsqueda), si
+    no el listado plano.
+    El paginador de DRF arma las consultas del keyset; se ejecutan vía sync_to_async, igual
+    que el resto del ORM async.
+    """
+    drf_request = Request(request)
+    contexto = {'request': drf_request}
+    try:
+        pagina = await sync_to_async(paginador.paginate_queryset)(queryset, drf_request)
+    except exceptions.APIException as e:  # cursor inválido
+        return _error(e)
+    if pagina is not None:
+        datos = serializer_class(pagina, many=True, context=contexto).data
+        return _json(paginador.get_paginated_response(datos).data)
+    objetos = [obj async for obj in queryset]
+    return _json(serializer_class(objetos, many=True, context=contexto).data)
+
+
+def _productos(request):
+    """Mismos filtros que ProductViewSet.get_queryset"""
+    queryset = Product.objects.select_related('categoria')
+    params = request.GET
+    if params.get('nombre'):
+        queryset = queryset.filter(nombre__icontains=params['nombre'])
+    if params.get('categoria'):
+        queryset = queryset.filter(categoria__id=params['categoria'])
+    if params.get('precio_min'):
+        queryset = queryset.filter(precio__gte=params['precio_min'])
+    if params.get('precio_max'):
+        queryset = queryset.filter(precio__lte=params['precio_max'])
+    if 'q' in params:
+        queryset = search_products(queryset, params['q'])
+    return queryset
+
+
+@require_safe
+async def product_list(request):
+    async def generar():
+        return await _listar(request, _productos(request), paginador_productos(request.GET), ProductSerializer)
+    return await catalog_cache.respuesta_cacheada_async(request, 'async-product', 'list', generar)
+
+
+@require_safe
+async def product_detail(request, pk):
+    async def generar():
+        producto = await Product.objects.select_related('categoria').filter(pk=pk).afirst()
+        if producto is None:
+            return _error(exceptions.NotFound())
+        return _json(ProductSerializer(producto, context={'request': Request(request)}).data)
+    return await catalog_cache.respuesta_cacheada_async(request, 'async-product', 'retrieve', generar, pk=pk)
+
+
+@require_safe
+async def category_list(request):
+    async def generar():
+        queryset = Category.objects.all()
+        if request.GET.get('nombre'):
+            queryset = queryset.filter(nombre__icontains=request.GET['nombre'])
+        return _json(CategorySerializer([c async for c in queryset], many=True).data)
+    return await catalog_cache.respuesta_cacheada_async(request, 'async-category', 'list', generar)
+
+
+@require_safe
+async def shipment_tracking(request, pk):
+    """Como ShipmentViewSet.tracking: clientes solo ven sus envíos (los ajenos dan 404)"""
+    usuario = await _usuario(request)
+    if usuario is None:
+        return _error(exceptions.NotAuthenticated())
+    queryset = Shipment.objects.all()
+    if usuario.role not in ['admin', 'operator']:
+        queryset = queryset.filter(pedido__usuario=usuario)
+    envio = await queryset.filter(pk=pk).afirst()
+    if envio is None:
+        return _error(exceptions.NotFound())
+    return _json({
+        'numero_guia': envio.numero_guia,
+        'estado': envio.estado,
+        'empresa_envio': envio.empresa_envio,
+        'fecha_entrega_estimada': envio.fecha_entrega_estimada,
+        'direccion_envio': envio.direccion_envio,
+    })
+
+
+@require_safe
+async def my_orders(request):
+    """Como OrderViewSet.my_orders: pedidos propios con detalles, paginación por cursor opcional"""
+    usuario = await _usuario(request)
+    if usuario is None:
+        return _error(exceptions.NotAuthenticated())
+    queryset = OrderViewSet._with_details(Order.objects.filter(usuario=usuario)).order_by('-fecha')
+    return await _listar(request, queryset, OrderCursorPagination(), OrderSerializer)
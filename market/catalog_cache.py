@@ -0,0 +1,182 @@
+"""
+Caché de respuestas del catálogo público (list/retrieve de categorías y productos).
+- Backend configurable con CATALOG_CACHE_ALIAS (memoria local por defecto) y vigencia CATALOG_CACHE_TTL.
+- La clave incluye los query params normalizados, así ?a=1&b=2 y ?b=2&a=1 comparten entrada.
+- Las ventas (checkout) descuentan stock sin invalidar, salvo que un producto se agote: el
+  stock que muestra el catálogo puede atrasarse hasta CATALOG_CACHE_TTL (el checkout valida
+  contra la base, así que nunca se vende de más).
+- Invalidación por versión: cada escritura de Product/Category incrementa la versión
+  y las entradas anteriores dejan de usarse (vencen solas por TTL). El incremento se hace al
+  confirmarse la transacción: antes, un lector concurrente podría cachear datos viejos
+  bajo la versión nueva.
+- Versión y contadores de aciertos/fallos viven en el mismo backend. Solo se comparten entre
+  procesos con un backend compartido (ej. Redis); con la memoria local por defecto cada
+  worker tiene los suyos y otro worker puede servir el catálogo anterior hasta CATALOG_CACHE_TTL.
+- La misma clave (que incluye la versión) es el ETag de la respuesta: If-None-Match se
+  resuelve con un 304 sin tocar la base ni el serializer, aun con la caché deshabilitada.
+- Las vistas async (market.async_views) comparten backend, versión y contadores
+  mediante respuesta_cacheada_async.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import conditional
+
+PREFIJO = 'catalog'
+CLAVE_VERSION = f'{PREFIJO}:version'
+CLAVE_HITS = f'{PREFIJO}:hits'
+CLAVE_MISSES = f'{PREFIJO}:misses'
+
+
+def ttl():
+    return getattr(settings, 'CATALOG_CACHE_TTL', 60)
+
+
+def habilitada():
+    return ttl() > 0
+
+
+def backend():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _incrementar(clave):
+    cache = backend()
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave no existe (primer uso o backend reiniciado); add evita pisar a otro proceso
+        if not cache.add(clave, 1, timeout=None):
+            return cache.incr(clave)
+        return 1
+
+
+def version():
+    return backend().get_or_set(CLAVE_VERSION, 1, timeout=None)
+
+
+def invalidar(*args, **kwargs):
+    """
+    Descarta todo el catálogo cacheado y sus ETags (acepta los argumentos de una señal).
+    Dentro de una transacción, recién cuando se confirma; si se revierte, no hace nada.
+    """
+    transaction.on_commit(lambda: _incrementar(CLAVE_VERSION))
+
+
+def estadisticas():
+    valores = backend().get_many([CLAVE_HITS, CLAVE_MISSES])
+    hits = valores.get(CLAVE_HITS, 0)
+    misses = valores.get(CLAVE_MISSES, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'version': version(),
+        'ttl': ttl(),
+    }
+
+
+def _clave(version_actual, basename, accion, pk, request):
+    params = sorted(
+        (nombre, valor)
+        for nombre in request.GET
+        for valor in request.GET.getlist(nombre)
+    )
+    # El host forma parte de la clave porque los links de paginación son absolutos
+    base = '|'.join([basename, accion, str(pk), request.get_host(), urlencode(params)])
+    return f'{PREFIJO}:{version_actual}:{hashlib.md5(base.encode()).hexdigest()}'
+
+
+def clave_respuesta(view, request):
+    return _clave(version(), view.basename, view.action, view.kwargs.get('pk', ''), request)
+
+
+# --- Variantes async (vistas ASGI de market.async_views) ------------------------
+
+async def aversion():
+    return await backend().aget_or_set(CLAVE_VERSION, 1, timeout=None)
+
+
+async def _aincrementar(clave):
+    cache = backend()
+    try:
+        return await cache.aincr(clave)
+    except ValueError:
+        if not await cache.aadd(clave, 1, timeout=None):
+            return await cache.aincr(clave)
+        return 1
+
+
+async def respuesta_cacheada_async(request, basename, accion, generar, pk=''):
+    """
+    Como CachedCatalogMixin para vistas async: `generar` es una corrutina que devuelve un
+    HttpResponse JSON. Se guarda el cuerpo ya renderizado, así un HIT no serializa nada.
+    """
+    clave = _clave(await aversion(), basename, accion, pk, request)
+    etag = conditional.etag(clave, request.META.get('HTTP_ACCEPT', ''))
+    no_modificado = conditional.no_modificado(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+    if not habilitada():
+        return conditional.con_validadores(await generar(), etag=etag)
+
+    cache = backend()
+    contenido = await cache.aget(clave)
+    if contenido is not None:
+        await _aincrementar(CLAVE_HITS)
+        response = HttpResponse(contenido, content_type='application/json')
+        response['X-Cache'] = 'HIT'
+        return conditional.con_validadores(response, etag=etag)
+
+    await _aincrementar(CLAVE_MISSES)
+    response = await generar()
+    if response.status_code == status.HTTP_200_OK:
+        await cache.aset(clave, response.content, timeout=ttl())
+    response['X-Cache'] = 'MISS'
+    return conditional.con_validadores(response, etag=etag)
+
+
+class CachedCatalogMixin:
+    """
+    Mixin para ViewSets de solo lectura pública: sirve list/retrieve desde la caché,
+    agrega el header X-Cache (HIT/MISS) y el ETag. Solo se guardan respuestas 200.
+    """
+
+    def _respuesta_cacheada(self, request, generar):
+        clave = clave_respuesta(self, request)
+        # El Accept distingue representaciones (JSON / API navegable) del mismo recurso
+        etag = conditional.etag(clave, request.META.get('HTTP_ACCEPT', ''))
+        no_modificado = conditional.no_modificado(request, etag=etag)
+        if no_modificado is not None:
+            return no_modificado
+        if not habilitada():
+            return conditional.con_validadores(generar(), etag=etag)
+
+        cache = backend()
+        datos = cache.get(clave)
+        if datos is not None:
+            _incrementar(CLAVE_HITS)
+            response = Response(datos)
+            response['X-Cache'] = 'HIT'
+            return conditional.con_validadores(response, etag=etag)
+
+        _incrementar(CLAVE_MISSES)
+        response = generar()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(clave, response.data, timeout=ttl())
+        response['X-Cache'] = 'MISS'
+        return conditional.con_validadores(response, etag=etag)
+
+    def list(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(request, lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(request, lambda: super(CachedCatalogMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,40 @@
+"""
+GET condicional (ETag / Last-Modified) para los endpoints del market.
+Los validadores se calculan con datos baratos (versión del catálogo, fechas de modificación)
+antes de serializar; si el cliente ya tiene la representación se responde 304 sin cuerpo.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def etag(*partes):
+    """ETag fuerte a partir de los valores que determinan la representación"""
+    base = '|'.join(str(parte) for parte in partes)
+    return quote_etag(hashlib.md5(base.encode()).hexdigest())
+
+
+def no_modificado(request, etag=None, last_modified=None):
+    """Respuesta 304 (o 412) si las precondiciones del cliente se cumplen; None si hay que responder"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None and response.status_code == 304:
+        # El 304 repite los validadores para que el cliente conserve su copia
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def con_validadores(response, etag=None, last_modified=None):
+    """Agrega ETag/Last-Modified a una respuesta exitosa"""
+    if response.status_code == 200:
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    return response
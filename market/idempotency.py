@@ -0,0 +1,132 @@
+"""
+Soporte del header `Idempotency-Key` para endpoints con efectos (checkout, creación de pagos).
+Un reintento con la misma clave (mismo usuario y endpoint) se responde desde la respuesta
+guardada con una sola consulta, sin repetir el trabajo transaccional.
+Cada clave guarda una huella del cuerpo: reusarla con otro contenido es un error (422), no
+un replay de la respuesta anterior.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+LARGO_MAXIMO = 255
+
+
+def ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def lease_en_curso():
+    """Vigencia de una clave en curso: si el proceso muere a mitad del request, se libera sola"""
+    return getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_LEASE', timedelta(seconds=60))
+
+
+def _serializable(valor):
+    if hasattr(valor, 'read'):  # archivo subido (multipart)
+        return [getattr(valor, 'name', ''), getattr(valor, 'size', None)]
+    return str(valor)
+
+
+def huella(request):
+    """SHA-256 del método, la ruta y el cuerpo ya parseado (JSON, form o multipart)"""
+    datos = request.data
+    if hasattr(datos, 'lists'):  # QueryDict: conservar valores repetidos
+        datos = dict(datos.lists())
+    contenido = json.dumps([request.method, request.path, datos], sort_keys=True, default=_serializable)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def _replay(guardada):
+    response = Response(guardada.respuesta, status=guardada.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(endpoint):
+    """
+    Decorador para acciones de un ViewSet. Sin header (o sin usuario autenticado) no hace nada.
+    - Clave ya completada: devuelve la respuesta guardada.
+    - Clave en curso (reintento concurrente): 409, hasta que vence su lease corto.
+    - Clave reusada con otro cuerpo: 422.
+    - Solo se guardan respuestas 2xx; si falla, la clave se libera para reintentar.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            clave = request.headers.get(HEADER)
+            if not clave or not request.user.is_authenticated:
+                return func(view, request, *args, **kwargs)
+            if len(clave) > LARGO_MAXIMO:
+                return Response(
+                    {'error': f'{HEADER} no puede superar {LARGO_MAXIMO} caracteres'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            filtro = {'usuario': request.user, 'endpoint': endpoint, 'clave': clave}
+            firma = huella(request)
+            guardada = IdempotencyKey.objects.filter(**filtro).first()
+            if guardada and guardada.expira > timezone.now():
+                if guardada.huella and guardada.huella != firma:
+                    return Response(
+                        {'error': 'La Idempotency-Key ya se usó con otro contenido'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if guardada.status_code is None:
+                    return Response(
+                        {'error': 'Ya hay una petición en curso con esta Idempotency-Key'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                return _replay(guardada)
+            if guardada:
+                guardada.delete()
+
+            # Reservar la clave antes de ejecutar, para que un reintento simultáneo no la repita
+            try:
+                with transaction.atomic():
+                    registro = IdempotencyKey.objects.create(
+                        expira=timezone.now() + lease_en_curso(), huella=firma, **filtro
+                    )
+            except IntegrityError:
+                return Response(
+                    {'error': 'Ya hay una petición en curso con esta Idempotency-Key'},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            try:
+                response = func(view, request, *args, **kwargs)
+            except Exception:
+                IdempotencyKey.objects.filter(pk=registro.pk).delete()
+                raise
+            # update()/filter: si el lease venció y otro reintento tomó la clave, no falla
+            if status.is_success(response.status_code):
+                IdempotencyKey.objects.filter(pk=registro.pk).update(
+                    status_code=response.status_code, respuesta=response.data, expira=timezone.now() + ttl()
+                )
+            else:
+                IdempotencyKey.objects.filter(pk=registro.pk).delete()
+            return response
+        return wrapper
+    return decorator
+
+
+def purgar(batch_size=1000):
+    """Borra las claves vencidas en lotes; devuelve cuántas se eliminaron"""
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expira__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
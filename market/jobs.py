@@ -0,0 +1,194 @@
+"""
+Tareas en segundo plano con cola en la base (sin broker externo).
+- `encolar(tarea, **kwargs)` inserta un BackgroundJob en la transacción en curso: si la
+  transacción se revierte, el job también (nada queda programado a medias).
+- `python manage.py run_jobs` los ejecuta con un pool de hilos. Cada hilo reclama un job
+  (SELECT ... FOR UPDATE SKIP LOCKED donde existe, más un UPDATE condicional en todas las
+  bases) con un lease de JOBS_LEASE_SECONDS; si el worker muere, el job vuelve a la cola.
+- Los errores se reintentan con backoff exponencial hasta `max_intentos`.
+- El resultado solo se registra si el job sigue reclamado con el mismo lease: si venció y
+  otro worker lo tomó, el primero no lo pisa (y en tareas atómicas sus escrituras se revierten).
+- Con JOBS_ASYNC desactivado (por defecto, y en tests) `encolar` ejecuta la tarea en el
+  momento, dentro del request, como antes de existir la cola. El push de comprobantes no pasa
+  por acá en ese modo: market.uploads lo manda a su propio hilo al confirmar la transacción.
+Las tareas se registran con @tarea('market.nombre') en market/tasks.py (importado en ready()).
+"""
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+_tareas = {}
+
+
+class LeasePerdido(Exception):
+    """El lease del job venció y otro worker lo reclamó (o lo devolvió a la cola)"""
+
+
+class Reintentar(Exception):
+    """
+    La tarea falló de forma recuperable y ya dejó registrado su estado: el worker la reintenta
+    con backoff. Ejecutando en el momento (sin cola) no se propaga al request.
+    """
+
+
+def tarea(nombre, atomica=True, max_intentos=None):
+    """
+    Registra una función como tarea. Con `atomica` sus escrituras y la marca de completado van
+    en la misma transacción (un reintento nunca repite efectos a medias); sin ella la tarea
+    maneja sus propios efectos (ej. subidas a un storage externo, que no se pueden revertir).
+    """
+    def decorator(func):
+        _tareas[nombre] = {'func': func, 'atomica': atomica, 'max_intentos': max_intentos}
+        return func
+    return decorator
+
+
+def asincronicos():
+    return getattr(settings, 'JOBS_ASYNC', False)
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, 'JOBS_LEASE_SECONDS', 300))
+
+
+def backoff(intentos):
+    """Espera antes del reintento n: base * 2^(n-1), con tope"""
+    base = getattr(settings, 'JOBS_RETRY_BASE_SECONDS', 10)
+    tope = getattr(settings, 'JOBS_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** max(intentos - 1, 0), tope))
+
+
+def encolar(nombre, demora=None, **kwargs):
+    """
+    Programa la tarea `nombre` con kwargs serializables a JSON. Devuelve el BackgroundJob, o
+    None si se ejecutó en el momento (JOBS_ASYNC desactivado; los errores se propagan).
+    """
+    definicion = _tareas.get(nombre)
+    if definicion is None:
+        raise KeyError(f'Tarea no registrada: {nombre}')
+    if not asincronicos():
+        try:
+            definicion['func'](**kwargs)
+        except Reintentar as e:
+            logger.warning('Tarea %s falló y no hay cola para reintentarla: %s', nombre, e)
+        return None
+    return BackgroundJob.objects.create(
+        tarea=nombre, argumentos=kwargs,
+        max_intentos=definicion['max_intentos'] or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+        ejecutar_desde=timezone.now() + (demora or timedelta(0)),
+    )
+
+
+def reclamar():
+    """Toma el próximo job vencido y lo marca 'ejecutando' con un lease. None si no hay"""
+    ahora = timezone.now()
+    bloqueado_hasta = ahora + _lease()
+    with transaction.atomic():
+        qs = BackgroundJob.objects.filter(estado='pendiente', ejecutar_desde__lte=ahora).order_by('ejecutar_desde', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        job = qs.first()
+        if job is None:
+            return None
+        # Sin SKIP LOCKED (SQLite) dos hilos pueden leer el mismo job: gana el primer UPDATE
+        reclamado = BackgroundJob.objects.filter(pk=job.pk, estado='pendiente').update(
+            estado='ejecutando', intentos=job.intentos + 1, bloqueado_hasta=bloqueado_hasta, actualizado=ahora
+        )
+    if not reclamado:
+        return None
+    job.estado, job.intentos, job.bloqueado_hasta = 'ejecutando', job.intentos + 1, bloqueado_hasta
+    return job
+
+
+def _con_lease(job):
+    """El job solo si sigue siendo nuestro: 'ejecutando' con el lease que tomó `reclamar`"""
+    return BackgroundJob.objects.filter(pk=job.pk, estado='ejecutando', bloqueado_hasta=job.bloqueado_hasta)
+
+
+def ejecutar(job):
+    """Corre un job reclamado y registra el resultado (completado, reintento o fallido)"""
+    definicion = _tareas.get(job.tarea)
+    try:
+        if definicion is None:
+            raise KeyError(f'Tarea no registrada: {job.tarea}')
+        with transaction.atomic() if definicion['atomica'] else nullcontext():
+            definicion['func'](**job.argumentos)
+            completado = _con_lease(job).update(
+                estado='completado', error='', bloqueado_hasta=None, actualizado=timezone.now()
+            )
+            if not completado:
+                # Atómica: sus escrituras se revierten. Sin atomic ya hizo sus efectos, que
+                # tienen que tolerar repetirse (ej. subir_comprobante reintenta la misma subida)
+                raise LeasePerdido(job.pk)
+        job.estado = 'completado'
+    except LeasePerdido:
+        logger.warning('Job %s (%s) perdió su lease: otro worker se encarga del resultado', job.pk, job.tarea)
+    except Exception as e:
+        ahora = timezone.now()
+        if job.intentos >= job.max_intentos:
+            logger.exception('Job %s (%s) falló definitivamente tras %d intentos', job.pk, job.tarea, job.intentos)
+            job.estado = 'fallido'
+            cambios = {'estado': 'fallido'}
+        else:
+            logger.warning('Job %s (%s) falló (intento %d): %s', job.pk, job.tarea, job.intentos, e)
+            job.estado = 'pendiente'
+            cambios = {'estado': 'pendiente', 'ejecutar_desde': ahora + backoff(job.intentos)}
+        _con_lease(job).update(
+            error=repr(e)[:2000], bloqueado_hasta=None, actualizado=ahora, **cambios
+        )
+    return job
+
+
+def procesar_pendientes(limite=None):
+    """Ejecuta en este hilo los jobs vencidos hasta vaciar la cola (o `limite`). Devuelve cuántos"""
+    procesados = 0
+    while limite is None or procesados < limite:
+        job = reclamar()
+        if job is None:
+            break
+        ejecutar(job)
+        procesados += 1
+    return procesados
+
+
+def recuperar_vencidos():
+    """
+    Devuelve a la cola los jobs cuyo lease venció (el worker que los tenía murió o se colgó).
+    Los que ya agotaron sus intentos quedan 'fallido': un job que tumba al worker no se
+    reintenta para siempre, porque en ese caso nunca llega a registrar su error.
+    """
+    ahora = timezone.now()
+    vencidos = BackgroundJob.objects.filter(estado='ejecutando', bloqueado_hasta__lt=ahora)
+    agotados = vencidos.filter(intentos__gte=F('max_intentos')).update(
+        estado='fallido', bloqueado_hasta=None, actualizado=ahora,
+        error=f'Lease vencido en el intento final ({_lease().total_seconds():.0f}s sin terminar)',
+    )
+    if agotados:
+        logger.error('%d jobs agotaron sus intentos con el lease vencido', agotados)
+    return vencidos.filter(intentos__lt=F('max_intentos')).update(
+        estado='pendiente', bloqueado_hasta=None, ejecutar_desde=ahora, actualizado=ahora
+    )
+
+
+def purgar_completados(antiguedad=None, batch_size=1000):
+    """Borra por lotes los jobs completados hace más de `antiguedad`"""
+    antiguedad = antiguedad or getattr(settings, 'JOBS_KEEP_COMPLETED', timedelta(days=7))
+    limite = timezone.now() - antiguedad
+    eliminados = 0
+    while True:
+        ids = list(
+            BackgroundJob.objects.filter(estado='completado', actualizado__lt=limite)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return eliminados
+        eliminados += BackgroundJob.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,117 @@
+import json
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from account_admin.models import User
+from market.models import Cart, Pay, Product
+
+
+class _Rollback(Exception):
+    """Descarta todo lo que escribió el benchmark (pedidos, carritos, usuarios)"""
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p entre 0 y 100)"""
+    ordenados = sorted(valores)
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recorre los endpoints más usados con el cliente de test de Django y reporta latencia p50/p95 "
+        "y queries por endpoint. Corre dentro de una transacción que se descarta al terminar, con la "
+        "caché del catálogo deshabilitada (mide siempre el camino a la base). "
+        "Con --max-p95-ms / --max-queries falla si algún endpoint los supera (gate de regresiones)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--search', default='lorem', help="Texto para ?q= en la búsqueda de productos")
+        parser.add_argument('--max-p95-ms', type=float, default=None)
+        parser.add_argument('--max-queries', type=int, default=None)
+        parser.add_argument('--json', action='store_true', help="Salida en JSON")
+
+    def handle(self, *args, **options):
+        productos = list(Product.objects.filter(stock__gte=10).order_by('id').values_list('id', flat=True)[:100])
+        if not productos:
+            raise CommandError("No hay productos con stock: correr antes `seed_data`")
+
+        self.muestras = {}
+        try:
+            # Sin caché del catálogo: la invalidación espera al commit, que acá nunca llega, y
+            # después de la primera vuelta todo serían HITs armados con filas que se descartan
+            with override_settings(ALLOWED_HOSTS=['*'], CATALOG_CACHE_TTL=0), transaction.atomic():
+                self._recorrer(options, productos)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        resultados = {
+            endpoint: {
+                'n': len(m['ms']),
+                'p50_ms': round(percentil(m['ms'], 50), 2),
+                'p95_ms': round(percentil(m['ms'], 95), 2),
+                'max_queries': max(m['queries']),
+            }
+            for endpoint, m in self.muestras.items()
+        }
+        self._reportar(resultados, options['json'])
+
+        excedidos = [
+            endpoint for endpoint, r in resultados.items()
+            if (options['max_p95_ms'] is not None and r['p95_ms'] > options['max_p95_ms'])
+            or (options['max_queries'] is not None and r['max_queries'] > options['max_queries'])
+        ]
+        if excedidos:
+            raise CommandError(f"Presupuesto excedido en: {', '.join(excedidos)}")
+
+    def _medir(self, endpoint, client, metodo, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            inicio = time.perf_counter()
+            response = getattr(client, metodo)(url, **kwargs)
+            ms = (time.perf_counter() - inicio) * 1000
+        if response.status_code >= 400:
+            raise CommandError(f"{endpoint} respondió {response.status_code}: {getattr(response, 'data', '')}")
+        muestra = self.muestras.setdefault(endpoint, {'ms': [], 'queries': []})
+        muestra['ms'].append(ms)
+        muestra['queries'].append(len(queries))
+        return response
+
+    def _recorrer(self, options, productos):
+        cliente = User.objects.create_user(username='benchmark_client', password='benchmark123', role='client')
+        admin = User.objects.create_user(username='benchmark_admin', password='benchmark123', role='admin')
+        anonimo, cliente_api, admin_api = APIClient(), APIClient(), APIClient()
+        cliente_api.force_authenticate(user=cliente)
+        admin_api.force_authenticate(user=admin)
+        Cart.objects.get_or_create(usuario=cliente)
+
+        for i in range(options['iterations']):
+            producto_id = productos[i % len(productos)]
+            self._medir('product-list', anonimo, 'get', reverse('product-list'), data={'page_size': 20})
+            self._medir('product-search', anonimo, 'get', reverse('product-list'),
+                        data={'q': options['search'], 'page_size': 20})
+            self._medir('add-to-cart', cliente_api, 'post',
+                        reverse('product-add-to-cart', args=[producto_id]), data={'cantidad': 1})
+            self._medir('cart-view', cliente_api, 'get', reverse('cart-list'))
+            respuesta = self._medir('checkout', cliente_api, 'post', reverse('cart-checkout'))
+            self._medir('my-orders', cliente_api, 'get', reverse('order-my-orders'), data={'page_size': 20})
+            pago = Pay.objects.create(pedido_id=respuesta.data['pedido_id'], metodo='transferencia',
+                                      estado='en_revision')
+            self._medir('pay-review-list', admin_api, 'get', reverse('pay-list'), data={'estado': 'en_revision'})
+            self._medir('pay-complete', admin_api, 'post', reverse('pay-complete', args=[pago.id]))
+
+    def _reportar(self, resultados, como_json):
+        if como_json:
+            self.stdout.write(json.dumps(resultados, indent=2))
+            return
+        self.stdout.write(f"{'endpoint':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}")
+        for endpoint, r in resultados.items():
+            self.stdout.write(
+                f"{endpoint:<18}{r['n']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['max_queries']:>9}"
+            )
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market.management.commands.benchmark import percentil
+from market.models import Product
+
+# endpoint -> (ruta WSGI (ViewSets de DRF), ruta ASGI (market.async_views), requiere token)
+ENDPOINTS = {
+    'product-list': ('/api/market/model/products/?page_size=20', '/api/market/async/products/?page_size=20', False),
+    'product-detail': ('/api/market/model/products/{product}/', '/api/market/async/products/{product}/', False),
+    'category-list': ('/api/market/model/categories/', '/api/market/async/categories/', False),
+    'shipment-tracking': ('/api/market/model/shipment/{shipment}/tracking/',
+                          '/api/market/async/shipment/{shipment}/tracking/', True),
+    'my-orders': ('/api/market/model/orders/my-orders/?page_size=20',
+                  '/api/market/async/orders/my-orders/?page_size=20', True),
+}
+
+
+async def _leer_respuesta(reader):
+    """Status y cuerpo de una respuesta HTTP/1.1 (Content-Length o chunked); cierra si lo pide el server"""
+    linea = await reader.readline()
+    if not linea:
+        raise ConnectionError('El servidor cerró la conexión')
+    status = int(linea.split()[1])
+    headers = {}
+    while True:
+        linea = await reader.readline()
+        if linea in (b'\r\n', b'\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        headers[nombre.strip().lower()] = valor.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            largo = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(largo + 2)
+            if largo == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def _cliente(host, puerto, peticion, fin, latencias, errores):
+    """Un cliente con conexión keep-alive que repite la petición hasta `fin`"""
+    reader = writer = None
+    while time.monotonic() < fin:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, puerto)
+            inicio = time.perf_counter()
+            writer.write(peticion)
+            await writer.drain()
+            status, cerrar = await _leer_respuesta(reader)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if status >= 400:
+                errores.append(status)
+            if cerrar:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errores.append('conexion')
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def _carga(url, token, concurrencia, duracion):
+    partes = urlsplit(url)
+    if partes.scheme != 'http':
+        raise CommandError(f"Solo se soporta http:// ({url})")
+    ruta = partes.path + (f'?{partes.query}' if partes.query else '')
+    cabeceras = [f'GET {ruta} HTTP/1.1', f'Host: {partes.netloc}', 'Accept: application/json']
+    if token:
+        cabeceras.append(f'Authorization: Bearer {token}')
+    peticion = ('\r\n'.join(cabeceras) + '\r\n\r\n').encode()
+
+    latencias, errores = [], []
+    inicio = time.monotonic()
+    await asyncio.gather(*[
+        _cliente(partes.hostname, partes.port or 80, peticion, inicio + duracion, latencias, errores)
+        for _ in range(concurrencia)
+    ])
+    transcurrido = time.monotonic() - inicio
+    return {
+        'requests': len(latencias),
+        'rps': round(len(latencias) / transcurrido, 1),
+        'p50_ms': round(percentil(latencias, 50), 2) if latencias else None,
+        'p95_ms': round(percentil(latencias, 95), 2) if latencias else None,
+        'errores': len(errores),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput bajo concurrencia de los endpoints de lectura entre el despliegue "
+        "WSGI (gunicorn, ViewSets de DRF) y el ASGI (market.async_views), contra servidores ya levantados. "
+        "Ej.: gunicorn TechWave.wsgi -w 4 -b :8000 y gunicorn TechWave.asgi -w 4 -k uvicorn.workers.UvicornWorker -b :8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+        parser.add_argument('--concurrency', type=int, default=50, help="Clientes simultáneos por endpoint")
+        parser.add_argument('--duration', type=float, default=10.0, help="Segundos por endpoint y despliegue")
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+        parser.add_argument('--token', default='', help="Access token JWT para tracking y my-orders (sin él se omiten)")
+        parser.add_argument('--product-id', type=int, default=None, help="Por defecto, el primer producto")
+        parser.add_argument('--shipment-id', type=int, default=None, help="Sin él se omite tracking")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON")
+
+    def handle(self, *args, **options):
+        producto = options['product_id'] or Product.objects.order_by('id').values_list('id', flat=True).first()
+        ids = {'product': producto, 'shipment': options['shipment_id']}
+        despliegues = {'wsgi': options['wsgi_url'].rstrip('/'), 'asgi': options['asgi_url'].rstrip('/')}
+
+        resultados = {}
+        for endpoint in options['endpoints']:
+            ruta_wsgi, ruta_asgi, requiere_token = ENDPOINTS[endpoint]
+            if requiere_token and not options['token']:
+                continue
+            if ('{product}' in ruta_wsgi and not producto) or ('{shipment}' in ruta_wsgi and not ids['shipment']):
+                continue
+            resultados[endpoint] = {
+                despliegue: asyncio.run(_carga(
+                    base + ruta.format(**ids), options['token'], options['concurrency'], options['duration']
+                ))
+                for (despliegue, base), ruta in zip(despliegues.items(), (ruta_wsgi, ruta_asgi))
+            }
+        if not resultados:
+            raise CommandError("No hay endpoints para medir (faltan productos, --token o --shipment-id)")
+        self._reportar(resultados, options['json'])
+
+    def _reportar(self, resultados, como_json):
+        if como_json:
+            self.stdout.write(json.dumps(resultados, indent=2))
+            return
+        self.stdout.write(
+            f"{'endpoint':<19}{'deploy':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errores':>9}"
+        )
+        for endpoint, por_despliegue in resultados.items():
+            for despliegue, r in por_despliegue.items():
+                self.stdout.write(
+                    f"{endpoint:<19}{despliegue:>7}{r['rps']:>10.1f}{r['p50_ms'] or 0:>10.2f}"
+                    f"{r['p95_ms'] or 0:>10.2f}{r['errores']:>9}"
+                )
+            if por_despliegue['wsgi']['rps']:
+                self.stdout.write(f"{'':<19}{'asgi/wsgi':>9} x{por_despliegue['asgi']['rps'] / por_despliegue['wsgi']['rps']:.2f}")
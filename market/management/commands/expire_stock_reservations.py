@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from market.reservations import expirar
+
+
+class Command(BaseCommand):
+    help = "Elimina las reservas de stock vencidas (una vez o periódicamente con --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Repetir indefinidamente cada --interval segundos")
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            eliminadas = expirar(batch_size=options['batch_size'])
+            self.stdout.write(f"Reservas vencidas eliminadas: {eliminadas}")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
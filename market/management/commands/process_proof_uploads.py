@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from market.uploads import purgar_abandonadas, reintentar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reintenta subir al storage los comprobantes fallidos o colgados y borra las subidas "
+        "abandonadas (una vez o periódicamente con --loop)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Repetir indefinidamente cada --interval segundos")
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            completadas = reintentar()
+            eliminadas = purgar_abandonadas()
+            self.stdout.write(f"Comprobantes subidos: {completadas}, subidas abandonadas eliminadas: {eliminadas}")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from market.idempotency import purgar
+
+
+class Command(BaseCommand):
+    help = "Elimina las Idempotency-Key vencidas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        eliminadas = purgar(batch_size=options['batch_size'])
+        self.stdout.write(f"Claves vencidas eliminadas: {eliminadas}")
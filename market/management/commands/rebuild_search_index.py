@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from market.search import rebuild_index, usa_postgres
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice local de búsqueda de productos (no necesario en Postgres)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if usa_postgres():
+            self.stdout.write("Postgres usa full-text nativo; no hay índice local que reconstruir.")
+            return
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Índice reconstruido para {total} productos."))
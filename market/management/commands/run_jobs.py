@@ -0,0 +1,58 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from market import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de tareas en base de datos (market.jobs): ejecuta los jobs pendientes "
+        "con un pool de hilos. Con --once procesa lo que haya y termina"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None, help="Por defecto JOBS_WORKER_THREADS (con SQLite conviene 1: un solo escritor)")
+        parser.add_argument('--once', action='store_true', help="Vaciar la cola una vez y salir")
+        parser.add_argument('--interval', type=float, default=1.0, help="Espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            jobs.recuperar_vencidos()
+            procesados = jobs.procesar_pendientes()
+            self.stdout.write(f"Jobs procesados: {procesados}")
+            return
+
+        hilos = options['threads'] or getattr(settings, 'JOBS_WORKER_THREADS', 4)
+        detener = threading.Event()
+        workers = [
+            threading.Thread(target=self._trabajar, args=(detener, options['interval']), name=f'jobs-{i}', daemon=True)
+            for i in range(hilos)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Worker de jobs iniciado con {hilos} hilos")
+        try:
+            while True:
+                # Mantenimiento: jobs de workers caídos vuelven a la cola, los completados viejos se borran
+                jobs.recuperar_vencidos()
+                jobs.purgar_completados()
+                close_old_connections()
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo: se terminan los jobs en curso")
+            detener.set()
+            for worker in workers:
+                worker.join()
+
+    def _trabajar(self, detener, intervalo):
+        try:
+            while not detener.is_set():
+                close_old_connections()
+                if not jobs.procesar_pendientes(limite=10):
+                    detener.wait(intervalo)
+        finally:
+            connection.close()  # la conexión es de este hilo
@@ -0,0 +1,188 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from faker import Faker
+
+from account_admin.models import User
+from market import catalog_cache
+from market.models import (
+    Cart, CartItem, Category, Favorite, Order, OrderDetail, Pay, Product, ProductSearchTerm, Shipment,
+)
+from market.search import rebuild_index, usa_postgres
+
+ESTADOS_CON_PAGO = {
+    'en_revision': 'en_revision', 'pagado': 'completado', 'preparando': 'completado',
+    'enviado': 'completado', 'entregado': 'completado', 'cancelado': 'fallido',
+}
+ESTADOS_CON_ENVIO = {'enviado': 'en camino', 'entregado': 'entregado'}
+PREFIJO_USUARIOS = 'seed_user_'
+# Tablas que llena el seed, en orden de borrado (hijos antes que padres)
+MODELOS_SEED = (Favorite, CartItem, Cart, Shipment, Pay, OrderDetail, Order, ProductSearchTerm, Product, Category)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un dataset reproducible (misma --seed, mismos datos) con inserts en bloque: "
+        "categorías, productos, usuarios, carritos, pedidos con detalles, pagos, envíos y favoritos. "
+        "Para volver a correrlo sobre la misma base, --flush borra antes el catálogo, los pedidos y los "
+        "usuarios de un seed anterior (solo para bases de desarrollo o benchmark)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=5_000)
+        parser.add_argument('--orders', type=int, default=20_000)
+        parser.add_argument('--carts', type=int, default=None, help="Por defecto, la mitad de los usuarios")
+        parser.add_argument('--favorites-per-user', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--flush', action='store_true',
+                            help="Borra catálogo, carritos, pedidos, favoritos y usuarios seed_user_* antes de generar")
+        parser.add_argument('--no-input', '--noinput', action='store_false', dest='interactive',
+                            help="No pedir confirmación para --flush")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('es_ES')
+        self.fake.seed_instance(options['seed'])
+
+        if options['flush'] and options['interactive']:
+            respuesta = input(
+                "Se borrarán TODOS los productos, categorías, carritos, pedidos, pagos, envíos y favoritos, "
+                f"y los usuarios {PREFIJO_USUARIOS}*. Escriba 'si' para continuar: "
+            )
+            if respuesta.strip().lower() not in ('si', 'sí'):
+                raise CommandError("Cancelado")
+
+        try:
+            with transaction.atomic():
+                if options['flush']:
+                    self._vaciar()
+                categorias = self._categorias(options['categories'])
+                productos = self._productos(options['products'], categorias)
+                usuarios = self._usuarios(options['users'])
+                carritos = options['carts'] if options['carts'] is not None else len(usuarios) // 2
+                self._carritos(usuarios[:carritos], productos)
+                self._pedidos(options['orders'], usuarios, productos)
+                self._favoritos(usuarios, productos, options['favorites_per_user'])
+        except IntegrityError as e:
+            # Misma --seed sobre una base ya sembrada: categorías y usuarios repetidos
+            raise CommandError(f"La base ya tiene datos de un seed anterior ({e}); volver a correr con --flush")
+
+        # Los inserts en bloque no disparan señales: índice de búsqueda y caché del catálogo a mano
+        if not usa_postgres():
+            rebuild_index(batch_size=self.batch_size)
+        catalog_cache.invalidar()
+        self.stdout.write(self.style.SUCCESS("Dataset generado"))
+
+    def _vaciar(self):
+        for modelo in MODELOS_SEED:
+            borrados, _ = modelo.objects.all().delete()
+            self.stdout.write(f"{modelo._meta.verbose_name_plural} borrados: {borrados}")
+        borrados, _ = User.objects.filter(username__startswith=PREFIJO_USUARIOS).delete()
+        self.stdout.write(f"Usuarios del seed borrados: {borrados}")
+
+    def _insertar(self, modelo, objetos):
+        """bulk_create por lotes; devuelve los pks (releídos si la base no los informa, ej. MySQL)"""
+        if not objetos:
+            return []
+        modelo.objects.bulk_create(objetos, batch_size=self.batch_size)
+        if objetos[0].pk is not None:
+            pks = [obj.pk for obj in objetos]
+        else:
+            pks = sorted(modelo.objects.order_by('-pk').values_list('pk', flat=True)[:len(objetos)])
+        self.stdout.write(f"{modelo._meta.verbose_name_plural}: {len(pks)}")
+        return pks
+
+    def _categorias(self, cantidad):
+        return self._insertar(Category, [
+            Category(nombre=f"{self.fake.word().capitalize()} {i}", descripcion=self.fake.sentence())
+            for i in range(cantidad)
+        ])
+
+    def _productos(self, cantidad, categorias):
+        return self._insertar(Product, [
+            Product(
+                nombre=self.fake.catch_phrase()[:250],
+                descripcion=self.fake.text(max_nb_chars=200),
+                precio=Decimal(self.random.randint(100, 500_000)) / 100,
+                stock=self.random.randint(50, 500),
+                categoria_id=self.random.choice(categorias),
+            )
+            for _ in range(cantidad)
+        ])
+
+    def _usuarios(self, cantidad):
+        # Un solo hash para todos: hashear por usuario domina el tiempo de carga
+        password = make_password('benchmark123')
+        return self._insertar(User, [
+            User(
+                username=f"{PREFIJO_USUARIOS}{i}", email=f"{PREFIJO_USUARIOS}{i}@example.com", password=password,
+                first_name=self.fake.first_name(), last_name=self.fake.last_name(), role='client',
+                address=self.fake.address(),
+            )
+            for i in range(cantidad)
+        ])
+
+    def _carritos(self, usuarios, productos):
+        carritos = self._insertar(Cart, [Cart(usuario_id=usuario_id) for usuario_id in usuarios])
+        self._insertar(CartItem, [
+            CartItem(carrito_id=carrito_id, producto_id=producto_id, cantidad=self.random.randint(1, 3))
+            for carrito_id in carritos
+            for producto_id in self.random.sample(productos, k=min(self.random.randint(1, 4), len(productos)))
+        ])
+
+    def _pedidos(self, cantidad, usuarios, productos):
+        estados = [codigo for codigo, _ in Order.ESTADOS]
+        precios = dict(Product.objects.filter(pk__in=productos).values_list('pk', 'precio'))
+        lineas_por_pedido = [
+            [
+                (producto_id, self.random.randint(1, 3))
+                for producto_id in self.random.sample(productos, k=min(self.random.randint(1, 5), len(productos)))
+            ]
+            for _ in range(cantidad)
+        ]
+        pedidos = [
+            Order(
+                usuario_id=self.random.choice(usuarios),
+                estado=self.random.choice(estados),
+                total=sum(precios[producto_id] * cant for producto_id, cant in lineas),
+                direccion_envio=self.fake.address(),
+            )
+            for lineas in lineas_por_pedido
+        ]
+        pedido_ids = self._insertar(Order, pedidos)
+
+        self._insertar(OrderDetail, [
+            OrderDetail(pedido_id=pedido_id, producto_id=producto_id, cantidad=cant, subtotal=precios[producto_id] * cant)
+            for pedido_id, lineas in zip(pedido_ids, lineas_por_pedido)
+            for producto_id, cant in lineas
+        ])
+        self._insertar(Pay, [
+            Pay(
+                pedido_id=pedido_id, metodo=self.random.choice(['tarjeta', 'paypal', 'transferencia']),
+                monto_pagado=pedido.total, estado=ESTADOS_CON_PAGO[pedido.estado],
+            )
+            for pedido_id, pedido in zip(pedido_ids, pedidos) if pedido.estado in ESTADOS_CON_PAGO
+        ])
+        self._insertar(Shipment, [
+            Shipment(
+                pedido_id=pedido_id, direccion_envio=pedido.direccion_envio, empresa_envio=self.fake.company()[:100],
+                numero_guia=f"TW{pedido_id:010d}", estado=ESTADOS_CON_ENVIO[pedido.estado],
+            )
+            for pedido_id, pedido in zip(pedido_ids, pedidos) if pedido.estado in ESTADOS_CON_ENVIO
+        ])
+
+    def _favoritos(self, usuarios, productos, por_usuario):
+        favoritos = [
+            Favorite(user_id=usuario_id, product_id=producto_id)
+            for usuario_id in usuarios
+            for producto_id in self.random.sample(productos, k=min(self.random.randint(0, por_usuario), len(productos)))
+        ]
+        Favorite.objects.bulk_create(favoritos, batch_size=self.batch_size, ignore_conflicts=True)
+        self.stdout.write(f"Favoritos: {len(favoritos)}")
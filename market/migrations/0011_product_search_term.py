@@ -0,0 +1,90 @@
+# Generated by Django 5.2 on 2026-10-18 02:32
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Debe coincidir con el vector de market.search._search_postgres para que el planner use el índice
+PG_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS market_product_search_gin ON market_product USING GIN (("
+    "setweight(to_tsvector('spanish'::regconfig, COALESCE((nombre)::text, '')), 'A') || "
+    "setweight(to_tsvector('spanish'::regconfig, COALESCE((descripcion)::text, '')), 'B')))"
+)
+
+
+# Copia congelada de market.search (tokenize y pesos a la fecha de esta migración): la
+# migración debe dar siempre el mismo resultado aunque el módulo cambie después
+PESO_NOMBRE = 3
+PESO_DESCRIPCION = 1
+LARGO_MAXIMO = 64
+STOPWORDS = {
+    'de', 'la', 'el', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'en',
+    'con', 'para', 'por', 'del', 'al', 'que', 'se', 'su', 'sus', 'es', 'lo',
+}
+BATCH_SIZE = 1000
+
+
+def tokenize(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return [
+        t[:LARGO_MAXIMO] for t in re.findall(r'\w+', texto)
+        if len(t) > 1 and t not in STOPWORDS
+    ]
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(PG_INDEX_SQL)
+        return
+    # Resto de bases: poblar el índice local con los productos existentes, por lotes
+    Product = apps.get_model('market', 'Product')
+    ProductSearchTerm = apps.get_model('market', 'ProductSearchTerm')
+    lote = []
+    productos = Product.objects.only('id', 'nombre', 'descripcion').order_by('id')
+    for producto in productos.iterator(chunk_size=BATCH_SIZE):
+        pesos = {}
+        for termino in tokenize(producto.nombre):
+            pesos[termino] = pesos.get(termino, 0) + PESO_NOMBRE
+        for termino in tokenize(producto.descripcion):
+            pesos[termino] = pesos.get(termino, 0) + PESO_DESCRIPCION
+        lote.extend(
+            ProductSearchTerm(producto_id=producto.id, termino=termino, peso=peso)
+            for termino, peso in pesos.items()
+        )
+        if len(lote) >= BATCH_SIZE:
+            ProductSearchTerm.objects.bulk_create(lote, batch_size=BATCH_SIZE)
+            lote = []
+    ProductSearchTerm.objects.bulk_create(lote, batch_size=BATCH_SIZE)
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS market_product_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0010_product_imagen_alter_order_estado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(db_index=True, max_length=64)),
+                ('peso', models.PositiveIntegerField(default=1)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='market.product')),
+            ],
+            options={
+                'verbose_name': 'Product Search Term',
+                'verbose_name_plural': 'Product Search Terms',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'termino'), name='uniq_search_term_producto')],
+            },
+        ),
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-18 03:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Índices parciales (Postgres y SQLite; MySQL no los soporta y sigue con la validación en Pay.save)
+INDICES_PARCIALES = {
+    # A lo sumo un pago abierto por pedido: reemplaza el exists() de Pay.save
+    'pay_pedido_abierto_uniq': (
+        "CREATE UNIQUE INDEX IF NOT EXISTS pay_pedido_abierto_uniq ON market_pay (pedido_id) "
+        "WHERE estado IN ('pendiente', 'en_revision')"
+    ),
+    # Cola de pedidos sin pagar que revisan los operadores
+    'order_abierto_fecha_idx': (
+        "CREATE INDEX IF NOT EXISTS order_abierto_fecha_idx ON market_order (fecha) "
+        "WHERE estado IN ('pendiente', 'en_revision')"
+    ),
+}
+
+
+def cerrar_pagos_abiertos_duplicados(apps, schema_editor):
+    """
+    El exists() de Pay.save tenía carrera: puede haber pedidos con más de un pago abierto, y el
+    índice único no se crearía. Queda el más reciente; los demás pasan a 'fallido'.
+    """
+    Pay = apps.get_model('market', 'Pay')
+    abiertos = Pay.objects.filter(estado__in=['pendiente', 'en_revision'])
+    duplicados = (
+        abiertos.values('pedido_id').annotate(cantidad=models.Count('id')).filter(cantidad__gt=1)
+        .values_list('pedido_id', flat=True)
+    )
+    for pedido_id in list(duplicados):
+        ids = list(abiertos.filter(pedido_id=pedido_id).order_by('-creado', '-id').values_list('id', flat=True))
+        Pay.objects.filter(pk__in=ids[1:]).update(estado='fallido')
+
+
+def crear_indices_parciales(apps, schema_editor):
+    if not schema_editor.connection.features.supports_partial_indexes:
+        return
+    for sql in INDICES_PARCIALES.values():
+        schema_editor.execute(sql)
+
+
+def eliminar_indices_parciales(apps, schema_editor):
+    if not schema_editor.connection.features.supports_partial_indexes:
+        return
+    for nombre in INDICES_PARCIALES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0013_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['usuario', '-fecha'], name='order_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['estado'], name='order_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pay',
+            index=models.Index(fields=['pedido', 'estado'], name='pay_pedido_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pay',
+            index=models.Index(fields=['estado', '-creado'], name='pay_estado_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['categoria', 'precio'], name='product_categoria_precio_idx'),
+        ),
+        migrations.RunPython(cerrar_pagos_abiertos_duplicados, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices_parciales, eliminar_indices_parciales),
+    ]
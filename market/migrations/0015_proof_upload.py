@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 03:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0014_filter_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProofUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('recibido', models.PositiveBigIntegerField(default=0)),
+                ('ruta_temporal', models.CharField(max_length=500)),
+                ('estado', models.CharField(choices=[('recibiendo', 'Recibiendo'), ('subiendo', 'Subiendo al storage'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='recibiendo', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('pago', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to='market.pay')),
+            ],
+            options={
+                'verbose_name': 'Proof Upload',
+                'verbose_name_plural': 'Proof Uploads',
+                'indexes': [models.Index(fields=['estado', 'actualizado'], name='proofupload_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0016_background_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='huella',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
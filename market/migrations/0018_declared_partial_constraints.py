@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+# La 0014 creaba estos índices parciales con SQL a mano; ahora los declaran los modelos
+# (Pay.Meta.constraints y Order.Meta.indexes) y Django los crea y los nombra igual
+INDICES_MANUALES = {
+    'pay_pedido_abierto_uniq': (
+        "CREATE UNIQUE INDEX IF NOT EXISTS pay_pedido_abierto_uniq ON market_pay (pedido_id) "
+        "WHERE estado IN ('pendiente', 'en_revision')"
+    ),
+    'order_abierto_fecha_idx': (
+        "CREATE INDEX IF NOT EXISTS order_abierto_fecha_idx ON market_order (fecha) "
+        "WHERE estado IN ('pendiente', 'en_revision')"
+    ),
+}
+
+
+def eliminar_indices_manuales(apps, schema_editor):
+    if not schema_editor.connection.features.supports_partial_indexes:
+        return
+    for nombre in INDICES_MANUALES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+def recrear_indices_manuales(apps, schema_editor):
+    if not schema_editor.connection.features.supports_partial_indexes:
+        return
+    for sql in INDICES_MANUALES.values():
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0017_idempotencykey_huella'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_indices_manuales, recrear_indices_manuales),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'en_revision'])), fields=['fecha'], name='order_abierto_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pay',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ('pendiente', 'en_revision'))), fields=('pedido',), name='pay_pedido_abierto_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+def marcar_cancelados(apps, schema_editor):
+    """
+    Los pedidos ya cancelados devolvieron su stock al cancelarse, salvo que su job de
+    restitución siga en la cola: esos quedan sin marcar para que el job lo haga.
+    """
+    Order = apps.get_model('market', 'Order')
+    BackgroundJob = apps.get_model('market', 'BackgroundJob')
+    en_cola = {
+        argumentos.get('pedido_id')
+        for argumentos in BackgroundJob.objects.filter(
+            tarea='market.restituir_stock', estado__in=['pendiente', 'ejecutando']
+        ).values_list('argumentos', flat=True)
+    }
+    Order.objects.filter(estado='cancelado').exclude(pk__in=[pk for pk in en_cola if pk is not None]).update(
+        stock_restituido=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0018_declared_partial_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_restituido',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(marcar_cancelados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0019_order_stock_restituido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='proofupload',
+            name='estado',
+            field=models.CharField(choices=[('recibiendo', 'Recibiendo'), ('subiendo', 'Subiendo al storage'), ('enviando', 'Enviando al storage'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='recibiendo', max_length=20),
+        ),
+    ]
@@ -1,10 +1,19 @@
-from django.db import models
+from decimal import Decimal
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from account_admin.models import User
+from . import catalog_cache
 
 # Create your models here.
+
+# Marca para instancias de Order cuyo estado original no se conoce (no vienen de la base)
+_ESTADO_DESCONOCIDO = object()
+
 class Category(models.Model):
     nombre = models.CharField(max_length=110, unique=True)
     descripcion = models.TextField(blank=True)
@@ -31,6 +40,26 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Product"  
         verbose_name_plural = "Products"  
+        indexes = [
+            # Filtro por categoría + rango de precio del listado
+            models.Index(fields=['categoria', 'precio'], name='product_categoria_precio_idx'),
+        ]
+
+class ProductSearchTerm(models.Model):
+    """Índice invertido local (término -> producto) usado por la búsqueda cuando la base no es Postgres"""
+    producto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    termino = models.CharField(max_length=64, db_index=True)
+    peso = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.termino} -> {self.producto_id}"
+
+    class Meta:
+        verbose_name = "Product Search Term"
+        verbose_name_plural = "Product Search Terms"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'termino'], name='uniq_search_term_producto')
+        ]
 
 class Order(models.Model):
     ESTADOS = [
@@ -48,21 +77,85 @@ class Order(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
     direccion_envio = models.TextField(blank=True, default='')
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # El stock reservado ya volvió a los productos (cancelación o force_delete): nunca dos veces
+    stock_restituido = models.BooleanField(default=False)
 
     def total_update(self):
-        self.total = sum(detalle.subtotal for detalle in self.detalles.all())
-        self.save()
+        """
+        Recalcula el total en la base con un único UPDATE (suma de subtotales en subconsulta),
+        sin pasar por save(). El campo `total` queda diferido: se relee solo si se accede.
+        """
+        subtotales = (
+            OrderDetail.objects.filter(pedido=OuterRef('pk'))
+            .values('pedido')
+            .annotate(suma=Sum('subtotal'))
+            .values('suma')
+        )
+        Order.objects.filter(pk=self.pk).update(
+            total=Coalesce(Subquery(subtotales), Value(Decimal('0.00')), output_field=models.DecimalField(max_digits=10, decimal_places=2))
+        )
+        self.__dict__.pop('total', None)
 
-    def save(self, *args, **kwargs):
-        if self.pk:  # Solo si el pedido ya existe
-            pedido_anterior = Order.objects.get(pk=self.pk)
-            if pedido_anterior.estado != 'cancelado' and self.estado == 'cancelado':
-                # Si el pedido se cancela, restituir stock de cada producto
-                for detalle in self.detalles.all():
-                    detalle.producto.stock += detalle.cantidad
-                    detalle.producto.save()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado tal como se leyó de la base, para detectar transiciones sin otra consulta
+        instance._estado_original = instance.__dict__.get('estado', _ESTADO_DESCONOCIDO)
+        return instance
 
-        super().save(*args, **kwargs)
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Solo si `estado` se releyó: una recarga parcial (ej. el `total` diferido) no lo toca
+        if fields is None or 'estado' in fields:
+            self._estado_original = self.__dict__.get('estado', _ESTADO_DESCONOCIDO)
+
+    def _estado_anterior(self):
+        estado = getattr(self, '_estado_original', _ESTADO_DESCONOCIDO)
+        if estado is _ESTADO_DESCONOCIDO:
+            # Instancia no cargada desde la base (o con `estado` diferido): leer solo ese campo
+            estado = Order.objects.filter(pk=self.pk).values_list('estado', flat=True).first()
+        return estado
+
+    def restituir_stock(self):
+        """
+        Devuelve al stock lo reservado por los detalles: un UPDATE con F() por producto.
+        Idempotente: la marca `stock_restituido` se toma con un UPDATE condicional en la misma
+        transacción, así un job repetido (o el force_delete de un pedido ya cancelado) no suma
+        el stock dos veces.
+        """
+        with transaction.atomic():
+            if not Order.objects.filter(pk=self.pk, stock_restituido=False).update(stock_restituido=True):
+                return False
+            self._restituir_detalles()
+        self.stock_restituido = True
+        return True
+
+    def _restituir_detalles(self):
+        cantidades = self.detalles.values('producto').annotate(cantidad_total=Sum('cantidad'))
+        for fila in cantidades:
+            Product.objects.filter(pk=fila['producto']).update(stock=F('stock') + fila['cantidad_total'])
+        # update() no dispara señales: el stock cacheado del catálogo queda desactualizado
+        catalog_cache.invalidar()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # `stock_restituido` solo lo escribe restituir_stock con su UPDATE condicional: una
+            # instancia leída antes (o la misma que encoló la restitución) no debe pisarlo
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'stock_restituido' and f.attname not in diferidos
+            ]
+        # Solo si el pedido ya existe y pasa a cancelado
+        if self.pk and self.estado == 'cancelado' and self._estado_anterior() != 'cancelado':
+            from . import jobs  # import diferido: market.jobs importa los modelos
+            with transaction.atomic():
+                # En la misma transacción: en el momento, o como job si JOBS_ASYNC
+                jobs.encolar('market.restituir_stock', pedido_id=self.pk)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._estado_original = self.estado
 
     def __str__(self):
         username = self.usuario.username if self.usuario else "None"
@@ -71,6 +164,15 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Order"  
         verbose_name_plural = "Orders"  
+        indexes = [
+            # my_orders / pedidos de un cliente, del más reciente al más antiguo (también el JOIN de envíos por usuario)
+            models.Index(fields=['usuario', '-fecha'], name='order_usuario_fecha_idx'),
+            models.Index(fields=['estado'], name='order_estado_idx'),
+            # Cola de pedidos sin pagar que revisan los operadores (parcial; se omite en MySQL)
+            models.Index(
+                fields=['fecha'], condition=Q(estado__in=['pendiente', 'en_revision']), name='order_abierto_fecha_idx'
+            ),
+        ]
 
 class OrderDetail(models.Model):
     pedido = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="detalles")
@@ -89,6 +191,16 @@ class OrderDetail(models.Model):
         verbose_name = "Order Detail"  
         verbose_name_plural = "Order Details"
 
+ESTADOS_PAGO_ABIERTO = ('pendiente', 'en_revision')
+PAGO_ABIERTO_DUPLICADO = 'Ya existe un pago abierto (pendiente o en revisión) para este pedido.'
+PAGO_ABIERTO_CONSTRAINT = 'pay_pedido_abierto_uniq'
+
+
+def indices_parciales_disponibles():
+    """Postgres y SQLite soportan el constraint único parcial de pagos abiertos (Pay.Meta)"""
+    return connection.features.supports_partial_indexes
+
+
 class Pay(models.Model):
     ESTADOS = [
         ('pendiente', 'Pendiente'),
@@ -117,17 +229,44 @@ class Pay(models.Model):
     comprobante_archivo = models.FileField(upload_to='comprobantes/', blank=True, null=True)
 
     def save(self, *args, **kwargs):
+        abierto = self.pedido_id and self.estado in ESTADOS_PAGO_ABIERTO
         # En MySQL no tenemos constraint parcial, validamos en aplicación.
-        if self.pedido_id and self.estado in ('pendiente', 'en_revision'):
+        if abierto and not indices_parciales_disponibles():
             # Evitar múltiples pagos "abiertos" (pendiente o en revisión) para el mismo pedido
-            qs = Pay.objects.filter(pedido_id=self.pedido_id, estado__in=['pendiente', 'en_revision'])
+            qs = Pay.objects.filter(pedido_id=self.pedido_id, estado__in=ESTADOS_PAGO_ABIERTO)
             if self.pk:
                 qs = qs.exclude(pk=self.pk)
             if qs.exists():
-                raise ValidationError('Ya existe un pago abierto (pendiente o en revisión) para este pedido.')
+                raise ValidationError(PAGO_ABIERTO_DUPLICADO)
         if not self.monto_pagado and self.pedido_id:
             self.monto_pagado = self.pedido.total
-        super().save(*args, **kwargs)
+        if not abierto:
+            super().save(*args, **kwargs)
+            return
+        # Con índice único parcial la base rechaza el duplicado; el savepoint deja usable
+        # la transacción externa para informar el error
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if self._viola_pago_abierto(e):
+                raise ValidationError(PAGO_ABIERTO_DUPLICADO)
+            raise
+
+    def _viola_pago_abierto(self, error):
+        """
+        ¿El IntegrityError vino de pay_pedido_abierto_uniq? Postgres informa el nombre del
+        constraint; SQLite no, así que se reevalúa el constraint contra la base.
+        """
+        nombre = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+        if nombre:
+            return nombre == PAGO_ABIERTO_CONSTRAINT
+        constraint = next(c for c in self._meta.constraints if c.name == PAGO_ABIERTO_CONSTRAINT)
+        try:
+            constraint.validate(Pay, self)
+        except ValidationError:
+            return True
+        return False
 
     def complete(self):
         if self.estado not in ['pendiente', 'en_revision']:
@@ -151,7 +290,17 @@ class Pay(models.Model):
     class Meta:
         verbose_name = "Pay"  
         verbose_name_plural = "Pays"
-        # Nota: constraint parcial removido por incompatibilidad MySQL (W036). Validación en save() / serializer.
+        indexes = [
+            models.Index(fields=['pedido', 'estado'], name='pay_pedido_estado_idx'),
+            models.Index(fields=['estado', '-creado'], name='pay_estado_creado_idx'),
+        ]
+        # A lo sumo un pago abierto por pedido. MySQL no soporta constraints parciales: Django
+        # lo omite ahí (W036, silenciado en settings) y save() valida en la aplicación
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pedido'], condition=Q(estado__in=ESTADOS_PAGO_ABIERTO), name=PAGO_ABIERTO_CONSTRAINT
+            ),
+        ]
 
 class Shipment(models.Model):
     pedido = models.OneToOneField(Order, on_delete=models.CASCADE)
@@ -183,17 +332,34 @@ class Cart(models.Model):
     def __str__(self):
         return f"Carrito de {self.usuario.username}"
     
+    def totales(self):
+        """Calcula total y cantidad de items del carrito con un único aggregate en la base"""
+        return self.items.aggregate(
+            total=Coalesce(
+                Sum(F('cantidad') * F('producto__precio'), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            cantidad_items=Coalesce(Sum('cantidad'), Value(0)),
+        )
+
     def total(self):
         """Calcula el total del carrito"""
-        return sum(item.subtotal() for item in self.items.all())
+        return self.totales()['total']
     
     def cantidad_items(self):
         """Obtiene la cantidad total de items en el carrito"""
-        return sum(item.cantidad for item in self.items.all())
+        return self.totales()['cantidad_items']
     
     def limpiar(self):
         """Elimina todos los items del carrito"""
         self.items.all().delete()
+        Cart.marcar_modificado(self.pk)
+
+    @classmethod
+    def marcar_modificado(cls, carrito_id):
+        """Actualiza fecha_actualizacion (base del ETag del carrito) cuando cambian sus items"""
+        cls.objects.filter(pk=carrito_id).update(fecha_actualizacion=timezone.now())
     
     class Meta:
         verbose_name = "Carrito"
@@ -218,6 +384,26 @@ class CartItem(models.Model):
         verbose_name_plural = "Items de Carrito"
         unique_together = ('carrito', 'producto')  # Un producto solo puede estar una vez en el carrito
 
+class StockReservation(models.Model):
+    """Stock retenido por un carrito hasta `expira` (solo si STOCK_RESERVATIONS_ENABLED)"""
+    carrito = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservas')
+    producto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id} (Carrito {self.carrito_id}) hasta {self.expira}"
+
+    class Meta:
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        constraints = [
+            models.UniqueConstraint(fields=['carrito', 'producto'], name='uniq_reserva_carrito_producto')
+        ]
+        indexes = [
+            models.Index(fields=['producto', 'expira'], name='reserva_producto_expira_idx')
+        ]
+
 class Favorite(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='favorites')
     product = models.ForeignKey('market.Product', on_delete=models.CASCADE, related_name='favorites')
@@ -227,7 +413,100 @@ class Favorite(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'product'], name='uniq_favorite_user_product')
         ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
         return f'{self.user} ♥ {self.product_id}'
+
+class IdempotencyKey(models.Model):
+    """Respuesta guardada para un header Idempotency-Key (por usuario y endpoint) hasta `expira`"""
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    endpoint = models.CharField(max_length=50)
+    clave = models.CharField(max_length=255)
+    # null mientras la primera petición con esta clave sigue en curso
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    # SHA-256 del cuerpo de la primera petición (vacía en claves anteriores a la huella)
+    huella = models.CharField(max_length=64, blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    # Mientras está en curso: lease corto (IDEMPOTENCY_IN_PROGRESS_LEASE); completada: IDEMPOTENCY_KEY_TTL
+    expira = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.endpoint}:{self.clave} ({self.usuario_id})"
+
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'endpoint', 'clave'], name='uniq_idempotency_usuario_endpoint_clave')
+        ]
+
+class ProofUpload(models.Model):
+    """
+    Subida de un comprobante de pago por partes (market.uploads): los bytes se acumulan en
+    `ruta_temporal` y un worker en segundo plano los pasa al storage configurado.
+    """
+    ESTADOS = [
+        ('recibiendo', 'Recibiendo'),
+        ('subiendo', 'Subiendo al storage'),
+        ('enviando', 'Enviando al storage'),  # reclamada por un proceso (market.uploads.subir)
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    pago = models.ForeignKey(Pay, on_delete=models.CASCADE, related_name='subidas')
+    nombre = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    tamano = models.PositiveBigIntegerField()
+    recibido = models.PositiveBigIntegerField(default=0)
+    ruta_temporal = models.CharField(max_length=500)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='recibiendo')
+    intentos = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.recibido}/{self.tamano}) - Pago {self.pago_id}"
+
+    class Meta:
+        verbose_name = "Proof Upload"
+        verbose_name_plural = "Proof Uploads"
+        indexes = [
+            models.Index(fields=['estado', 'actualizado'], name='proofupload_estado_idx')
+        ]
+
+class BackgroundJob(models.Model):
+    """Tarea diferida de la cola en base de datos (market.jobs), ejecutada por `run_jobs`"""
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('ejecutando', 'Ejecutando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    tarea = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    # No se ejecuta antes de esta fecha (demora inicial o backoff del próximo reintento)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    # Lease del worker que lo está ejecutando; vencido, el job vuelve a la cola
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.tarea} #{self.pk} ({self.estado})"
+
+    class Meta:
+        verbose_name = "Background Job"
+        verbose_name_plural = "Background Jobs"
+        indexes = [
+            # reclamar(): próximos pendientes vencidos, en orden
+            models.Index(fields=['estado', 'ejecutar_desde'], name='job_estado_ejecutar_idx'),
+        ]
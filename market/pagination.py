@@ -0,0 +1,72 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) opcional: solo se activa si el cliente envía
+    ?cursor= o ?page_size=, así el listado plano sigue funcionando para los clientes existentes.
+    El costo de cada página no depende de la profundidad ni del tamaño de la tabla.
+    """
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ProductCursorPagination(OptionalCursorPagination):
+    """
+    Paginación del listado de productos.
+    - Orden estable por id o por precio (con id como desempate).
+    """
+    page_size = getattr(settings, 'PRODUCT_PAGE_SIZE', 20)
+    max_page_size = getattr(settings, 'PRODUCT_MAX_PAGE_SIZE', 100)
+    ordering_query_param = 'ordering'
+    ordering = ('id',)
+
+    # Órdenes permitidas -> campos usados para el keyset
+    ORDERINGS = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'precio': ('precio', 'id'),
+        '-precio': ('-precio', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_query_param)
+        return self.ORDERINGS.get(ordering, self.ordering)
+
+
+class ProductSearchPagination(PageNumberPagination):
+    """
+    Paginación de la búsqueda (?q=): por número de página sobre el orden por relevancia.
+    El cursor no sirve acá: su keyset ordena por columnas y reemplazaría el ranking en cuanto
+    el cliente pide una página. Opcional igual que el cursor: solo con ?page= o ?page_size=.
+    """
+    page_size = getattr(settings, 'PRODUCT_PAGE_SIZE', 20)
+    max_page_size = getattr(settings, 'PRODUCT_MAX_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if 'cursor' in params:
+            raise ValidationError({'cursor': 'La búsqueda (?q=) se pagina con ?page=, no con ?cursor='})
+        if self.page_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+def paginador_productos(params):
+    """Paginador del listado de productos: por relevancia si hay búsqueda, si no por cursor"""
+    return ProductSearchPagination() if 'q' in params else ProductCursorPagination()
+
+
+class OrderCursorPagination(OptionalCursorPagination):
+    """Paginación de pedidos, del más reciente al más antiguo"""
+    page_size = getattr(settings, 'ORDER_PAGE_SIZE', 20)
+    max_page_size = getattr(settings, 'ORDER_MAX_PAGE_SIZE', 100)
+    ordering = ('-fecha', '-id')
@@ -0,0 +1,83 @@
+"""
+Reservas de stock con vencimiento para carritos (opcional, STOCK_RESERVATIONS_ENABLED).
+- Agregar al carrito retiene las unidades por STOCK_RESERVATION_TTL.
+- Stock disponible = stock - reservas activas de otros carritos.
+- El checkout convierte las reservas del carrito en descuentos de stock.
+- Las reservas vencidas se ignoran al calcular y se borran con `expire_stock_reservations`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+def habilitadas():
+    return getattr(settings, 'STOCK_RESERVATIONS_ENABLED', False)
+
+
+def ttl():
+    return getattr(settings, 'STOCK_RESERVATION_TTL', timedelta(minutes=15))
+
+
+def activas():
+    return StockReservation.objects.filter(expira__gt=timezone.now())
+
+
+def reservado_por_otros(producto_ids, carrito_id):
+    """{producto_id: unidades retenidas por otros carritos} en una sola consulta"""
+    if not habilitadas():
+        return {}
+    filas = (
+        activas().filter(producto_id__in=producto_ids)
+        .exclude(carrito_id=carrito_id)
+        .values('producto')
+        .annotate(total=Sum('cantidad'))
+    )
+    return {fila['producto']: fila['total'] for fila in filas}
+
+
+def disponible(producto, carrito_id):
+    """
+    Stock que el carrito puede retener. Con reservas habilitadas bloquea la fila del
+    producto (llamar dentro de transaction.atomic) para serializar reservas concurrentes.
+    """
+    if not habilitadas():
+        return producto.stock
+    stock = Product.objects.select_for_update().values_list('stock', flat=True).get(pk=producto.pk)
+    return stock - reservado_por_otros([producto.pk], carrito_id).get(producto.pk, 0)
+
+
+def reservar(carrito_id, producto_id, cantidad):
+    """Crea o renueva la reserva del carrito para el producto con la cantidad total del item"""
+    if not habilitadas():
+        return
+    StockReservation.objects.update_or_create(
+        carrito_id=carrito_id, producto_id=producto_id,
+        defaults={'cantidad': cantidad, 'expira': timezone.now() + ttl()},
+    )
+
+
+def liberar(carrito_id, producto_id=None):
+    """Libera las reservas del carrito (o solo la de un producto)"""
+    if not habilitadas():
+        return
+    reservas = StockReservation.objects.filter(carrito_id=carrito_id)
+    if producto_id is not None:
+        reservas = reservas.filter(producto_id=producto_id)
+    reservas.delete()
+
+
+def expirar(batch_size=1000):
+    """Borra las reservas vencidas en lotes; devuelve cuántas se eliminaron"""
+    total = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expira__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += StockReservation.objects.filter(pk__in=ids).delete()[0]
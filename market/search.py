@@ -0,0 +1,141 @@
+"""
+Búsqueda de productos por texto (nombre y descripción).
+- Postgres: full-text nativo (to_tsvector / to_tsquery) con ranking ts_rank y prefijos.
+- Otras bases (SQLite en desarrollo): índice invertido local en ProductSearchTerm,
+  mantenido por señales en cada save/delete de Product.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, When
+
+from .models import Product, ProductSearchTerm
+
+CONFIG_POSTGRES = 'spanish'
+PESO_NOMBRE = 3
+PESO_DESCRIPCION = 1
+LARGO_MAXIMO = 64
+STOPWORDS = {
+    'de', 'la', 'el', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'en',
+    'con', 'para', 'por', 'del', 'al', 'que', 'se', 'su', 'sus', 'es', 'lo',
+}
+
+
+def usa_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(texto):
+    """Normaliza (minúsculas, sin acentos) y separa en términos indexables"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return [
+        t[:LARGO_MAXIMO] for t in re.findall(r'\w+', texto)
+        if len(t) > 1 and t not in STOPWORDS
+    ]
+
+
+def _pesos(producto):
+    pesos = {}
+    for termino in tokenize(producto.nombre):
+        pesos[termino] = pesos.get(termino, 0) + PESO_NOMBRE
+    for termino in tokenize(producto.descripcion):
+        pesos[termino] = pesos.get(termino, 0) + PESO_DESCRIPCION
+    return pesos
+
+
+def index_product(producto):
+    """Reemplaza los términos indexados de un producto (2 queries)"""
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(producto=producto).delete()
+        ProductSearchTerm.objects.bulk_create([
+            ProductSearchTerm(producto=producto, termino=termino, peso=peso)
+            for termino, peso in _pesos(producto).items()
+        ])
+
+
+def rebuild_index(batch_size=1000):
+    """Reconstruye el índice local completo; devuelve la cantidad de productos indexados"""
+    total = 0
+    with transaction.atomic():
+        ProductSearchTerm.objects.all().delete()
+        lote = []
+        productos = Product.objects.only('id', 'nombre', 'descripcion').order_by('id')
+        for producto in productos.iterator(chunk_size=batch_size):
+            total += 1
+            lote.extend(
+                ProductSearchTerm(producto_id=producto.id, termino=termino, peso=peso)
+                for termino, peso in _pesos(producto).items()
+            )
+            if len(lote) >= batch_size:
+                ProductSearchTerm.objects.bulk_create(lote, batch_size=batch_size)
+                lote = []
+        ProductSearchTerm.objects.bulk_create(lote, batch_size=batch_size)
+    return total
+
+
+def search_products(queryset, q):
+    """
+    Filtra el queryset de productos por la consulta `q` (todos los términos deben
+    coincidir, cada uno como prefijo) y lo ordena por relevancia (`search_rank`).
+    """
+    terminos = tokenize(q)
+    if not terminos:
+        return queryset.none()
+    if usa_postgres():
+        return _search_postgres(queryset, terminos)
+    return _search_local(queryset, terminos)
+
+
+def _search_postgres(queryset, terminos):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    vector = (
+        SearchVector('nombre', weight='A', config=CONFIG_POSTGRES)
+        + SearchVector('descripcion', weight='B', config=CONFIG_POSTGRES)
+    )
+    consulta = SearchQuery(
+        ' & '.join(f'{t}:*' for t in terminos), search_type='raw', config=CONFIG_POSTGRES
+    )
+    return (
+        queryset.annotate(search=vector)
+        .filter(search=consulta)
+        .annotate(search_rank=SearchRank(vector, consulta))
+        .order_by('-search_rank', 'id')
+    )
+
+
+def _search_local(queryset, terminos):
+    # Prefijo como rango [t, t + U+FFFF) para que use el índice B-tree de `termino`
+    prefijos = [Q(termino__gte=t, termino__lt=t + '\uffff') for t in terminos]
+    coincide = {
+        f'coincide_{i}': Max(Case(When(prefijo, then=1), default=0, output_field=IntegerField()))
+        for i, prefijo in enumerate(prefijos)
+    }
+    # Coincidencia exacta pesa el doble que una por prefijo
+    rank = reduce(lambda a, b: a + b, [
+        Sum(Case(
+            When(termino=t, then=F('peso') * 2),
+            When(prefijo, then=F('peso')),
+            default=0,
+            output_field=IntegerField(),
+        ))
+        for t, prefijo in zip(terminos, prefijos)
+    ])
+    ranking = (
+        ProductSearchTerm.objects.filter(reduce(or_, prefijos))
+        .values('producto')
+        .annotate(rank=rank, **coincide)
+        .filter(**{nombre: 1 for nombre in coincide})
+    )
+    return (
+        queryset.filter(id__in=ranking.values('producto'))
+        .annotate(search_rank=Subquery(
+            ranking.filter(producto=OuterRef('pk')).values('rank')[:1],
+            output_field=IntegerField(),
+        ))
+        .order_by('-search_rank', 'id')
+    )
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import *
+from . import uploads
 from account_admin.serializer import UserSerializer
 from rest_framework.exceptions import ValidationError
 from rest_framework import parsers
@@ -155,13 +156,15 @@ class PaySerializer(serializers.ModelSerializer):
             forbidden = {'number', 'card_number', 'cvv', 'cvc', 'exp', 'exp_month', 'exp_year'}
             if any(k in metadata for k in forbidden):
                 raise ValidationError('No se permiten datos sensibles de tarjeta en metadata.')
+        archivo = attrs.get('comprobante_archivo')
+        if archivo and archivo.size > uploads.tamano_maximo():
+            raise ValidationError(f'El comprobante no puede superar {uploads.tamano_maximo()} bytes')
         if pedido:
             # No permitir nuevo pago si ya está pagado
             if pedido.estado == 'pagado':
                 raise ValidationError('El pedido ya está pagado.')
-            # No permitir más de un pago abierto simultáneo (pendiente o en revisión)
-            if pedido.pagos.filter(estado__in=['pendiente','en_revision']).exists():
-                raise ValidationError('Ya existe un pago abierto para este pedido.')
+            # El "un solo pago abierto por pedido" lo garantiza Pay.save al insertar
+            # (índice único parcial o pedido bloqueado en PayViewSet.perform_create)
         return attrs
 
     def get_pedido_detalle(self, obj):
@@ -177,9 +180,14 @@ class PaySerializer(serializers.ModelSerializer):
         if pedido and not validated_data.get('monto_pagado'):
             validated_data['monto_pagado'] = pedido.total
         # Si viene comprobante (archivo o URL), pasar a 'en_revision'
-        if validated_data.get('comprobante_archivo') or validated_data.get('comprobante_url'):
+        archivo = validated_data.pop('comprobante_archivo', None)
+        if archivo or validated_data.get('comprobante_url'):
             validated_data['estado'] = 'en_revision'
-        return super().create(validated_data)
+        pago = super().create(validated_data)
+        if archivo:
+            # El push al storage va en segundo plano (ver market.uploads)
+            uploads.desde_archivo(pago, archivo)
+        return pago
 
     def update(self, instance, validated_data):
         return super().update(instance, validated_data)
@@ -269,8 +277,8 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    cantidad_items = serializers.IntegerField(read_only=True)
+    total = serializers.SerializerMethodField()
+    cantidad_items = serializers.SerializerMethodField()
     
     class Meta:
         model = Cart
@@ -278,10 +286,15 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'usuario', 'fecha_actualizacion']
     
     def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['total'] = float(instance.total())
-        representation['cantidad_items'] = instance.cantidad_items()
-        return representation
+        # Un único aggregate por carrito para total y cantidad_items
+        self._totales = instance.totales()
+        return super().to_representation(instance)
+
+    def get_total(self, obj):
+        return float(self._totales['total'])
+
+    def get_cantidad_items(self, obj):
+        return self._totales['cantidad_items']
 
 class ProductBriefSerializer(serializers.ModelSerializer):
     class Meta:
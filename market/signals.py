@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog_cache
+from .models import Category, Product
+from .search import index_product, usa_postgres
+
+CAMPOS_INDEXADOS = {'nombre', 'descripcion'}
+
+
+@receiver(post_save, sender=Product)
+def actualizar_indice_busqueda(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mantiene el índice local de búsqueda; en delete los términos caen por CASCADE"""
+    if raw or usa_postgres():
+        return
+    if update_fields is not None and not CAMPOS_INDEXADOS & set(update_fields):
+        return
+    index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidar_cache_catalogo(sender, **kwargs):
+    """Cualquier escritura de productos o categorías descarta las respuestas cacheadas"""
+    catalog_cache.invalidar()
@@ -0,0 +1,52 @@
+"""
+Tareas diferibles de market (ver market.jobs). Reciben solo ids: al ejecutarse releen el
+estado actual, así un job atrasado o reintentado no trabaja con datos viejos.
+"""
+from . import jobs, uploads
+from .models import ESTADOS_PAGO_ABIERTO, Order, Pay, Shipment
+
+# Estado del envío -> estado que toma el pedido
+ESTADO_PEDIDO_POR_ENVIO = {'en camino': 'enviado', 'entregado': 'entregado'}
+
+
+@jobs.tarea('market.restituir_stock')
+def restituir_stock(pedido_id):
+    """Stock de un pedido cancelado (Order.save). Solo hace falta el pk: sin detalles no hace nada"""
+    Order(pk=pedido_id).restituir_stock()
+
+
+@jobs.tarea('market.eliminar_pedido')
+def eliminar_pedido(pedido_id):
+    """
+    force_delete: cierra pagos abiertos, restituye stock y borra todo. Un pedido cancelado cuyo
+    job de restitución todavía no corrió también se restituye acá, antes de que el borrado en
+    cascada se lleve los detalles (restituir_stock es idempotente)
+    """
+    pedido = Order.objects.filter(pk=pedido_id).first()
+    if pedido is None:
+        return
+    for pago in Pay.objects.filter(pedido=pedido, estado__in=ESTADOS_PAGO_ABIERTO):
+        pago.fail()
+    pedido.restituir_stock()
+    Pay.objects.filter(pedido=pedido).delete()
+    pedido.delete()
+
+
+@jobs.tarea('market.propagar_estado_envio')
+def propagar_estado_envio(envio_id):
+    """Lleva el estado actual del envío al pedido (en camino -> enviado, entregado -> entregado)"""
+    envio = Shipment.objects.select_related('pedido').filter(pk=envio_id).first()
+    if envio is None:
+        return
+    destino = ESTADO_PEDIDO_POR_ENVIO.get(envio.estado)
+    if destino and envio.pedido.estado != destino:
+        envio.pedido.estado = destino
+        envio.pedido.save()
+
+
+@jobs.tarea('market.subir_comprobante', atomica=False)
+def subir_comprobante(subida_id):
+    """Push del comprobante al storage; no se revierte, así que no va en transacción"""
+    subida = uploads.subir(subida_id)
+    if subida.estado == 'fallido':
+        raise jobs.Reintentar(subida.error)
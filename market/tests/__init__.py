@@ -1,4 +1,15 @@
 from .test_models import *
 from .test_serializers import *
 from .test_views import *
-from .test_urls import *
\ No newline at end of file
+from .test_urls import *
+from .test_pagination import *
+from .test_search import *
+from .test_checkout import *
+from .test_reservations import *
+from .test_idempotency import *
+from .test_catalog_cache import *
+from .test_conditional import *
+from .test_jobs import *
+from .test_uploads import *
+from .test_async_views import *
+from .test_commands import *
@@ -0,0 +1,92 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from market.models import Category, Order, OrderDetail, Product, Shipment
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+class TestAsyncReadViews(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.other = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion='')
+        self.products = [
+            Product.objects.create(nombre=f'Producto {i}', descripcion='', precio=10 + i, stock=5, categoria=self.category)
+            for i in range(3)
+        ]
+        self.order = Order.objects.create(usuario=self.user, estado='enviado', total=10)
+        OrderDetail.objects.create(pedido=self.order, producto=self.products[0], cantidad=1, subtotal=10)
+        Order.objects.create(usuario=self.other, estado='pendiente', total=20)
+        self.shipment = Shipment.objects.create(
+            pedido=self.order, direccion_envio='Calle 1', empresa_envio='Correo', numero_guia='TW1', estado='en camino'
+        )
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    async def test_product_list_matches_sync_viewset(self):
+        plano = await self.async_client.get(reverse('async-product-list'), {'precio_min': 11})
+        self.assertEqual(plano.status_code, 200)
+        esperado = await sync_to_async(self.client.get)(reverse('product-list'), {'precio_min': 11})
+        self.assertEqual(plano.json(), esperado.json())
+
+        pagina = await self.async_client.get(reverse('async-product-list'), {'page_size': 2})
+        self.assertEqual([p['id'] for p in pagina.json()['results']], [p.id for p in self.products[:2]])
+        self.assertIn('/api/market/async/products/', pagina.json()['next'])
+        siguiente = await self.async_client.get(pagina.json()['next'])
+        self.assertEqual([p['id'] for p in siguiente.json()['results']], [self.products[2].id])
+
+    async def test_product_detail_is_cached_and_conditional(self):
+        url = reverse('async-product-detail', args=[self.products[1].id])
+        primera = await self.async_client.get(url)
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        self.assertEqual(primera.json()['categoria'], {'id': self.category.id, 'nombre': self.category.nombre})
+        segunda = await self.async_client.get(url)
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(segunda.content, primera.content)
+        no_modificado = await self.async_client.get(url, headers={'If-None-Match': primera['ETag']})
+        self.assertEqual(no_modificado.status_code, 304)
+
+        respuesta = await self.async_client.get(reverse('async-product-detail', args=[999999]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_category_list_and_write_methods(self):
+        respuesta = await self.async_client.get(reverse('async-category-list'))
+        self.assertEqual([c['id'] for c in respuesta.json()], [self.category.id])
+        respuesta = await self.async_client.post(reverse('async-category-list'))
+        self.assertEqual(respuesta.status_code, 405)
+
+    async def test_my_orders_requires_token_and_lists_own_orders(self):
+        respuesta = await self.async_client.get(reverse('async-order-my-orders'))
+        self.assertEqual(respuesta.status_code, 401)
+
+        respuesta = await self.async_client.get(reverse('async-order-my-orders'), headers=self.auth)
+        self.assertEqual(respuesta.status_code, 200)
+        esperado = await sync_to_async(self.client.get)(reverse('order-my-orders'))
+        self.assertEqual(respuesta.json(), esperado.json())
+        self.assertEqual(respuesta.json()[0]['detalles'][0]['producto_detalle']['id'], self.products[0].id)
+
+    async def test_tracking_hides_foreign_shipments(self):
+        url = reverse('async-shipment-tracking', args=[self.shipment.id])
+        respuesta = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual(respuesta.json()['numero_guia'], 'TW1')
+
+        token_ajeno = {'Authorization': f'Bearer {AccessToken.for_user(self.other)}'}
+        respuesta = await self.async_client.get(url, headers=token_ajeno)
+        self.assertEqual(respuesta.status_code, 404)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    async def test_budget_middleware_measures_async_views(self):
+        respuesta = await self.async_client.get(reverse('async-order-my-orders'), headers=self.auth)
+        self.assertRegex(respuesta['Server-Timing'], r'desc="[1-9]\d* queries"')
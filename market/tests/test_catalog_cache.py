@@ -0,0 +1,122 @@
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import Cart, CartItem, Category, Product
+from market import catalog_cache
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+class TestCatalogCache(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='admin'
+        )
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.product = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=10, stock=5, categoria=self.category
+        )
+        self.client = APIClient()
+
+    def test_second_list_is_served_from_cache(self):
+        url = reverse('product-list')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+    def test_retrieve_and_categories_are_cached(self):
+        for url in (reverse('product-detail', args=[self.product.id]), reverse('category-list')):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_query_params_are_normalized(self):
+        url = reverse('product-list')
+        self.client.get(url, {'precio_min': 1, 'precio_max': 100})
+        response = self.client.get(f'{url}?precio_max=100&precio_min=1')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url, {'precio_min': 2})['X-Cache'], 'MISS')
+
+    def test_writes_invalidate_cache(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        self.client.force_authenticate(user=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'precio': '25.00'}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['precio'], '25.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.assertEqual(self.client.get(reverse('category-list'))['X-Cache'], 'MISS')
+
+    def _checkout(self, cantidad):
+        cliente = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        CartItem.objects.create(carrito=Cart.objects.create(usuario=cliente), producto=self.product, cantidad=cantidad)
+        self.client.force_authenticate(user=cliente)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(reverse('cart-checkout')).status_code, 201)
+        self.client.force_authenticate(user=None)
+
+    def test_checkout_keeps_the_catalog_cached(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        version = catalog_cache.version()
+        self._checkout(2)
+        # Una venta que no agota el producto no vacía el catálogo: el stock se pone al día por TTL
+        self.assertEqual(catalog_cache.version(), version)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_checkout_that_sells_out_invalidates_cached_stock(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        self._checkout(self.product.stock)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['stock'], 0)
+
+    def test_invalidation_waits_for_commit(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.precio = 30
+            self.product.save()
+            # Sin confirmar: un lector no debe cachear el precio nuevo bajo una versión nueva
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_stats_endpoint(self):
+        url = reverse('product-list')
+        self.client.get(url)
+        self.client.get(url)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('catalog-cache-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['misses'], 1)
+        self.assertEqual(response.data['hit_ratio'], 0.5)
+
+        cliente = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.client.force_authenticate(user=cliente)
+        self.assertEqual(self.client.get(reverse('catalog-cache-stats')).status_code, 403)
+
+    @override_settings(CATALOG_CACHE_TTL=0)
+    def test_ttl_zero_disables_cache(self):
+        url = reverse('product-list')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('X-Cache'))
@@ -0,0 +1,128 @@
+import threading
+from unittest.mock import patch
+from django.urls import reverse
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from market.models import Cart, CartItem, Category, Order, OrderDetail, Product
+from market.views import CartViewSet
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+class TestAtomicCheckout(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(),
+            email=fake.unique.email(),
+            password='testpass123',
+            role='client'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.cart = Cart.objects.create(usuario=self.user)
+        self.products = [
+            Product.objects.create(
+                nombre=fake.word(), descripcion=fake.text(), precio=10 + i, stock=5, categoria=self.category
+            )
+            for i in range(3)
+        ]
+
+    def test_checkout_creates_details_and_decrements_stock(self):
+        for product in self.products:
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=2)
+        response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.data['pedido_id'])
+        self.assertEqual(order.detalles.count(), 3)
+        self.assertEqual(order.total, sum(p.precio * 2 for p in self.products))
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 3)
+        self.assertEqual(self.cart.items.count(), 0)
+
+    def test_checkout_rolls_back_on_conditional_update_failure(self):
+        for product in self.products:
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=2)
+        last = self.products[-1]
+        original_lock = CartViewSet._lock_products
+
+        def mock_lock(view, producto_ids):
+            productos = original_lock(view, producto_ids)
+            Product.objects.filter(id=last.id).update(stock=1)
+            return productos
+
+        with patch.object(CartViewSet, '_lock_products', mock_lock):
+            response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Solo hay 1 unidades', response.data['error'])
+        self.assertFalse(Order.objects.filter(usuario=self.user).exists())
+        self.assertEqual(self.cart.items.count(), 3)
+        for product in self.products[:-1]:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 5)
+
+    def test_checkout_query_count_independent_of_items(self):
+        CartItem.objects.create(carrito=self.cart, producto=self.products[0], cantidad=1)
+        with CaptureQueriesContext(connection) as one_item:
+            self.client.post(reverse('cart-checkout'))
+        for product in self.products:
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=1)
+        with CaptureQueriesContext(connection) as three_items:
+            self.client.post(reverse('cart-checkout'))
+        # Solo crece el UPDATE condicional de stock (uno por producto)
+        self.assertEqual(len(three_items.captured_queries) - len(one_item.captured_queries), 2)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TestConcurrentCheckout(TransactionTestCase):
+    """
+    Checkouts simultáneos del último stock. Necesita SELECT ... FOR UPDATE (Postgres): en
+    SQLite es un no-op y la base serializa las escrituras con "database is locked".
+    """
+    THREADS = 8
+    STOCK = 3
+
+    def setUp(self):
+        category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.product = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=10, stock=self.STOCK, categoria=category
+        )
+        self.users = []
+        for _ in range(self.THREADS):
+            user = User.objects.create_user(
+                username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123'
+            )
+            cart = Cart.objects.create(usuario=user)
+            CartItem.objects.create(carrito=cart, producto=self.product, cantidad=1)
+            self.users.append(user)
+
+    def test_concurrent_checkouts_never_oversell(self):
+        results = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def checkout(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                results.append(client.post(reverse('cart-checkout')).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Exactamente un pedido por unidad en stock; el resto recibe "stock insuficiente"
+        self.assertEqual(sorted(results), [201] * self.STOCK + [400] * (self.THREADS - self.STOCK))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+        self.assertEqual(OrderDetail.objects.filter(producto=self.product).count(), self.STOCK)
@@ -0,0 +1,90 @@
+import json
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase
+from market.models import Cart, Category, Order, OrderDetail, Product
+from market import catalog_cache
+from account_admin.models import User
+
+
+class TestSeedAndBenchmark(TestCase):
+    def test_seed_data_is_reproducible_and_complete(self):
+        call_command('seed_data', '--categories', '3', '--products', '30', '--users', '6', '--orders', '12',
+                     '--seed', '7', stdout=StringIO())
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(Order.objects.count(), 12)
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertTrue(OrderDetail.objects.exists())
+        for pedido in Order.objects.prefetch_related('detalles'):
+            self.assertEqual(pedido.total, sum(d.subtotal for d in pedido.detalles.all()))
+        nombres = list(Product.objects.order_by('id').values_list('nombre', flat=True))
+
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        call_command('seed_data', '--categories', '3', '--products', '30', '--users', '0', '--orders', '0',
+                     '--seed', '7', stdout=StringIO())
+        self.assertEqual(list(Product.objects.order_by('id').values_list('nombre', flat=True)), nombres)
+
+    def test_seed_data_can_be_rerun_with_flush(self):
+        argumentos = ['--categories', '2', '--products', '10', '--users', '3', '--orders', '4', '--seed', '5']
+        call_command('seed_data', *argumentos, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_data', *argumentos, stdout=StringIO())
+        call_command('seed_data', *argumentos, '--flush', '--no-input', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertEqual(User.objects.filter(username__startswith='seed_user_').count(), 3)
+
+    def test_benchmark_reports_and_rolls_back(self):
+        call_command('seed_data', '--categories', '2', '--products', '10', '--users', '2', '--orders', '2',
+                     stdout=StringIO())
+        pedidos = Order.objects.count()
+        out = StringIO()
+        call_command('benchmark', '--iterations', '2', '--json', stdout=out)
+        resultados = json.loads(out.getvalue())
+        self.assertEqual(resultados['checkout']['n'], 2)
+        self.assertIn('p95_ms', resultados['product-search'])
+        self.assertEqual(Order.objects.count(), pedidos)
+        self.assertFalse(User.objects.filter(username='benchmark_client').exists())
+
+    def test_benchmark_measures_the_catalog_without_cache(self):
+        call_command('seed_data', '--categories', '1', '--products', '5', '--users', '0', '--orders', '0',
+                     stdout=StringIO())
+        cache.clear()
+        out = StringIO()
+        call_command('benchmark', '--iterations', '3', '--json', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['product-list']['n'], 3)
+        # Ni HITs ni MISSes: cada muestra va a la base y nada queda cacheado
+        estadisticas = catalog_cache.estadisticas()
+        self.assertEqual((estadisticas['hits'], estadisticas['misses']), (0, 0))
+
+    def test_benchmark_fails_over_budget(self):
+        call_command('seed_data', '--categories', '1', '--products', '5', '--users', '0', '--orders', '0',
+                     stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('benchmark', '--iterations', '1', '--max-queries', '0', stdout=StringIO())
+
+
+class TestConcurrencyBenchmark(LiveServerTestCase):
+    def test_reports_throughput_for_both_deployments(self):
+        category = Category.objects.create(nombre='Monitores', descripcion='')
+        Product.objects.create(nombre='Monitor', descripcion='', precio=10, stock=5, categoria=category)
+        out = StringIO()
+        # El servidor de test (WSGI) sirve también las vistas async: alcanza para validar el comando
+        call_command(
+            'benchmark_concurrency', '--wsgi-url', self.live_server_url, '--asgi-url', self.live_server_url,
+            '--concurrency', '3', '--duration', '0.3', '--endpoints', 'product-detail', 'category-list',
+            '--json', stdout=out,
+        )
+        resultados = json.loads(out.getvalue())
+        self.assertEqual(set(resultados), {'product-detail', 'category-list'})
+        for por_despliegue in resultados.values():
+            for r in por_despliegue.values():
+                self.assertGreater(r['requests'], 0)
+                self.assertEqual(r['errores'], 0)
+
+    def test_requires_something_to_measure(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_concurrency', '--endpoints', 'my-orders', '--duration', '0.1', stdout=StringIO())
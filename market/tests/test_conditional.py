@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import Category, Order, Pay, Product
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.product = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=10, stock=5, categoria=self.category
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_catalog_etag_returns_304_without_queries(self):
+        url = reverse('product-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_catalog_etag_changes_after_product_write(self):
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url)['ETag']
+        self.product.precio = 20
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CATALOG_CACHE_TTL=0)
+    def test_catalog_etag_without_response_cache(self):
+        url = reverse('category-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cart_etag_changes_when_items_change(self):
+        url = reverse('cart-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('product-add-to-cart', args=[self.product.id]), {'cantidad': 1})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cantidad_items'], 1)
+
+        etag = response['ETag']
+        self.client.post(reverse('cart-clear'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pay_etag_and_last_modified(self):
+        order = Order.objects.create(usuario=self.user, estado='pendiente', total=50)
+        pago = Pay.objects.create(pedido=order, metodo='transferencia', monto_pagado=50)
+        url = reverse('pay-detail', args=[pago.id])
+        first = self.client.get(url)
+        self.assertIn('Last-Modified', first)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        Order.objects.filter(pk=order.pk).update(estado='cancelado')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from market.models import Cart, CartItem, Category, IdempotencyKey, Order, Pay, Product
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+class TestIdempotencyKeys(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.product = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=10, stock=10, categoria=category
+        )
+        self.cart = Cart.objects.create(usuario=self.user)
+
+    def test_checkout_replay_returns_stored_response(self):
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=2)
+        url = reverse('cart-checkout')
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):
+            second = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['pedido_id'], first.data['pedido_id'])
+        self.assertEqual(Order.objects.filter(usuario=self.user).count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_failed_request_does_not_store_key(self):
+        url = reverse('cart-checkout')
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='vacio').status_code, 400)
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='vacio').status_code, 201)
+
+    def test_keys_are_scoped_per_user(self):
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        self.client.post(reverse('cart-checkout'), HTTP_IDEMPOTENCY_KEY='misma')
+        other = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123'
+        )
+        CartItem.objects.create(carrito=Cart.objects.create(usuario=other), producto=self.product, cantidad=1)
+        self.client.force_authenticate(user=other)
+        response = self.client.post(reverse('cart-checkout'), HTTP_IDEMPOTENCY_KEY='misma')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_in_progress_returns_conflict(self):
+        IdempotencyKey.objects.create(
+            usuario=self.user, endpoint='cart-checkout', clave='en-curso',
+            expira=timezone.now() + timedelta(minutes=5)
+        )
+        response = self.client.post(reverse('cart-checkout'), HTTP_IDEMPOTENCY_KEY='en-curso')
+        self.assertEqual(response.status_code, 409)
+
+    def test_abandoned_in_progress_key_is_released_after_its_lease(self):
+        # La petición original murió sin completar ni borrar la clave
+        IdempotencyKey.objects.create(
+            usuario=self.user, endpoint='cart-checkout', clave='colgada',
+            expira=timezone.now() - timedelta(seconds=1)
+        )
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        response = self.client.post(reverse('cart-checkout'), HTTP_IDEMPOTENCY_KEY='colgada')
+        self.assertEqual(response.status_code, 201)
+        guardada = IdempotencyKey.objects.get(clave='colgada')
+        self.assertGreater(guardada.expira, timezone.now() + timedelta(hours=1))
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        url = reverse('pay-list')
+        primero = Order.objects.create(usuario=self.user, estado='pendiente', total=50)
+        segundo = Order.objects.create(usuario=self.user, estado='pendiente', total=80)
+        data = {'pedido': primero.id, 'metodo': 'transferencia'}
+        self.assertEqual(self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='pago-x').status_code, 201)
+        data['pedido'] = segundo.id
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='pago-x')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Pay.objects.filter(pedido=segundo).exists())
+
+    def test_expired_key_runs_again(self):
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        self.client.post(reverse('cart-checkout'), HTTP_IDEMPOTENCY_KEY='vieja')
+        IdempotencyKey.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        response = self.client.post(reverse('cart-checkout'), HTTP_IDEMPOTENCY_KEY='vieja')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_pay_create_replay(self):
+        order = Order.objects.create(usuario=self.user, estado='pendiente', total=50)
+        url = reverse('pay-list')
+        data = {'pedido': order.id, 'metodo': 'transferencia'}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='pago-1')
+        self.assertEqual(first.status_code, 201)
+        second = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='pago-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Pay.objects.filter(pedido=order).count(), 1)
+
+    def test_purge_command_removes_expired_keys(self):
+        IdempotencyKey.objects.create(
+            usuario=self.user, endpoint='pay-create', clave='x', status_code=201, respuesta={},
+            expira=timezone.now() - timedelta(seconds=1)
+        )
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -0,0 +1,187 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import BackgroundJob, Category, Order, OrderDetail, Product, Shipment
+from market import jobs
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+@jobs.tarea('tests.falla')
+def _tarea_que_falla(mensaje):
+    raise RuntimeError(mensaje)
+
+
+@override_settings(JOBS_ASYNC=True, JOBS_RETRY_BASE_SECONDS=10)
+class TestBackgroundJobs(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion='')
+        self.product = Product.objects.create(nombre='Monitor', descripcion='', precio=100, stock=5, categoria=self.category)
+        self.order = Order.objects.create(usuario=self.admin, estado='pendiente', total=200)
+        OrderDetail.objects.create(pedido=self.order, producto=self.product, cantidad=2, subtotal=200)
+
+    def test_sync_mode_runs_inline(self):
+        with override_settings(JOBS_ASYNC=False):
+            self.order.estado = 'cancelado'
+            self.order.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_cancel_defers_restock_to_worker(self):
+        self.order.estado = 'cancelado'
+        self.order.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+        out = StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('Jobs procesados: 1', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        self.assertEqual(BackgroundJob.objects.get().estado, 'completado')
+
+    def test_job_is_rolled_back_with_its_transaction(self):
+        try:
+            with transaction.atomic():
+                self.order.estado = 'cancelado'
+                self.order.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = jobs.encolar('tests.falla', mensaje='boom')
+        job.max_intentos = 2
+        job.save()
+
+        with self.assertLogs('market.jobs', level='WARNING'):
+            self.assertEqual(jobs.procesar_pendientes(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.intentos), ('pendiente', 1))
+        self.assertIn('boom', job.error)
+        espera = (job.ejecutar_desde - timezone.now()).total_seconds()
+        self.assertTrue(5 < espera <= 10, espera)
+        # Todavía en backoff: nada que ejecutar
+        self.assertEqual(jobs.procesar_pendientes(), 0)
+
+        BackgroundJob.objects.filter(pk=job.pk).update(ejecutar_desde=timezone.now())
+        with self.assertLogs('market.jobs', level='ERROR'):
+            jobs.procesar_pendientes()
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.intentos), ('fallido', 2))
+
+    def test_expired_lease_returns_job_to_queue(self):
+        job = jobs.encolar('market.restituir_stock', pedido_id=self.order.pk)
+        self.assertEqual(jobs.reclamar().pk, job.pk)
+        self.assertIsNone(jobs.reclamar())
+        BackgroundJob.objects.filter(pk=job.pk).update(bloqueado_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.recuperar_vencidos(), 1)
+        self.assertEqual(jobs.reclamar().pk, job.pk)
+
+    def test_expired_lease_on_last_attempt_fails_the_job(self):
+        job = jobs.encolar('market.restituir_stock', pedido_id=self.order.pk)
+        BackgroundJob.objects.filter(pk=job.pk).update(max_intentos=2)
+        for intento in (1, 2):
+            self.assertEqual(jobs.reclamar().pk, job.pk)
+            # El worker murió sin registrar nada
+            BackgroundJob.objects.filter(pk=job.pk).update(bloqueado_hasta=timezone.now() - timedelta(seconds=1))
+            if intento == 1:
+                self.assertEqual(jobs.recuperar_vencidos(), 1)
+        with self.assertLogs('market.jobs', level='ERROR'):
+            self.assertEqual(jobs.recuperar_vencidos(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.intentos, job.bloqueado_hasta), ('fallido', 2, None))
+        self.assertIn('Lease vencido', job.error)
+        self.assertIsNone(jobs.reclamar())
+
+    def test_job_that_lost_its_lease_does_not_complete(self):
+        self.order.estado = 'cancelado'
+        self.order.save()
+        lento = jobs.reclamar()
+        # El lease venció mientras corría: vuelve a la cola y lo toma otro worker
+        BackgroundJob.objects.filter(pk=lento.pk).update(bloqueado_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.recuperar_vencidos(), 1)
+        otro = jobs.reclamar()
+        self.assertEqual(otro.pk, lento.pk)
+
+        with self.assertLogs('market.jobs', level='WARNING'):
+            jobs.ejecutar(lento)
+        job = BackgroundJob.objects.get(pk=lento.pk)
+        self.assertEqual((job.estado, job.bloqueado_hasta), ('ejecutando', otro.bloqueado_hasta))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+        jobs.ejecutar(otro)
+        job.refresh_from_db()
+        self.assertEqual(job.estado, 'completado')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+    def test_restock_is_idempotent(self):
+        self.order.estado = 'cancelado'
+        self.order.save()
+        jobs.encolar('market.restituir_stock', pedido_id=self.order.pk)
+        self.assertEqual(jobs.procesar_pendientes(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        # Guardar la instancia vieja no borra la marca
+        self.order.direccion_envio = 'Calle 2'
+        self.order.save()
+        self.assertTrue(Order.objects.get(pk=self.order.pk).stock_restituido)
+
+    def test_force_delete_of_cancelled_order_restocks_before_deleting(self):
+        self.order.estado = 'cancelado'
+        self.order.save()
+        restitucion = BackgroundJob.objects.get()
+        response = self.client.post(reverse('order-force-delete', args=[self.order.pk]))
+        self.assertEqual(response.status_code, 202)
+        # El borrado corre antes que la restitución pendiente: igual devuelve el stock, una vez
+        eliminacion = BackgroundJob.objects.exclude(pk=restitucion.pk).get()
+        BackgroundJob.objects.filter(pk=restitucion.pk).update(ejecutar_desde=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(jobs.procesar_pendientes(), 1)
+        self.assertEqual(BackgroundJob.objects.get(pk=eliminacion.pk).estado, 'completado')
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+        BackgroundJob.objects.filter(pk=restitucion.pk).update(ejecutar_desde=timezone.now())
+        self.assertEqual(jobs.procesar_pendientes(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+    def test_force_delete_and_shipment_status_are_deferred(self):
+        envio = Shipment.objects.create(pedido=self.order, direccion_envio='Calle 1', empresa_envio='Correo')
+        response = self.client.post(reverse('shipment-update-status', args=[envio.pk]), {'estado': 'en camino'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.estado, 'pendiente')
+
+        response = self.client.post(reverse('order-force-delete', args=[self.order.pk]))
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(Order.objects.filter(pk=self.order.pk).exists())
+
+        self.assertEqual(jobs.procesar_pendientes(), 2)
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+    def test_purge_completed_jobs(self):
+        jobs.encolar('market.restituir_stock', pedido_id=self.order.pk)
+        jobs.procesar_pendientes()
+        self.assertEqual(jobs.purgar_completados(), 0)
+        BackgroundJob.objects.update(actualizado=timezone.now() - timedelta(days=8))
+        self.assertEqual(jobs.purgar_completados(), 1)
@@ -1,5 +1,14 @@
+from datetime import timedelta
+from importlib import import_module
+from django.apps import apps
 from django.test import TestCase
-from market.models import Category, Product, Order, OrderDetail, Pay, Shipment, Cart, CartItem
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from market.models import Category, Product, ProductSearchTerm, Order, OrderDetail, Pay, Shipment, Cart, CartItem, Favorite
 from account_admin.models import User
 from faker import Faker
 
@@ -86,6 +95,10 @@ class TestModels(TestCase):
         self.assertEqual(self.cart.total(), self.product.precio * self.cart_item.cantidad)
         self.assertEqual(self.cart.cantidad_items(), self.cart_item.cantidad)
 
+    def test_cart_totales_empty_cart(self):
+        self.cart.limpiar()
+        self.assertEqual(self.cart.totales(), {'total': 0, 'cantidad_items': 0})
+
     def test_cart_limpiar(self):
         self.cart.limpiar()
         self.assertEqual(self.cart.items.count(), 0)
@@ -95,6 +108,20 @@ class TestModels(TestCase):
         self.order.refresh_from_db()
         self.assertEqual(self.order.total, self.order_detail.subtotal)
 
+    def test_order_total_update_single_query(self):
+        otro = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=7, stock=10, categoria=self.category
+        )
+        OrderDetail.objects.create(pedido=self.order, producto=otro, cantidad=3)
+        with self.assertNumQueries(1):
+            self.order.total_update()
+        self.assertEqual(self.order.total, self.order_detail.subtotal + 21)
+
+    def test_order_total_update_without_details(self):
+        self.order.detalles.all().delete()
+        self.order.total_update()
+        self.assertEqual(self.order.total, 0)
+
     def test_order_cancel_restock(self):
         # Simula cancelar el pedido y verifica que el stock se restituye
         stock_anterior = self.product.stock
@@ -103,10 +130,137 @@ class TestModels(TestCase):
         self.product.refresh_from_db()
         self.assertEqual(self.product.stock, stock_anterior + self.order_detail.cantidad)
 
+    def test_order_cancel_restock_after_deferred_total_reload(self):
+        stock_anterior = self.product.stock
+        pedido = Order.objects.get(pk=self.order.pk)
+        pedido.estado = 'cancelado'
+        pedido.total_update()
+        self.assertEqual(pedido.total, self.order_detail.subtotal)  # relee solo `total`
+        pedido.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock_anterior + self.order_detail.cantidad)
+
+    def test_order_state_change_without_extra_select(self):
+        pedido = Order.objects.get(pk=self.order.pk)
+        pedido.estado = 'pagado'
+        with self.assertNumQueries(1):
+            pedido.save()
+
+    def test_order_cancel_restock_groups_by_product(self):
+        OrderDetail.objects.create(pedido=self.order, producto=self.product, cantidad=4)
+        stock_anterior = self.product.stock
+        pedido = Order.objects.get(pk=self.order.pk)
+        pedido.estado = 'cancelado'
+        with CaptureQueriesContext(connection) as ctx:
+            pedido.save()
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "market_product"')]
+        self.assertEqual(len(updates), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock_anterior + self.order_detail.cantidad + 4)
+        # Guardar de nuevo un pedido ya cancelado no vuelve a restituir stock
+        pedido.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock_anterior + self.order_detail.cantidad + 4)
+
+    def test_order_cancel_restock_unloaded_instance(self):
+        stock_anterior = self.product.stock
+        Order(pk=self.order.pk, estado='cancelado').save(update_fields=['estado'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock_anterior + self.order_detail.cantidad)
+
     def test_orderdetail_save_subtotal(self):
         self.order_detail.cantidad = 5
         self.order_detail.save()
         self.assertEqual(self.order_detail.subtotal, self.product.precio * 5)
 
     def test_cartitem_subtotal(self):
-        self.assertEqual(self.cart_item.subtotal(), self.product.precio * self.cart_item.cantidad)
\ No newline at end of file
+        self.assertEqual(self.cart_item.subtotal(), self.product.precio * self.cart_item.cantidad)
+
+    def test_product_search_terms_indexed_on_save(self):
+        self.product.nombre = 'Auriculares Bluetooth'
+        self.product.save()
+        terminos = set(self.product.search_terms.values_list('termino', flat=True))
+        self.assertTrue({'auriculares', 'bluetooth'} <= terminos)
+
+    def test_rebuild_search_index_command(self):
+        ProductSearchTerm.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertTrue(self.product.search_terms.exists())
+
+
+class TestFilterPathIndexes(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_data', '--categories', '5', '--products', '300', '--users', '20', '--orders', '200',
+                     '--seed', '3', stdout=StringIO())
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Con tablas chicas el planner prefiere seq scan: forzar que considere los índices
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *indices):
+        plan = queryset.explain()
+        self.assertTrue(any(indice in plan for indice in indices), plan)
+
+    def test_orders_by_user_and_date(self):
+        usuario = Order.objects.values_list('usuario_id', flat=True).first()
+        self.assertUsesIndex(Order.objects.filter(usuario_id=usuario).order_by('-fecha'), 'order_usuario_fecha_idx')
+
+    def test_products_by_category_and_price(self):
+        categoria = Category.objects.values_list('id', flat=True).first()
+        self.assertUsesIndex(
+            Product.objects.filter(categoria_id=categoria, precio__gte=100), 'product_categoria_precio_idx'
+        )
+
+    def test_pays_by_order_and_state(self):
+        pedido = Pay.objects.values_list('pedido_id', flat=True).first()
+        self.assertUsesIndex(
+            Pay.objects.filter(pedido_id=pedido, estado='completado'), 'pay_pedido_estado_idx'
+        )
+
+    def test_pays_by_state(self):
+        self.assertUsesIndex(Pay.objects.filter(estado='en_revision').order_by('-creado'), 'pay_estado_creado_idx')
+
+    def test_favorites_by_user(self):
+        usuario = User.objects.filter(favorites__isnull=False).values_list('id', flat=True).first()
+        self.assertUsesIndex(
+            Favorite.objects.filter(user_id=usuario).order_by('-created_at'),
+            'favorite_user_created_idx', 'uniq_favorite_user_product',
+        )
+
+    def test_open_payment_guard_uses_partial_unique_index(self):
+        if not connection.features.supports_partial_indexes:
+            self.skipTest('La base no soporta índices parciales')
+        pedido = Order.objects.filter(pagos__isnull=True).first()
+        Pay.objects.create(pedido=pedido, metodo='tarjeta', monto_pagado=1)
+        duplicado = Pay(pedido=pedido, metodo='paypal', monto_pagado=1)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(ValidationError):
+                duplicado.save()
+        # Nada de consultar antes de insertar: el INSERT va primero y solo si falla se mira
+        # qué constraint saltó (SQLite no informa el nombre y se reevalúa el constraint)
+        sqls = [q['sql'].upper() for q in ctx.captured_queries]
+        primer_insert = next(i for i, sql in enumerate(sqls) if sql.startswith('INSERT'))
+        self.assertFalse(any('EXISTS' in sql or 'LIMIT 1' in sql for sql in sqls[:primer_insert]))
+        # Un pago cerrado no cuenta como abierto
+        Pay.objects.filter(pedido=pedido).update(estado='fallido')
+        Pay.objects.create(pedido=pedido, metodo='paypal', monto_pagado=1)
+
+    def test_migration_closes_duplicate_open_payments_before_the_unique_index(self):
+        if not connection.features.supports_partial_indexes:
+            self.skipTest('La base no soporta índices parciales')
+        migracion = import_module('market.migrations.0014_filter_path_indexes')
+        pedido = Order.objects.filter(pagos__isnull=True).first()
+        # Datos previos al índice (la transacción del test lo restaura)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX pay_pedido_abierto_uniq')
+        viejo = Pay.objects.create(pedido=pedido, metodo='tarjeta', monto_pagado=1)
+        Pay.objects.filter(pk=viejo.pk).update(creado=timezone.now() - timedelta(hours=1))
+        nuevo = Pay.objects.create(pedido=pedido, metodo='paypal', monto_pagado=1)
+
+        migracion.cerrar_pagos_abiertos_duplicados(apps, None)
+        migracion.crear_indices_parciales(apps, connection.schema_editor())
+        self.assertEqual(Pay.objects.get(pk=viejo.pk).estado, 'fallido')
+        self.assertEqual(Pay.objects.get(pk=nuevo.pk).estado, 'pendiente')
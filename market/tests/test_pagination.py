@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+from market.models import Category, Product
+from market.pagination import ProductCursorPagination
+from faker import Faker
+
+fake = Faker()
+
+
+class TestProductCursorPagination(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.other_category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        for i in range(7):
+            Product.objects.create(
+                nombre=f'producto {i}', descripcion=fake.text(), precio=10 + i, stock=5,
+                categoria=self.category if i % 2 == 0 else self.other_category
+            )
+
+    def _collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_product_list_without_cursor_is_not_paginated(self):
+        response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_product_cursor_pagination_walks_all_pages(self):
+        ids = self._collect(reverse('product-list') + '?page_size=3')
+        self.assertEqual(ids, list(Product.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_product_cursor_pagination_ordering_by_precio_desc(self):
+        ids = self._collect(reverse('product-list') + '?page_size=2&ordering=-precio')
+        self.assertEqual(ids, list(Product.objects.order_by('-precio', '-id').values_list('id', flat=True)))
+
+    def test_product_cursor_pagination_with_filters(self):
+        url = reverse('product-list') + f'?page_size=2&categoria={self.category.id}&precio_min=12'
+        ids = self._collect(url)
+        expected = Product.objects.filter(categoria=self.category, precio__gte=12).order_by('id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+    def test_product_cursor_pagination_page_size_is_capped(self):
+        response = self.client.get(reverse('product-list') + '?page_size=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.data['results']), ProductCursorPagination.max_page_size)
+
+    def test_product_cursor_pagination_invalid_cursor(self):
+        response = self.client.get(reverse('product-list') + '?cursor=invalido')
+        self.assertEqual(response.status_code, 404)
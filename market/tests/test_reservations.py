@@ -0,0 +1,86 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import CartItem, Category, Product, StockReservation
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+@override_settings(STOCK_RESERVATIONS_ENABLED=True, STOCK_RESERVATION_TTL=timedelta(minutes=10))
+class TestStockReservations(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.product = Product.objects.create(
+            nombre=fake.word(), descripcion=fake.text(), precio=10, stock=5, categoria=category
+        )
+        self.buyer, self.other = [
+            User.objects.create_user(
+                username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123'
+            )
+            for _ in range(2)
+        ]
+        self.client = APIClient()
+        self.add_url = reverse('product-add-to-cart', kwargs={'pk': self.product.id})
+
+    def _add(self, user, cantidad):
+        self.client.force_authenticate(user=user)
+        return self.client.post(self.add_url, {'cantidad': cantidad})
+
+    def test_add_to_cart_holds_stock_for_other_carts(self):
+        self.assertEqual(self._add(self.buyer, 3).status_code, 200)
+        reserva = StockReservation.objects.get(carrito__usuario=self.buyer)
+        self.assertEqual(reserva.cantidad, 3)
+        response = self._add(self.other, 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Solo hay 2 unidades', response.data['error'])
+        self.assertEqual(self._add(self.other, 2).status_code, 200)
+        # Lo retenido por el otro carrito también limita al primero (3 + 1 > 5 - 2)
+        self.assertEqual(self._add(self.buyer, 1).status_code, 400)
+
+    def test_checkout_converts_reservation_and_respects_others(self):
+        self._add(self.buyer, 3)
+        self._add(self.other, 2)
+        self.client.force_authenticate(user=self.buyer)
+        response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertFalse(StockReservation.objects.filter(carrito__usuario=self.buyer).exists())
+        self.assertTrue(StockReservation.objects.filter(carrito__usuario=self.other).exists())
+
+    def test_checkout_fails_if_stock_is_held_by_others(self):
+        self._add(self.buyer, 3)
+        # La reserva del comprador vence y otro carrito retiene ese stock
+        StockReservation.objects.update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self._add(self.other, 4).status_code, 200)
+        self.client.force_authenticate(user=self.buyer)
+        response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, 400)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_cart_item_update_and_delete_adjust_reservation(self):
+        self._add(self.buyer, 2)
+        item = CartItem.objects.get(carrito__usuario=self.buyer)
+        response = self.client.patch(reverse('cartitem-detail', kwargs={'pk': item.id}), {'cantidad': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StockReservation.objects.get().cantidad, 4)
+        self.client.delete(reverse('cartitem-detail', kwargs={'pk': item.id}))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expire_command_removes_only_expired_holds(self):
+        self._add(self.buyer, 1)
+        self._add(self.other, 1)
+        StockReservation.objects.filter(carrito__usuario=self.buyer).update(
+            expira=timezone.now() - timedelta(seconds=1)
+        )
+        call_command('expire_stock_reservations', stdout=StringIO())
+        self.assertEqual(
+            list(StockReservation.objects.values_list('carrito__usuario', flat=True)), [self.other.id]
+        )
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+from market.models import Category, Product
+from faker import Faker
+
+fake = Faker()
+
+
+class TestProductSearch(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.teclado = Product.objects.create(
+            nombre='Teclado mecánico', descripcion='Switches rojos y retroiluminación',
+            precio=100, stock=5, categoria=self.category
+        )
+        self.mouse = Product.objects.create(
+            nombre='Mouse inalámbrico', descripcion='Ideal para acompañar un teclado',
+            precio=30, stock=5, categoria=self.category
+        )
+        self.monitor = Product.objects.create(
+            nombre='Monitor 27', descripcion='Panel IPS', precio=300, stock=5, categoria=self.category
+        )
+
+    def _search(self, q, extra=''):
+        response = self.client.get(reverse('product-list') + f'?q={q}{extra}')
+        self.assertEqual(response.status_code, 200)
+        return [p['id'] for p in response.data]
+
+    def test_search_ranks_name_matches_first(self):
+        self.assertEqual(self._search('teclado'), [self.teclado.id, self.mouse.id])
+
+    def test_search_prefix_and_accents(self):
+        self.assertEqual(self._search('mecan'), [self.teclado.id])
+        self.assertEqual(self._search('INALAMB'), [self.mouse.id])
+
+    def test_search_requires_all_terms(self):
+        self.assertEqual(self._search('teclado rojos'), [self.teclado.id])
+        self.assertEqual(self._search('monitor teclado'), [])
+
+    def test_search_combined_with_filters(self):
+        self.assertEqual(self._search('teclado', '&precio_max=50'), [self.mouse.id])
+
+    def test_search_pages_keep_the_relevance_order(self):
+        url = reverse('product-list') + '?q=teclado&page_size=1&ordering=-id'
+        primera = self.client.get(url)
+        self.assertEqual([p['id'] for p in primera.data['results']], [self.teclado.id])
+        self.assertEqual(primera.data['count'], 2)
+        segunda = self.client.get(primera.data['next'])
+        self.assertEqual([p['id'] for p in segunda.data['results']], [self.mouse.id])
+        self.assertIsNone(segunda.data['next'])
+
+    def test_search_rejects_cursor(self):
+        response = self.client.get(reverse('product-list') + '?q=teclado&cursor=cD0x')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+    def test_search_index_follows_updates_and_deletes(self):
+        self.monitor.nombre = 'Pantalla curva'
+        self.monitor.save()
+        self.assertEqual(self._search('monitor'), [])
+        self.assertEqual(self._search('pantalla'), [self.monitor.id])
+        self.mouse.delete()
+        self.assertEqual(self._search('teclado'), [self.teclado.id])
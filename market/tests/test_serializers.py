@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from market.models import *
 from market.serializer import *
 from account_admin.models import User
@@ -153,6 +155,12 @@ class TestSerializers(TestCase):
         self.assertEqual(float(data['total']), float(self.cart.total()))
         self.assertEqual(data['cantidad_items'], self.cart.cantidad_items())
 
+    def test_cart_serializer_aggregates_totals_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            CartSerializer(instance=self.cart).data
+        agregados = [q['sql'] for q in queries.captured_queries if 'SUM(' in q['sql'].upper()]
+        self.assertEqual(len(agregados), 1)
+
     def test_order_serializer_get_detalles_no_attrs(self):
         class DummyObj:
             pass
@@ -0,0 +1,201 @@
+import os
+import tempfile
+from unittest.mock import patch
+from datetime import timedelta
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.db import DatabaseError
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from market.models import BackgroundJob, Order, Pay, ProofUpload
+from market.views import PayViewSet
+from market import jobs, uploads
+from account_admin.models import User
+from faker import Faker
+
+fake = Faker()
+
+
+class TestProofUploads(APITestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.spool = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media.name, MEDIA_URL='/media/', PROOF_UPLOAD_TEMP_DIR=self.spool.name,
+            JOBS_ASYNC=False, PROOF_UPLOAD_SYNC=True, PROOF_UPLOAD_MAX_BYTES=1024,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.addCleanup(self.media.cleanup)
+        self.addCleanup(self.spool.cleanup)
+
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.order = Order.objects.create(usuario=self.user, estado='pendiente', total=50)
+        self.pay = Pay.objects.create(pedido=self.order, metodo='transferencia')
+        self.url = reverse('pay-proof-upload', args=[self.pay.id])
+        self.contenido = b'%PDF-1.4 comprobante ' + b'x' * 200
+
+    def _abrir(self):
+        return self.client.post(self.url, {'nombre': 'comprobante.pdf', 'tamano': len(self.contenido),
+                                           'content_type': 'application/pdf'}, format='json')
+
+    def _enviar(self, datos, inicio=None):
+        headers = {}
+        if inicio is not None:
+            fin = inicio + len(datos) - 1
+            headers['HTTP_CONTENT_RANGE'] = f'bytes {inicio}-{fin}/{len(self.contenido)}'
+        return self.client.put(self.url, datos, content_type='application/octet-stream', **headers)
+
+    def test_single_stream_upload_reaches_storage(self):
+        self.assertEqual(self._abrir().status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._enviar(self.contenido)
+        self.assertEqual(response.status_code, 202)
+
+        self.pay.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.pay.estado, 'en_revision')
+        self.assertEqual(self.order.estado, 'en_revision')
+        with self.pay.comprobante_archivo.open('rb') as archivo:
+            self.assertEqual(archivo.read(), self.contenido)
+
+        estado = self.client.get(self.url).data
+        self.assertEqual(estado['estado'], 'completado')
+        self.assertTrue(estado['url'].startswith('/media/comprobantes/'))
+        self.assertEqual(os.listdir(self.spool.name), [])
+
+    def test_chunked_upload_resumes_from_reported_offset(self):
+        self._abrir()
+        response = self._enviar(self.contenido[:100], inicio=0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['offset'], 100)
+
+        # Reintento desde un offset equivocado: 409 con el offset a retomar
+        response = self._enviar(self.contenido[50:], inicio=50)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 100)
+        self.assertEqual(self.client.get(self.url).data['offset'], 100)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._enviar(self.contenido[100:], inicio=100)
+        self.assertEqual(response.status_code, 202)
+        self.pay.refresh_from_db()
+        with self.pay.comprobante_archivo.open('rb') as archivo:
+            self.assertEqual(archivo.read(), self.contenido)
+
+    def test_storage_push_waits_for_commit_without_job_queue(self):
+        self._abrir()
+        with patch('market.uploads.subir') as subir, self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self._enviar(self.contenido)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['estado'], 'subiendo')
+        self.assertEqual(response.data['url'], '')
+        # Sin JOBS_ASYNC el push no corre dentro del request: queda para después del commit
+        subir.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+        with override_settings(PROOF_UPLOAD_SYNC=False), \
+                patch('market.uploads.ThreadPoolExecutor') as executor, patch('market.uploads._executor', None):
+            callbacks[0]()
+        executor.return_value.submit.assert_called_once_with(uploads._subir_en_hilo, response.data['id'])
+
+    def test_storage_push_runs_as_background_job(self):
+        self._abrir()
+        with override_settings(JOBS_ASYNC=True):
+            response = self._enviar(self.contenido)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['estado'], 'subiendo')
+        self.assertEqual(response.data['url'], '')
+        self.pay.refresh_from_db()
+        self.assertEqual(self.pay.estado, 'en_revision')
+        self.assertFalse(self.pay.comprobante_archivo)
+
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.tarea, 'market.subir_comprobante')
+        self.assertEqual(jobs.procesar_pendientes(), 1)
+        self.assertEqual(self.client.get(self.url).data['estado'], 'completado')
+
+    def test_rejects_oversized_uploads(self):
+        response = self.client.post(self.url, {'nombre': 'enorme.pdf', 'tamano': 4096}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self._abrir()
+        response = self._enviar(self.contenido + b'extra')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).data['offset'], 0)
+
+    def test_other_clients_cannot_upload(self):
+        otro = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.client.force_authenticate(user=otro)
+        self.assertEqual(self._abrir().status_code, 403)
+        self.assertEqual(self._enviar(self.contenido).status_code, 403)
+
+    def test_multipart_proof_uses_background_push(self):
+        archivo = SimpleUploadedFile('comprobante.png', b'\x89PNG' + b'0' * 100, content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('pay-proof', args=[self.pay.id]),
+                                        {'comprobante_archivo': archivo}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['estado'], 'en_revision')
+        # La respuesta sale antes del push; el archivo llega al storage al confirmar la transacción
+        self.assertEqual(response.data['comprobante_subida']['estado'], 'subiendo')
+        self.assertEqual(ProofUpload.objects.get(pago=self.pay).estado, 'completado')
+        self.pay.refresh_from_db()
+        self.assertTrue(self.pay.comprobante_archivo.name.startswith('comprobantes/'))
+
+    def test_push_is_claimed_by_a_single_process(self):
+        self._abrir()
+        with self.captureOnCommitCallbacks(execute=False):
+            respuesta = self._enviar(self.contenido)
+        subida_id = respuesta.data['id']
+        # Otro proceso (el job o process_proof_uploads) ya la reclamó y está subiendo
+        ProofUpload.objects.filter(pk=subida_id).update(estado='enviando', actualizado=timezone.now())
+        with patch('django.core.files.storage.FileSystemStorage.save') as guardar:
+            self.assertEqual(uploads.subir(subida_id).estado, 'enviando')
+            self.assertEqual(uploads.reintentar(colgadas_despues=timedelta(minutes=10)), 0)
+        guardar.assert_not_called()
+
+        # Si ese proceso murió a mitad del push, la subida se retoma pasado PROOF_UPLOAD_STALE_AFTER
+        ProofUpload.objects.filter(pk=subida_id).update(actualizado=timezone.now() - timedelta(hours=1))
+        self.assertEqual(uploads.reintentar(), 1)
+        self.assertEqual(ProofUpload.objects.get(pk=subida_id).estado, 'completado')
+
+    def test_rolled_back_proof_removes_spooled_file(self):
+        archivo = SimpleUploadedFile('comprobante.png', b'\x89PNG' + b'0' * 100, content_type='image/png')
+        with patch.object(PayViewSet, '_pasar_a_revision', side_effect=DatabaseError('sin conexión')), \
+                self.assertRaises(DatabaseError):
+            self.client.post(reverse('pay-proof', args=[self.pay.id]), {'comprobante_archivo': archivo},
+                             format='multipart')
+        self.assertFalse(ProofUpload.objects.exists())
+        self.assertEqual(os.listdir(self.spool.name), [])
+
+    def test_failed_push_is_retried_by_command(self):
+        self._abrir()
+        with patch('django.core.files.storage.FileSystemStorage.save', side_effect=OSError('sin conexión')), \
+                self.assertLogs('market', level='WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._enviar(self.contenido)
+        subida = ProofUpload.objects.get(pago=self.pay)
+        self.assertEqual(subida.estado, 'fallido')
+        self.assertTrue(os.path.exists(subida.ruta_temporal))
+
+        out = StringIO()
+        call_command('process_proof_uploads', stdout=out)
+        self.assertIn('Comprobantes subidos: 1', out.getvalue())
+        subida.refresh_from_db()
+        self.assertEqual(subida.estado, 'completado')
+        self.assertEqual(subida.intentos, 2)
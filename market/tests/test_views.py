@@ -1,10 +1,13 @@
+from unittest.mock import patch
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from market.models import *
+from market.views import CartViewSet
 from account_admin.models import User
 from faker import Faker
-from unittest.mock import put
 
 fake = Faker()
 
@@ -628,31 +631,23 @@ class TestViews(APITestCase):
         CartItem.objects.create(carrito=self.cart, producto=product1, cantidad=5)
         CartItem.objects.create(carrito=self.cart, producto=product2, cantidad=5)
 
-        # Mock del método refresh_from_db para simular la concurrencia
-        original_refresh = Product.refresh_from_db
-        refresh_call_count = 0
-        
-        def mock_refresh(self):
-            nonlocal refresh_call_count
-            refresh_call_count += 1
-            original_refresh(self)
-            # En la segunda llamada (product2), simular que otro proceso redujo el stock
-            if refresh_call_count == 2 and self.id == product2.id:
-                Product.objects.filter(id=product2.id).update(stock=2)
-                # Refrescar nuevamente para obtener el valor actualizado
-                original_refresh(self)
-        
-        # Aplicar el mock
-        Product.refresh_from_db = mock_refresh
-        
-        try:
+        # Simular que otro proceso redujo el stock de product2 justo después del chequeo inicial
+        original_lock = CartViewSet._lock_products
+
+        def mock_lock(view, producto_ids):
+            productos = original_lock(view, producto_ids)
+            Product.objects.filter(id=product2.id).update(stock=2)
+            return productos
+
+        with patch.object(CartViewSet, '_lock_products', mock_lock):
             url = reverse('cart-checkout')
             response = self.client.post(url)
-            self.assertEqual(response.status_code, 400)
-            self.assertIn('Stock insuficiente', str(response.data))
-        finally:
-            # Restaurar el método original
-            Product.refresh_from_db = original_refresh
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Stock insuficiente', str(response.data))
+        # Rollback completo: sin pedido nuevo y sin stock descontado de product1
+        product1.refresh_from_db()
+        self.assertEqual(product1.stock, 5)
+        self.assertFalse(Order.objects.filter(detalles__producto=product1).exists())
     
     def test_cart_checkout_success(self):
         # Agrega un producto al carrito con cantidad igual al stock
@@ -881,7 +876,7 @@ class TestViews(APITestCase):
         order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
         
         # Mock del queryset select_for_update
-        with put('market.views.Order.objects.select_for_update') as mock_select:
+        with patch('market.views.Order.objects.select_for_update') as mock_select:
             mock_manager = mock_select.return_value
             mock_manager.get.side_effect = Order.DoesNotExist("Pedido no encontrado")
             
@@ -1385,4 +1380,212 @@ class TestViews(APITestCase):
         
         # Verificar que el envío se actualizó
         shipment.refresh_from_db()
-        self.assertEqual(shipment.estado, 'preparando')
\ No newline at end of file
+        self.assertEqual(shipment.estado, 'preparando')
+
+
+class TestQueryCount(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(),
+            email=fake.unique.email(),
+            password='testpass123',
+            role='admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_products(self, n):
+        for _ in range(n):
+            category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+            Product.objects.create(
+                nombre=fake.word(), descripcion=fake.text(), precio=10, stock=50, categoria=category
+            )
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def _add_details(self, order, products):
+        for product in products:
+            OrderDetail.objects.create(pedido=order, producto=product, cantidad=1)
+
+    def test_product_list_query_count_is_constant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_products(2)
+        few = self._count_queries(reverse('product-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_products(10)
+        many = self._count_queries(reverse('product-list'))
+        self.assertEqual(few, many)
+
+    def test_order_list_query_count_independent_of_details(self):
+        self._create_products(10)
+        order = Order.objects.create(usuario=self.user, estado='pendiente')
+        products = list(Product.objects.all())
+        self._add_details(order, products[:1])
+        url = reverse('order-detail', kwargs={'pk': order.id})
+        few = self._count_queries(url)
+        self._add_details(order, products[1:])
+        many = self._count_queries(url)
+        self.assertEqual(few, many)
+
+    def _create_orders(self, n, details_per_order=3):
+        products = list(Product.objects.all()[:details_per_order])
+        for _ in range(n):
+            client_user = User.objects.create_user(
+                username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123'
+            )
+            order = Order.objects.create(usuario=client_user, estado='pendiente')
+            self._add_details(order, products)
+
+    def test_order_list_query_count_independent_of_orders(self):
+        self._create_products(3)
+        self._create_orders(1)
+        few = self._count_queries(reverse('order-list'))
+        self._create_orders(20)
+        many = self._count_queries(reverse('order-list'))
+        self.assertEqual(few, many)
+
+    def test_my_orders_query_count_and_pagination(self):
+        self._create_products(3)
+        products = list(Product.objects.all())
+        for _ in range(5):
+            self._add_details(Order.objects.create(usuario=self.user, estado='pendiente'), products)
+        url = reverse('order-my-orders')
+        flat = self._count_queries(url)
+        response = self.client.get(url + '?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        ids = [o['id'] for o in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids.extend(o['id'] for o in response.data['results'])
+        self.assertEqual(ids, list(Order.objects.filter(usuario=self.user).order_by('-fecha', '-id').values_list('id', flat=True)))
+        for _ in range(5):
+            self._add_details(Order.objects.create(usuario=self.user, estado='pendiente'), products)
+        self.assertEqual(self._count_queries(url), flat)
+
+
+class TestCartTotals(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(),
+            email=fake.unique.email(),
+            password='testpass123',
+            role='client'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cart = Cart.objects.create(usuario=self.user)
+        self.products = []
+        for i in range(6):
+            category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+            self.products.append(Product.objects.create(
+                nombre=fake.word(), descripcion=fake.text(), precio=5 + i, stock=20, categoria=category
+            ))
+
+    def _count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_cart_view_query_count_is_constant(self):
+        CartItem.objects.create(carrito=self.cart, producto=self.products[0], cantidad=1)
+        few, _ = self._count_queries('get', reverse('cart-list'))
+        for product in self.products[1:]:
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=2)
+        many, response = self._count_queries('get', reverse('cart-list'))
+        self.assertEqual(few, many)
+        self.assertEqual(response.data['cantidad_items'], 1 + 2 * 5)
+        self.assertEqual(response.data['total'], float(5 + sum(2 * p.precio for p in self.products[1:])))
+
+    def test_add_to_cart_query_count_is_constant(self):
+        url = reverse('product-add-to-cart', kwargs={'pk': self.products[0].id})
+        self._count_queries('post', url, {'cantidad': 1})
+        few, _ = self._count_queries('post', url, {'cantidad': 1})
+        for product in self.products[1:]:
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=1)
+        many, response = self._count_queries('post', url, {'cantidad': 1})
+        self.assertEqual(few, many)
+        self.assertEqual(response.data['total_items'], 3 + 5)
+
+
+class TestFavoritesBulkMerge(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+        self.products = [
+            Product.objects.create(nombre=fake.word(), descripcion=fake.text(), precio=10, stock=5, categoria=category)
+            for _ in range(5)
+        ]
+        self.url = reverse('favorites-bulk')
+
+    def test_merge_reports_created_skipped_invalid(self):
+        Favorite.objects.create(user=self.user, product=self.products[0])
+        ids = [p.id for p in self.products] + [self.products[1].id, 999999, 'abc']
+        response = self.client.post(self.url, {'product_ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(response.data['merged'], 4)
+        self.assertEqual(response.data['skipped'], 1)
+        self.assertEqual(response.data['invalid'], 2)
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 5)
+
+    def test_merge_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(self.url, {'product_ids': [self.products[0].id]}, format='json')
+        Favorite.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(self.url, {'product_ids': [p.id for p in self.products]}, format='json')
+        self.assertEqual(len(few), len(many))
+
+    def test_rejects_non_list(self):
+        response = self.client.post(self.url, {'product_ids': 5}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class TestPayCreationGuard(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123', role='client'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.order = Order.objects.create(usuario=self.user, estado='pendiente', total=80)
+        self.url = reverse('pay-list')
+
+    def test_create_pay_has_no_separate_open_payment_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'pedido': self.order.id, 'metodo': 'tarjeta'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['monto_pagado'], '80.00')
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].upper().startswith('SELECT')]
+        if connection.features.supports_partial_indexes:
+            # Solo la carga del pedido: sin exists() de pagos abiertos ni lectura del usuario
+            self.assertEqual(len(selects), 1, selects)
+
+    def test_second_open_payment_is_rejected_with_400(self):
+        self.client.post(self.url, {'pedido': self.order.id, 'metodo': 'tarjeta'}, format='json')
+        response = self.client.post(self.url, {'pedido': self.order.id, 'metodo': 'paypal'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Pay.objects.filter(pedido=self.order).count(), 1)
+
+    def test_new_payment_allowed_after_failed_one(self):
+        self.client.post(self.url, {'pedido': self.order.id, 'metodo': 'tarjeta'}, format='json')
+        Pay.objects.filter(pedido=self.order).update(estado='fallido')
+        response = self.client.post(self.url, {'pedido': self.order.id, 'metodo': 'paypal'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_payment_for_foreign_order_is_rejected(self):
+        other = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(), password='testpass123'
+        )
+        order = Order.objects.create(usuario=other, estado='pendiente', total=10)
+        response = self.client.post(self.url, {'pedido': order.id, 'metodo': 'tarjeta'}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,293 @@
+"""
+Subida de comprobantes de pago sin bloquear un worker de gunicorn durante el push al storage.
+- POST .../proof-upload/ abre la subida (nombre, tamaño, content_type).
+- PUT .../proof-upload/ envía los bytes (todo junto o por partes con `Content-Range: bytes
+  inicio-fin/total`). Se copian por bloques a un archivo temporal en PROOF_UPLOAD_TEMP_DIR,
+  nunca enteros en memoria. Si la conexión se corta, GET informa el offset recibido y el
+  cliente retoma desde ahí.
+- Con el último byte el pago pasa a 'en_revision' y el push al storage (Cloudinary en
+  producción) se encola como tarea de market.jobs; GET devuelve la URL final al terminar.
+  Sin JOBS_ASYNC no hay worker de la cola: el push queda a cargo de un hilo en segundo plano
+  al confirmar la transacción (nunca dentro del request), y si falla lo reintenta
+  `process_proof_uploads`. PROOF_UPLOAD_SYNC sube al confirmar en el mismo hilo (tests / desarrollo).
+- El multipart clásico (`proof` y la creación del pago con archivo) usa el mismo camino.
+- `process_proof_uploads` reintenta las subidas que agotaron los intentos del job o quedaron
+  colgadas, y limpia las abandonadas.
+- El push lo pueden intentar a la vez el job (o su reintento tras vencer el lease) y
+  `process_proof_uploads`: `subir` reclama la fila con un UPDATE condicional ('enviando') y solo
+  quien la gana copia el archivo, así no quedan objetos duplicados en el storage.
+El directorio temporal debe ser compartido por los workers que atienden las partes (mismo host).
+"""
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import jobs
+from .models import Pay, ProofUpload
+
+logger = logging.getLogger(__name__)
+
+BLOQUE = 64 * 1024
+
+_executor = None
+
+
+class SubidaInvalida(Exception):
+    """Datos de la subida inválidos (tamaño, nombre, bytes de más)"""
+
+
+class OffsetIncorrecto(Exception):
+    """La parte no empieza donde terminó la anterior; `esperado` es el offset a retomar"""
+    def __init__(self, esperado):
+        super().__init__(f'Se esperaba el offset {esperado}')
+        self.esperado = esperado
+
+
+def directorio_temporal():
+    directorio = getattr(settings, 'PROOF_UPLOAD_TEMP_DIR', '') or os.path.join(tempfile.gettempdir(), 'techwave-proofs')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def tamano_maximo():
+    return getattr(settings, 'PROOF_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def _sincronico():
+    return getattr(settings, 'PROOF_UPLOAD_SYNC', False)
+
+
+def _eliminar_temporal(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def descartar_temporal(subida):
+    """Borra el archivo temporal de una subida cuya transacción no se confirmó"""
+    _eliminar_temporal(subida.ruta_temporal)
+
+
+def _colgadas_antes_de():
+    return timezone.now() - getattr(settings, 'PROOF_UPLOAD_STALE_AFTER', timedelta(minutes=10))
+
+
+def iniciar(pago, nombre, tamano, content_type=''):
+    """Abre una subida para el pago; descarta las anteriores que quedaron a medias"""
+    nombre = os.path.basename(str(nombre or '')).strip()
+    if not nombre:
+        raise SubidaInvalida('Debe indicar el nombre del archivo')
+    try:
+        tamano = int(tamano)
+    except (TypeError, ValueError):
+        raise SubidaInvalida('El tamaño debe ser un entero')
+    if tamano <= 0 or tamano > tamano_maximo():
+        raise SubidaInvalida(f'El tamaño debe estar entre 1 y {tamano_maximo()} bytes')
+
+    for anterior in ProofUpload.objects.filter(pago=pago, estado='recibiendo'):
+        _eliminar_temporal(anterior.ruta_temporal)
+        anterior.delete()
+
+    ruta = os.path.join(directorio_temporal(), f'{uuid.uuid4().hex}.part')
+    open(ruta, 'wb').close()
+    return ProofUpload.objects.create(
+        pago=pago, nombre=nombre[:255], tamano=tamano, content_type=(content_type or '')[:100],
+        ruta_temporal=ruta,
+    )
+
+
+def parsear_content_range(valor, tamano):
+    """`bytes inicio-fin/total` -> inicio (sin header, la parte empieza en 0)"""
+    if not valor:
+        return 0
+    try:
+        unidad, rango = valor.strip().split(' ', 1)
+        rango, total = rango.split('/', 1)
+        inicio, fin = (int(x) for x in rango.split('-', 1))
+    except ValueError:
+        raise SubidaInvalida('Content-Range inválido (formato: bytes inicio-fin/total)')
+    if unidad != 'bytes' or fin < inicio or (total != '*' and int(total) != tamano):
+        raise SubidaInvalida('Content-Range no coincide con la subida')
+    return inicio
+
+
+def recibir(subida, stream, inicio):
+    """
+    Agrega al archivo temporal los bytes de `stream` a partir de `inicio` (debe ser el offset
+    ya recibido). Devuelve la subida con `recibido` actualizado.
+    """
+    if subida.estado != 'recibiendo':
+        raise SubidaInvalida('La subida ya fue completada')
+    if inicio != subida.recibido:
+        raise OffsetIncorrecto(subida.recibido)
+
+    escritos = 0
+    with open(subida.ruta_temporal, 'r+b') as archivo:
+        archivo.seek(inicio)
+        while True:
+            bloque = stream.read(BLOQUE) if stream is not None else b''
+            if not bloque:
+                break
+            escritos += len(bloque)
+            if inicio + escritos > subida.tamano:
+                archivo.truncate(inicio)
+                raise SubidaInvalida('Se enviaron más bytes que el tamaño declarado')
+            archivo.write(bloque)
+        # Descarta restos de una parte anterior que se cortó antes de confirmarse
+        archivo.truncate()
+
+    # Confirmación condicional: si otra parte avanzó el offset en paralelo, esta no cuenta
+    actualizadas = ProofUpload.objects.filter(pk=subida.pk, recibido=inicio, estado='recibiendo').update(
+        recibido=F('recibido') + escritos, actualizado=timezone.now()
+    )
+    subida.refresh_from_db(fields=['recibido', 'estado', 'actualizado'])
+    if not actualizadas:
+        raise OffsetIncorrecto(subida.recibido)
+    return subida
+
+
+def encolar(subida):
+    """
+    Marca la subida como lista y programa el push al storage: job en la misma transacción con
+    JOBS_ASYNC, o un hilo del proceso al confirmarla si no hay cola
+    """
+    ProofUpload.objects.filter(pk=subida.pk).update(estado='subiendo', actualizado=timezone.now())
+    subida.estado = 'subiendo'
+    if jobs.asincronicos():
+        jobs.encolar('market.subir_comprobante', subida_id=subida.pk)
+    else:
+        transaction.on_commit(lambda: despachar(subida.pk))
+
+
+def desde_archivo(pago, archivo):
+    """Subida completa a partir de un archivo ya recibido por multipart (UploadedFile)"""
+    subida = iniciar(pago, archivo.name, archivo.size, getattr(archivo, 'content_type', '') or '')
+    try:
+        with open(subida.ruta_temporal, 'wb') as destino:
+            for bloque in archivo.chunks(BLOQUE):
+                destino.write(bloque)
+    except Exception:
+        descartar_temporal(subida)
+        raise
+    ProofUpload.objects.filter(pk=subida.pk).update(recibido=subida.tamano)
+    subida.recibido = subida.tamano
+    encolar(subida)
+    return subida
+
+
+def despachar(subida_id):
+    if _sincronico():
+        subir(subida_id)
+        return
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PROOF_UPLOAD_WORKERS', 2), thread_name_prefix='proof-upload'
+        )
+    _executor.submit(_subir_en_hilo, subida_id)
+
+
+def _subir_en_hilo(subida_id):
+    try:
+        subir(subida_id)
+    except Exception:
+        logger.exception('Error subiendo el comprobante %s', subida_id)
+    finally:
+        connection.close()  # la conexión es del hilo del executor
+
+
+def subir(subida_id):
+    """
+    Copia el archivo temporal al storage del campo comprobante_archivo y lo asigna al pago.
+    Antes reclama la subida ('enviando'); si otro proceso ya la tiene (o terminó), no hace nada.
+    Una 'enviando' sin novedades desde PROOF_UPLOAD_STALE_AFTER se da por abandonada.
+    """
+    reclamables = Q(estado__in=('subiendo', 'fallido')) | Q(estado='enviando', actualizado__lt=_colgadas_antes_de())
+    reclamada = ProofUpload.objects.filter(reclamables, pk=subida_id).update(
+        estado='enviando', intentos=F('intentos') + 1, actualizado=timezone.now()
+    )
+    subida = ProofUpload.objects.select_related('pago').get(pk=subida_id)
+    if not reclamada:
+        return subida
+    campo = subida.pago.comprobante_archivo
+    try:
+        with open(subida.ruta_temporal, 'rb') as archivo:
+            nombre = campo.field.generate_filename(subida.pago, subida.nombre)
+            nombre = campo.storage.save(nombre, File(archivo, name=subida.nombre), max_length=campo.field.max_length)
+    except Exception as e:
+        logger.exception('No se pudo subir el comprobante %s al storage', subida.pk)
+        ProofUpload.objects.filter(pk=subida.pk).update(
+            estado='fallido', error=str(e)[:1000], actualizado=timezone.now()
+        )
+        subida.refresh_from_db()
+        return subida
+
+    ahora = timezone.now()
+    # update() no pasa por Pay.save (sin revalidar pagos abiertos); `actualizado` a mano para el ETag
+    Pay.objects.filter(pk=subida.pago_id).update(comprobante_archivo=nombre, actualizado=ahora)
+    ProofUpload.objects.filter(pk=subida.pk).update(estado='completado', error='', actualizado=ahora)
+    _eliminar_temporal(subida.ruta_temporal)
+    subida.refresh_from_db()
+    return subida
+
+
+def url_final(subida):
+    if subida.estado != 'completado':
+        return ''
+    try:
+        return subida.pago.comprobante_archivo.url
+    except Exception:
+        return ''
+
+
+def estado(subida):
+    return {
+        'id': subida.id,
+        'pago': subida.pago_id,
+        'nombre': subida.nombre,
+        'estado': subida.estado,
+        'offset': subida.recibido,
+        'tamano': subida.tamano,
+        'url': url_final(subida),
+        'error': subida.error,
+    }
+
+
+def reintentar(max_intentos=None, colgadas_despues=None):
+    """
+    Vuelve a subir las fallidas (hasta `max_intentos`) y las que quedaron en 'subiendo' más
+    de `colgadas_despues` (el proceso murió a mitad del push). Devuelve cuántas se completaron.
+    """
+    max_intentos = max_intentos or getattr(settings, 'PROOF_UPLOAD_MAX_ATTEMPTS', 5)
+    limite = timezone.now() - colgadas_despues if colgadas_despues else _colgadas_antes_de()
+    candidatas = (
+        ProofUpload.objects.filter(estado='fallido', intentos__lt=max_intentos)
+        | ProofUpload.objects.filter(estado__in=('subiendo', 'enviando'), actualizado__lt=limite)
+    ).values_list('pk', flat=True)
+    completadas = 0
+    for subida_id in list(candidatas):
+        if subir(subida_id).estado == 'completado':
+            completadas += 1
+    return completadas
+
+
+def purgar_abandonadas(antiguedad=None):
+    """Borra las subidas que nunca terminaron de recibirse (y su archivo temporal)"""
+    antiguedad = antiguedad or getattr(settings, 'PROOF_UPLOAD_ABANDON_AFTER', timedelta(hours=24))
+    abandonadas = ProofUpload.objects.filter(estado='recibiendo', actualizado__lt=timezone.now() - antiguedad)
+    eliminadas = 0
+    for subida in abandonadas:
+        _eliminar_temporal(subida.ruta_temporal)
+        subida.delete()
+        eliminadas += 1
+    return eliminadas
@@ -1,6 +1,6 @@
 from django.urls import path, include 
 from rest_framework import routers
-from market import views
+from market import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r'categories', views.CategoryViewSet, basename='category')
@@ -13,5 +13,12 @@ router.register(r'cart-items', views.CartItemViewSet, basename='cartitem')  # 
 router.register(r'favorites', views.FavoriteViewSet, basename='favorites')
 
 urlpatterns = [
-    path('market/model/', include(router.urls))
+    path('market/model/', include(router.urls)),
+    path('market/cache/stats/', views.catalog_cache_stats, name='catalog-cache-stats'),
+    # Variantes async (ASGI) de los endpoints de lectura más usados
+    path('market/async/products/', async_views.product_list, name='async-product-list'),
+    path('market/async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('market/async/categories/', async_views.category_list, name='async-category-list'),
+    path('market/async/shipment/<int:pk>/tracking/', async_views.shipment_tracking, name='async-shipment-tracking'),
+    path('market/async/orders/my-orders/', async_views.my_orders, name='async-order-my-orders'),
 ]
\ No newline at end of file
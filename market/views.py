@@ -1,20 +1,37 @@
 from django.shortcuts import render, get_object_or_404
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
 from rest_framework import viewsets, status
 from .serializer import *
 from .models import *
 from TechWave.permissions import *
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from .pagination import OrderCursorPagination, ProductCursorPagination, paginador_productos
+from .search import search_products
+from . import catalog_cache, conditional, jobs, reservations, uploads
+from .tasks import ESTADO_PEDIDO_POR_ENVIO
+from .catalog_cache import CachedCatalogMixin
+from .idempotency import idempotent
 
 # Create your views here.
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class StockInsuficiente(Exception):
+    """Se lanza dentro de una transacción para forzar el rollback del checkout"""
+    def __init__(self, nombre, disponible):
+        super().__init__(nombre)
+        self.nombre = nombre
+        self.disponible = disponible
+
+class CategoryViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar las categorías de productos.
     - Administradores y operadores: acceso completo (CRUD)
     - Clientes: solo lectura (GET)
+    - list/retrieve se sirven desde la caché del catálogo (ver catalog_cache)
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer 
@@ -31,20 +48,27 @@ class CategoryViewSet(viewsets.ModelViewSet):
             
         return queryset
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar productos.
     - Administradores y operadores: acceso completo (CRUD) 
     - Clientes: solo lectura (GET)
+    - Búsqueda full-text con ranking por relevancia: ?q=texto (nombre y descripción, por prefijo)
+    - Paginación por cursor opcional: ?page_size=N, ?cursor=..., ?ordering=id|-id|precio|-precio.
+      Con ?q= se pagina por número de página (?page=, ?page_size=) para conservar la relevancia
+    - list/retrieve se sirven desde la caché del catálogo (ver catalog_cache)
     """
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('categoria')
     serializer_class = ProductSerializer
     permission_classes = [ProductPermission]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
+    pagination_class = ProductCursorPagination
     
     def get_queryset(self):
-        """Permite filtrar productos por nombre, categoría o precio"""
-        queryset = Product.objects.all()
+        """Permite buscar productos y filtrarlos por nombre, categoría o precio"""
+        # La categoría se trae en el mismo JOIN (ProductSerializer la expone en cada fila)
+        queryset = Product.objects.select_related('categoria')
+        q = self.request.query_params.get('q', None)
         nombre = self.request.query_params.get('nombre', None)
         categoria = self.request.query_params.get('categoria', None)
         precio_min = self.request.query_params.get('precio_min', None)
@@ -58,8 +82,19 @@ class ProductViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(precio__gte=precio_min)
         if precio_max:
             queryset = queryset.filter(precio__lte=precio_max)
+        if q is not None:
+            # Ordena por relevancia (se pagina con ProductSearchPagination, que respeta ese orden)
+            queryset = search_products(queryset, q)
             
         return queryset
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            # Sin request (ej. generación del esquema OpenAPI) queda el paginador por cursor
+            request = getattr(self, 'request', None)
+            self._paginator = paginador_productos(request.query_params if request is not None else {})
+        return self._paginator
         
     @action(detail=True, methods=['post'], permission_classes=[AddToCartPermission])
     def add_to_cart(self, request, pk=None):
@@ -77,43 +112,50 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # 4. Validar que haya suficiente stock
-        if cantidad > producto.stock:
-            return Response(
-                {'error': f'Stock insuficiente. Solo hay {producto.stock} unidades disponibles'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # 5. Obtener o crear el carrito del usuario
+        # 4. Obtener o crear el carrito del usuario
         carrito, created = Cart.objects.get_or_create(usuario=request.user)
         
-        # 6. Buscar si el producto ya está en el carrito
-        try:
-            item = CartItem.objects.get(carrito=carrito, producto=producto)
-            # 6.1 Si existe, actualizar cantidad (verificando stock)
-            nueva_cantidad = item.cantidad + cantidad
-            if nueva_cantidad > producto.stock:
+        with transaction.atomic():
+            # 5. Validar que haya suficiente stock (descontando reservas de otros carritos)
+            stock_disponible = reservations.disponible(producto, carrito.id)
+            if cantidad > stock_disponible:
                 return Response(
-                    {'error': f'Stock insuficiente. Solo hay {producto.stock} unidades disponibles'}, 
+                    {'error': f'Stock insuficiente. Solo hay {stock_disponible} unidades disponibles'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            item.cantidad = nueva_cantidad
-            item.save()
-            mensaje = 'Producto actualizado en el carrito'
-        except CartItem.DoesNotExist:
-            # 6.2 Si no existe, crear nuevo item
-            CartItem.objects.create(
-                carrito=carrito,
-                producto=producto,
-                cantidad=cantidad
-            )
-            mensaje = 'Producto agregado al carrito'
+            
+            # 6. Buscar si el producto ya está en el carrito
+            try:
+                item = CartItem.objects.get(carrito=carrito, producto=producto)
+                # 6.1 Si existe, actualizar cantidad (verificando stock)
+                nueva_cantidad = item.cantidad + cantidad
+                if nueva_cantidad > stock_disponible:
+                    return Response(
+                        {'error': f'Stock insuficiente. Solo hay {stock_disponible} unidades disponibles'}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                item.cantidad = nueva_cantidad
+                item.save()
+                mensaje = 'Producto actualizado en el carrito'
+            except CartItem.DoesNotExist:
+                # 6.2 Si no existe, crear nuevo item
+                item = CartItem.objects.create(
+                    carrito=carrito,
+                    producto=producto,
+                    cantidad=cantidad
+                )
+                mensaje = 'Producto agregado al carrito'
+            
+            # 6.3 Retener las unidades del item mientras dure la reserva
+            reservations.reservar(carrito.id, producto.id, item.cantidad)
+            Cart.marcar_modificado(carrito.id)
         
-        # 7. Preparar respuesta con los datos del carrito actualizado
+        # 7. Preparar respuesta con los datos del carrito actualizado (un solo aggregate)
+        totales = carrito.totales()
         datos_carrito = {
             'mensaje': mensaje,
-            'total_items': carrito.cantidad_items(),
-            'total': float(carrito.total()),
+            'total_items': totales['cantidad_items'],
+            'total': float(totales['total']),
             'producto_agregado': {
                 'id': producto.id,
                 'nombre': producto.nombre,
@@ -133,6 +175,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [OrderPermission]
+    pagination_class = OrderCursorPagination
     
     def get_queryset(self):
         """
@@ -141,9 +184,22 @@ class OrderViewSet(viewsets.ModelViewSet):
         Este método se usa para las rutas principales (GET /orders/, GET /orders/{id}/).
         """
         user = self.request.user
+        queryset = self._with_details(Order.objects.all())
         if hasattr(user, 'role') and user.role in ['admin', 'operator']:
-            return Order.objects.all()
-        return Order.objects.filter(usuario=user)
+            return queryset
+        return queryset.filter(usuario=user)
+
+    @staticmethod
+    def _with_details(queryset):
+        """
+        Plan de carga de OrderSerializer: usuario (UserSerializer incluye sus M2M),
+        detalles y, por OrderDetailSerializer -> ProductSerializer, producto y categoría.
+        """
+        return queryset.select_related('usuario').prefetch_related(
+            'usuario__groups',
+            'usuario__user_permissions',
+            Prefetch('detalles', queryset=OrderDetail.objects.select_related('producto__categoria')),
+        )
     
     @action(detail=False, methods=['get'], url_path='my-orders', permission_classes=[IsAuthenticated])
     def my_orders(self, request):
@@ -152,7 +208,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         vea solo sus propios pedidos.
         """
         user = request.user
-        orders = Order.objects.filter(usuario=user).order_by('-fecha')
+        orders = self._with_details(Order.objects.filter(usuario=user)).order_by('-fecha')
+        page = self.paginate_queryset(orders)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(orders, many=True)
         return Response(serializer.data)
 
@@ -321,19 +381,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         if getattr(request.user, 'role', None) not in ['admin', 'operator']:
             return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
         order = self.get_object()
-        # 1) Cerrar pagos abiertos (pendiente/en_revision) como fallido
-        abiertos = Pay.objects.filter(pedido=order, estado__in=['pendiente', 'en_revision'])
-        for p in abiertos:
-            p.fail()
-        # 2) Restaurar stock si el pedido no estaba cancelado aún
-        if order.estado != 'cancelado':
-            for det in order.detalles.all():
-                prod = det.producto
-                prod.stock += det.cantidad
-                prod.save()
-        # 3) Eliminar pagos y pedido
-        Pay.objects.filter(pedido=order).delete()
-        order.delete()
+        # Cierra pagos abiertos, restituye stock y borra pagos y pedido (market.tasks.eliminar_pedido)
+        job = jobs.encolar('market.eliminar_pedido', pedido_id=order.pk)
+        if job is not None:
+            return Response({'status': 'eliminación programada', 'job': job.pk}, status=status.HTTP_202_ACCEPTED)
         return Response({'status': 'pedido eliminado'}, status=status.HTTP_200_OK)
     
 class CartViewSet(viewsets.ModelViewSet):
@@ -346,86 +397,125 @@ class CartViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Retorna solo el carrito del usuario actual"""
-        return Cart.objects.filter(usuario=self.request.user)
+        return Cart.objects.filter(usuario=self.request.user).prefetch_related(self._items_prefetch())
+
+    @staticmethod
+    def _items_prefetch():
+        """CartItemSerializer expone nombre, precio y categoría del producto de cada item"""
+        return Prefetch('items', queryset=CartItem.objects.select_related('producto__categoria'))
     
     def list(self, request):
-        """Obtener detalles del carrito actual del usuario"""
+        """
+        Obtener detalles del carrito actual del usuario.
+        ETag = fecha de modificación del carrito + versión del catálogo (precios y nombres
+        de los productos); con If-None-Match vigente responde 304 sin leer los items.
+        """
         carrito, created = Cart.objects.get_or_create(usuario=request.user)
+        etag = conditional.etag(
+            carrito.pk, carrito.fecha_actualizacion.isoformat(), catalog_cache.version(),
+            request.META.get('HTTP_ACCEPT', '')
+        )
+        no_modificado = conditional.no_modificado(request, etag=etag)
+        if no_modificado is not None:
+            return no_modificado
+        prefetch_related_objects([carrito], self._items_prefetch())
         serializer = self.get_serializer(carrito)
-        return Response(serializer.data)
+        return conditional.con_validadores(Response(serializer.data), etag=etag)
     
     @action(detail=False, methods=['post'])
     def clear(self, request):
         """Vaciar el carrito"""
         carrito, created = Cart.objects.get_or_create(usuario=request.user)
         carrito.limpiar()
+        reservations.liberar(carrito.id)
         return Response({'mensaje': 'Carrito vaciado correctamente'}, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['post'])
+    @idempotent('cart-checkout')
     def checkout(self, request):
-        """Convertir carrito en pedido"""
+        """
+        Convertir carrito en pedido en una sola transacción:
+        bloquea los productos (orden por id para evitar deadlocks), descuenta stock
+        con UPDATE condicional, crea los detalles en bloque y hace rollback si algo falla.
+        """
         carrito, created = Cart.objects.get_or_create(usuario=request.user)
-        
-        # Verificar que el carrito no esté vacío
-        if carrito.items.count() == 0:
-            return Response(
-                {'error': 'El carrito está vacío'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Verificar stock disponible para todos los productos (primer chequeo)
-        for item in carrito.items.all():
-            if item.cantidad > item.producto.stock:
-                return Response(
-                    {'error': f'Stock insuficiente para {item.producto.nombre}. Solo hay {item.producto.stock} unidades disponibles'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
         direccion_cliente = getattr(request.user, 'address', 'Dirección no proporcionada por el cliente')
-        
-        # Crear nuevo pedido
-        pedido = Order.objects.create(
-            usuario=request.user,
-            estado='pendiente',
-            total=carrito.total(),
-            direccion_envio=direccion_cliente
-        )
-        
-        # Transferir items del carrito al pedido (segundo chequeo y reducción de stock)
-        for item in carrito.items.all():
-            # Refrescar el producto desde la base de datos para obtener stock actualizado
-            item.producto.refresh_from_db()
-            
-            # Verificar stock nuevamente (segundo chequeo)
-            if item.cantidad > item.producto.stock:
-                # Si falla, eliminar el pedido creado y retornar error
-                pedido.delete()
-                return Response(
-                    {'error': f'Stock insuficiente para {item.producto.nombre}. Solo hay {item.producto.stock} unidades disponibles'}, 
-                    status=status.HTTP_400_BAD_REQUEST
+
+        try:
+            with transaction.atomic():
+                items = list(carrito.items.order_by('producto_id'))
+
+                # Verificar que el carrito no esté vacío
+                if not items:
+                    return Response(
+                        {'error': 'El carrito está vacío'}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                productos = self._lock_products([item.producto_id for item in items])
+                # Unidades retenidas por otros carritos (vacío si las reservas están deshabilitadas)
+                reservado = reservations.reservado_por_otros(list(productos), carrito.id)
+
+                # Verificar stock disponible con las filas ya bloqueadas
+                for item in items:
+                    producto = productos[item.producto_id]
+                    stock_disponible = producto.stock - reservado.get(producto.id, 0)
+                    if item.cantidad > stock_disponible:
+                        raise StockInsuficiente(producto.nombre, max(stock_disponible, 0))
+
+                pedido = Order.objects.create(
+                    usuario=request.user,
+                    estado='pendiente',
+                    total=sum(item.cantidad * productos[item.producto_id].precio for item in items),
+                    direccion_envio=direccion_cliente
                 )
-            
-            # Crear el detalle del pedido
-            OrderDetail.objects.create(
-                pedido=pedido,
-                producto=item.producto,
-                cantidad=item.cantidad,
-                subtotal=item.cantidad * item.producto.precio
+
+                # Reducir el stock; el filtro stock__gte garantiza que nunca quede negativo
+                for item in items:
+                    retenido = reservado.get(item.producto_id, 0)
+                    actualizados = Product.objects.filter(
+                        id=item.producto_id, stock__gte=item.cantidad + retenido
+                    ).update(stock=F('stock') - item.cantidad)
+                    if not actualizados:
+                        producto = productos[item.producto_id]
+                        stock_actual = Product.objects.filter(id=producto.id).values_list('stock', flat=True).first()
+                        raise StockInsuficiente(producto.nombre, max((stock_actual or 0) - retenido, 0))
+
+                OrderDetail.objects.bulk_create([
+                    OrderDetail(
+                        pedido=pedido,
+                        producto_id=item.producto_id,
+                        cantidad=item.cantidad,
+                        subtotal=item.cantidad * productos[item.producto_id].precio
+                    )
+                    for item in items
+                ])
+
+                # Vaciar el carrito; sus reservas quedan convertidas en el descuento de stock
+                carrito.limpiar()
+                reservations.liberar(carrito.id)
+        except StockInsuficiente as e:
+            return Response(
+                {'error': f'Stock insuficiente para {e.nombre}. Solo hay {e.disponible} unidades disponibles'}, 
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # Reducir el stock
-            item.producto.stock -= item.cantidad
-            item.producto.save()
-        
-        # Vaciar el carrito
-        carrito.limpiar()
-        
+
+        # El stock se descontó con update(), sin señales. Invalidar el catálogo en cada venta lo
+        # dejaría siempre frío: solo cuando un producto se agota (el cambio que importa mostrar);
+        # el resto del stock cacheado se pone al día en CATALOG_CACHE_TTL
+        if any(productos[item.producto_id].stock - item.cantidad <= 0 for item in items):
+            catalog_cache.invalidar()
         return Response({
             'mensaje': 'Pedido creado correctamente',
             'pedido_id': pedido.id,
             'total': float(pedido.total)
         }, status=status.HTTP_201_CREATED)
 
+    def _lock_products(self, producto_ids):
+        """Bloquea (SELECT ... FOR UPDATE) los productos del carrito en orden determinístico"""
+        productos = Product.objects.select_for_update().filter(id__in=producto_ids).order_by('id')
+        return {producto.id: producto for producto in productos}
+
 class PayViewSet(viewsets.ModelViewSet):
     """Pagos y acciones de simulación (completar / fallar)."""
     queryset = Pay.objects.select_related('pedido', 'pedido__usuario')
@@ -446,14 +536,45 @@ class PayViewSet(viewsets.ModelViewSet):
             qs = qs.filter(pedido_id=pedido_id)
         return qs
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle del pago con GET condicional: ETag por `actualizado` y el estado/total del
+        pedido (incluidos en pedido_detalle); Last-Modified por `actualizado`.
+        """
+        pago = self.get_object()
+        etag = conditional.etag(
+            pago.pk, pago.actualizado.isoformat(), pago.pedido.estado, pago.pedido.total,
+            request.META.get('HTTP_ACCEPT', '')
+        )
+        no_modificado = conditional.no_modificado(request, etag=etag, last_modified=pago.actualizado)
+        if no_modificado is not None:
+            return no_modificado
+        serializer = self.get_serializer(pago)
+        return conditional.con_validadores(Response(serializer.data), etag=etag, last_modified=pago.actualizado)
+
+    @idempotent('pay-create')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
+        """
+        Chequeo e insert del pago en un solo paso: donde hay índice único parcial la base
+        rechaza un segundo pago abierto; si no (MySQL) se bloquea el pedido para que
+        Pay.save valide sin carrera con otro request simultáneo.
+        """
         pedido = serializer.validated_data.get('pedido')
         user = self.request.user
-        if getattr(user, 'role', None) not in ['admin', 'operator'] and pedido.usuario != user:
+        if getattr(user, 'role', None) not in ['admin', 'operator'] and pedido.usuario_id != user.pk:
             raise serializers.ValidationError('No puedes crear pagos para pedidos ajenos')
-        if pedido.estado not in ['pendiente']:
-            raise serializers.ValidationError(f"No se puede pagar un pedido en estado '{pedido.estado}'")
-        serializer.save()
+        try:
+            with transaction.atomic():
+                if not indices_parciales_disponibles():
+                    pedido.estado = Order.objects.select_for_update().values_list('estado', flat=True).get(pk=pedido.pk)
+                if pedido.estado not in ['pendiente']:
+                    raise serializers.ValidationError(f"No se puede pagar un pedido en estado '{pedido.estado}'")
+                serializer.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -523,31 +644,114 @@ class PayViewSet(viewsets.ModelViewSet):
             pedido.save()
         return Response(self.get_serializer(pago).data)
 
-    @action(detail=True, methods=['post'], parser_classes=[JSONParser, MultiPartParser, FormParser])
-    def proof(self, request, pk=None):
-        """Cliente o admin sube/declara comprobante; pasa el pago a 'en_revision'."""
-        pago = self.get_object()
-        # Dueño o staff
-        if getattr(request.user, 'role', None) not in ['admin', 'operator'] and pago.pedido.usuario != request.user:
+    def _puede_adjuntar(self, request, pago):
+        """Dueño o staff, y solo sobre pagos pendientes. Devuelve la respuesta de error o None"""
+        if getattr(request.user, 'role', None) not in ['admin', 'operator'] and pago.pedido.usuario_id != request.user.pk:
             return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
         if pago.estado not in ['pendiente']:
             return Response({'error': 'Solo se puede adjuntar comprobante a pagos pendientes'}, status=status.HTTP_400_BAD_REQUEST)
-        file = request.data.get('comprobante_archivo')
-        url = request.data.get('comprobante_url')
-        if not file and not url:
-            return Response({'error': 'Debe enviar comprobante_archivo o comprobante_url'}, status=status.HTTP_400_BAD_REQUEST)
-        if file:
-            pago.comprobante_archivo = file
-        if url:
-            pago.comprobante_url = url
+        return None
+
+    def _pasar_a_revision(self, pago):
         pago.estado = 'en_revision'
-        pago.save()
+        # Sin tocar comprobante_archivo: lo asigna el push al storage (market.uploads.subir)
+        pago.save(update_fields=['estado', 'comprobante_url', 'actualizado'])
         # Marcar también el pedido como en revisión
         if pago.pedido.estado == 'pendiente':
             pedido = pago.pedido
             pedido.estado = 'en_revision'
             pedido.save()
-        return Response(self.get_serializer(pago).data)
+
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def proof(self, request, pk=None):
+        """
+        Cliente o admin sube/declara comprobante; pasa el pago a 'en_revision'.
+        El archivo se sube al storage en segundo plano: su URL aparece en
+        comprobante_archivo_url (o en GET proof-upload) cuando termina.
+        """
+        pago = self.get_object()
+        error = self._puede_adjuntar(request, pago)
+        if error is not None:
+            return error
+        file = request.data.get('comprobante_archivo')
+        url = request.data.get('comprobante_url')
+        if not file and not url:
+            return Response({'error': 'Debe enviar comprobante_archivo o comprobante_url'}, status=status.HTTP_400_BAD_REQUEST)
+        subida = None
+        try:
+            with transaction.atomic():
+                if file:
+                    try:
+                        subida = uploads.desde_archivo(pago, file)
+                    except uploads.SubidaInvalida as e:
+                        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                if url:
+                    pago.comprobante_url = url
+                self._pasar_a_revision(pago)
+        except Exception:
+            # La fila de la subida se revirtió con la transacción; el archivo en disco no
+            if subida is not None:
+                uploads.descartar_temporal(subida)
+            raise
+        data = self.get_serializer(pago).data
+        if subida is not None:
+            subida.refresh_from_db()
+            data['comprobante_subida'] = uploads.estado(subida)
+        return Response(data)
+
+    @action(detail=True, methods=['get', 'post', 'put'], url_path='proof-upload',
+            parser_classes=[JSONParser], permission_classes=[IsAuthenticated])
+    def proof_upload(self, request, pk=None):
+        """
+        Subida del comprobante en streaming y reanudable (ver market.uploads):
+        - POST {nombre, tamano, content_type}: abre la subida.
+        - PUT con los bytes del archivo (o una parte con Content-Range): se escriben a disco por
+          bloques; con el último byte el pago pasa a 'en_revision' y responde 202 enseguida.
+        - GET: estado de la última subida, offset para retomar y URL final cuando terminó.
+        """
+        pago = self.get_object()
+        if getattr(request.user, 'role', None) not in ['admin', 'operator'] and pago.pedido.usuario_id != request.user.pk:
+            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+
+        if request.method == 'GET':
+            subida = pago.subidas.order_by('-id').first()
+            if subida is None:
+                return Response({'error': 'El pago no tiene subidas'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(uploads.estado(subida))
+
+        error = self._puede_adjuntar(request, pago)
+        if error is not None:
+            return error
+
+        if request.method == 'POST':
+            try:
+                subida = uploads.iniciar(
+                    pago, request.data.get('nombre'), request.data.get('tamano'),
+                    request.data.get('content_type', ''),
+                )
+            except uploads.SubidaInvalida as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(uploads.estado(subida), status=status.HTTP_201_CREATED)
+
+        subida = pago.subidas.filter(estado='recibiendo').order_by('-id').first()
+        if subida is None:
+            return Response({'error': 'Primero hay que abrir la subida con POST'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            inicio = uploads.parsear_content_range(request.headers.get('Content-Range'), subida.tamano)
+            # request.stream: el cuerpo sin parsear, leído por bloques
+            subida = uploads.recibir(subida, request.stream, inicio)
+        except uploads.OffsetIncorrecto as e:
+            return Response({'error': str(e), 'offset': e.esperado}, status=status.HTTP_409_CONFLICT)
+        except uploads.SubidaInvalida as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if subida.recibido < subida.tamano:
+            return Response(uploads.estado(subida))
+        with transaction.atomic():
+            uploads.encolar(subida)
+            self._pasar_a_revision(pago)
+        subida.refresh_from_db()
+        return Response(uploads.estado(subida), status=status.HTTP_202_ACCEPTED)
 
 class ShipmentViewSet(viewsets.ModelViewSet):
     """
@@ -594,18 +798,11 @@ class ShipmentViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Estado inválido'}, status=status.HTTP_400_BAD_REQUEST)
             
         shipment.estado = nuevo_estado
-        
-        # Si se marca como enviado, actualizar también el pedido
-        if nuevo_estado == 'en camino' and shipment.pedido.estado != 'enviado':
-            shipment.pedido.estado = 'enviado'
-            shipment.pedido.save()
-            
-        # Si se marca como entregado, actualizar también el pedido
-        if nuevo_estado == 'entregado' and shipment.pedido.estado != 'entregado':
-            shipment.pedido.estado = 'entregado'
-            shipment.pedido.save()
-            
-        shipment.save()
+        with transaction.atomic():
+            shipment.save()
+            # En camino / entregado se reflejan en el pedido (market.tasks.propagar_estado_envio)
+            if nuevo_estado in ESTADO_PEDIDO_POR_ENVIO:
+                jobs.encolar('market.propagar_estado_envio', envio_id=shipment.pk)
         return Response({'status': 'Estado de envío actualizado'}, status=status.HTTP_200_OK)
 
 class CartItemViewSet(viewsets.ModelViewSet):
@@ -618,7 +815,7 @@ class CartItemViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Retorna solo los items del carrito del usuario actual"""
-        return CartItem.objects.filter(carrito__usuario=self.request.user)
+        return CartItem.objects.filter(carrito__usuario=self.request.user).select_related('producto__categoria')
     
     def list(self, request, *args, **kwargs):
         """Lista todos los items del carrito del usuario"""
@@ -656,20 +853,26 @@ class CartItemViewSet(viewsets.ModelViewSet):
         # Si la cantidad es 0 o negativa, eliminar el item
         if cantidad <= 0:
             instance.delete()
+            reservations.liberar(instance.carrito_id, instance.producto_id)
+            Cart.marcar_modificado(instance.carrito_id)
             return Response({
                 'mensaje': 'Item eliminado del carrito',
                 'item_eliminado': True
             }, status=status.HTTP_200_OK)
         
-        # Validar stock disponible
-        if cantidad > instance.producto.stock:
-            return Response({
-                'error': f'Stock insuficiente. Solo hay {instance.producto.stock} unidades disponibles'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Actualizar cantidad
-        instance.cantidad = cantidad
-        instance.save()
+        with transaction.atomic():
+            # Validar stock disponible (descontando reservas de otros carritos)
+            stock_disponible = reservations.disponible(instance.producto, instance.carrito_id)
+            if cantidad > stock_disponible:
+                return Response({
+                    'error': f'Stock insuficiente. Solo hay {stock_disponible} unidades disponibles'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Actualizar cantidad
+            instance.cantidad = cantidad
+            instance.save()
+            reservations.reservar(instance.carrito_id, instance.producto_id, cantidad)
+            Cart.marcar_modificado(instance.carrito_id)
         
         # Serializar la respuesta
         serializer = self.get_serializer(instance)
@@ -686,8 +889,10 @@ class CartItemViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         producto_nombre = instance.producto.nombre
         
-        # Eliminar el item
+        # Eliminar el item y liberar su reserva
         instance.delete()
+        reservations.liberar(instance.carrito_id, instance.producto_id)
+        Cart.marcar_modificado(instance.carrito_id)
         
         return Response({
             'mensaje': f'"{producto_nombre}" eliminado del carrito',
@@ -733,13 +938,43 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         """
         Fusión de favoritos de invitado al iniciar sesión.
         Body: { "product_ids": [1,2,3] }
+        Cantidad de consultas constante: valida los ids en una, lee los favoritos existentes
+        en otra e inserta el resto con un solo bulk_create (ignore_conflicts cubre la carrera
+        con otra fusión simultánea sobre uniq_favorite_user_product).
         """
         ids = request.data.get('product_ids') or []
         if not isinstance(ids, list):
             return Response({'detail': 'product_ids debe ser una lista'}, status=status.HTTP_400_BAD_REQUEST)
-        created = 0
+
+        enteros, invalidos = [], []
         for pid in ids:
-            _, ok = Favorite.objects.get_or_create(user=request.user, product_id=pid)
-            if ok:
-                created += 1
-        return Response({'merged': created}, status=status.HTTP_200_OK)
\ No newline at end of file
+            try:
+                enteros.append(int(pid))
+            except (TypeError, ValueError):
+                invalidos.append(pid)
+        solicitados = list(dict.fromkeys(enteros))  # sin duplicados, conservando el orden
+
+        existentes = set(Product.objects.filter(id__in=solicitados).values_list('id', flat=True))
+        invalidos += [pid for pid in solicitados if pid not in existentes]
+        validos = [pid for pid in solicitados if pid in existentes]
+        ya_favoritos = set(
+            Favorite.objects.filter(user=request.user, product_id__in=validos).values_list('product_id', flat=True)
+        )
+        nuevos = [pid for pid in validos if pid not in ya_favoritos]
+        Favorite.objects.bulk_create(
+            [Favorite(user=request.user, product_id=pid) for pid in nuevos],
+            ignore_conflicts=True,
+        )
+        return Response({
+            'merged': len(nuevos),
+            'created': len(nuevos),
+            'skipped': len(ya_favoritos),
+            'invalid': len(invalidos),
+            'invalid_ids': invalidos,
+        }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrOperator])
+def catalog_cache_stats(request):
+    """Aciertos/fallos de la caché del catálogo, para monitoreo - Solo admins y operadores"""
+    return Response(catalog_cache.estadisticas(), status=status.HTTP_200_OK)